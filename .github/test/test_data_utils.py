@@ -0,0 +1,760 @@
+#!/usr/bin/env python3
+"""
+Tests for the scalable extensions of the Q3 data utilities library.
+Complements test_assignment.py; uses small synthetic frames plus the
+10,000-row raw file.
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import q3_data_utils
+from q3_data_utils import (load_data, clean_data, fill_missing, filter_data, summarize_by_group,
+                           memory_report, canonicalize_categories, CANONICAL_RULES,
+                           CLINICAL_TRIAL_SENTINELS, fill_missing_many, compare_imputation,
+                           GroupKeys, GroupAggState, parallel_clean_data, parallel_transform_types,
+                           parallel_fill_missing_many, parallel_summarize_by_group, bin_columns,
+                           save_dataset, load_dataset,
+                           parse_dates, transform_types, ColumnIndex, load_or_build_index,
+                           stream_clean_data, stream_filter_data, stream_fill_value,
+                           stream_fill_missing, stream_summarize_by_group)
+
+RAW = 'data/clinical_trial_raw.csv'
+
+
+@pytest.fixture
+def clinical_data():
+    """Load clinical trial data"""
+    return pd.read_csv(RAW)
+
+# ============================================================================
+# Streaming (chunked) mode
+# ============================================================================
+
+def test_stream_clean_matches_in_memory(clinical_data):
+    """Chunked cleaning drops duplicates across chunk boundaries"""
+    doubled = pd.concat([clinical_data, clinical_data.iloc[:100]], ignore_index=True)
+    chunks = (doubled.iloc[i:i + 1500] for i in range(0, len(doubled), 1500))
+    streamed = pd.concat(stream_clean_data(chunks))
+    pd.testing.assert_frame_equal(streamed, clean_data(doubled))
+
+def test_stream_filter_and_fill(clinical_data):
+    """Chunked filter and fills equal the in-memory results"""
+    filters = [{'column': 'age', 'condition': 'greater_than', 'value': 65}]
+    streamed = pd.concat(stream_filter_data(load_data(RAW, chunksize=999), filters))
+    pd.testing.assert_frame_equal(streamed, filter_data(clinical_data, filters))
+
+    value = stream_fill_value(load_data(RAW, chunksize=999), 'bmi', 'median')
+    streamed = pd.concat(stream_fill_missing(load_data(RAW, chunksize=999), 'bmi', 'median', value))
+    pd.testing.assert_frame_equal(streamed, fill_missing(clinical_data, 'bmi', 'median'))
+
+    streamed = pd.concat(stream_fill_missing(load_data(RAW, chunksize=999), 'bmi', 'ffill'))
+    pd.testing.assert_frame_equal(streamed, fill_missing(clinical_data, 'bmi', 'ffill'))
+
+def test_stream_summarize_matches_in_memory(clinical_data):
+    """Merged partial aggregates reproduce summarize_by_group"""
+    agg = {'age': ['count', 'sum', 'mean', 'std', 'min', 'max', 'median'], 'bmi': 'mean'}
+    streamed = stream_summarize_by_group(load_data(RAW, chunksize=1234), 'site', agg)
+    pd.testing.assert_frame_equal(streamed, summarize_by_group(clinical_data, 'site', agg),
+                                  check_dtype=False)
+
+def test_stream_summarize_median_without_any_group():
+    """A median over chunks whose keys are all missing gives an empty summary"""
+    df = pd.DataFrame({'site': [np.nan] * 4, 'age': [30.0, 40.0, 50.0, 60.0]})
+    agg = {'age': ['median', 'mean']}
+    streamed = stream_summarize_by_group([df.iloc[:2], df.iloc[2:]], 'site', agg)
+    pd.testing.assert_frame_equal(streamed, summarize_by_group(df, 'site', agg), check_dtype=False)
+
+# ============================================================================
+# Parsed-data cache
+# ============================================================================
+
+def test_load_data_cache_roundtrip(tmp_path, clinical_data):
+    """Caching is opt-in; cached loads equal read_csv and notice changed sources"""
+    path = tmp_path / 'raw.csv'
+    clinical_data.to_csv(path, index=False)
+    load_data(str(path))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['raw.csv']
+
+    first = load_data(str(path), cache=True)
+    assert (tmp_path / '.raw.csv.cache' / 'meta.json').exists()
+    pd.testing.assert_frame_equal(load_data(str(path), cache=True), first, check_exact=True)
+    pd.testing.assert_frame_equal(first, pd.read_csv(path), check_exact=True)
+
+    clinical_data.iloc[:10].to_csv(path, index=False)
+    assert len(load_data(str(path), cache=True)) == 10
+
+    root = tmp_path / 'cache_root'
+    assert len(load_data(str(path), cache=str(root))) == 10
+    assert len(list(root.glob('.raw.csv.*.cache/meta.json'))) == 1
+
+# ============================================================================
+# Typed loading
+# ============================================================================
+
+def test_schema_typed_load(tmp_path, clinical_data):
+    """Schema loading yields compact dtypes, the same values and a cached copy"""
+    path = tmp_path / 'raw.csv'
+    clinical_data.to_csv(path, index=False)
+    typed = load_data(str(path), schema=True, cache=True)
+    assert typed['patient_id'].dtype == 'Int32' and typed['patient_id'].iloc[0] == 1
+    assert typed['site'].dtype == 'category' and typed['bmi'].dtype == 'float64'
+    assert typed.groupby('site', observed=True)['bmi'].median().equals(
+        clinical_data.groupby('site')['bmi'].median())
+    assert typed['systolic_bp'].isna().sum() == clinical_data['systolic_bp'].isna().sum()
+    assert (typed['age'].astype(float) == clinical_data['age']).all()
+    pd.testing.assert_frame_equal(load_data(str(path), schema=True, cache=True), typed, check_exact=True)
+    report = memory_report(clinical_data, typed)
+    assert report.loc['TOTAL', 'bytes_saved'] > 0
+
+# ============================================================================
+# Category canonicalization
+# ============================================================================
+
+def test_canonicalize_categories(tmp_path):
+    """Variants, aliases and typos collapse onto canonical categories"""
+    df = pd.DataFrame({
+        'site': ['SITE A', 'site a', 'Site  A', '  Site_D  ', np.nan, 'Site Z'],
+        'sex': ['M', 'Male', ' female ', 'F', 'f', np.nan],
+        'intervention_group': ['Contrl', 'Treatmen A', 'TreatmentA', 'treatment b', 'CONTROL', 'Treatment  B'],
+    })
+    cache = tmp_path / 'canon.json'
+    out = canonicalize_categories(df, cache_path=str(cache))
+    assert out['site'].tolist()[:4] == ['Site A', 'Site A', 'Site A', 'Site D']
+    assert out['site'].isna().tolist() == [False] * 4 + [True, True]
+    assert out['sex'].tolist()[:5] == ['M', 'M', 'F', 'F', 'F']
+    assert out['intervention_group'].tolist() == ['Control', 'Treatment A', 'Treatment A',
+                                                  'Treatment B', 'Control', 'Treatment B']
+    assert list(out['site'].cat.categories) == CANONICAL_RULES['site']['values']
+    assert df['site'].iloc[0] == 'SITE A', "input should not be modified"
+    assert cache.exists()
+
+# ============================================================================
+# Date parsing
+# ============================================================================
+
+def test_parse_dates_mixed_formats():
+    """Each layout is parsed with its explicit format and reported"""
+    values = pd.Series(['2022-03-04', '03/04/2022', '04-03-2022', '2022-03-04', np.nan, '31/31/2022'])
+    dates, report = parse_dates(values, report=True)
+    assert (dates.iloc[:4] == pd.Timestamp('2022-03-04')).all()
+    assert dates.iloc[4:].isna().all()
+    assert report.loc['YYYY-MM-DD', 'rows'] == 2 and report.loc['YYYY-MM-DD', 'distinct'] == 1
+    assert report.loc['MM/DD/YYYY', 'failed'] == 1
+    assert report.loc['missing', 'rows'] == 1
+
+def test_transform_types_parses_all_enrollment_dates(clinical_data):
+    """No enrollment date is lost to NaT"""
+    typed = transform_types(clinical_data, {'enrollment_date': 'datetime'})
+    assert typed['enrollment_date'].notna().all()
+
+# ============================================================================
+# Compiled filters
+# ============================================================================
+
+def test_filter_data_new_conditions(clinical_data):
+    """not_equals, is_null, OR-groups and positional output"""
+    filters = [
+        {'column': 'age', 'condition': 'in_range', 'value': (18, 85)},
+        {'column': 'sex', 'condition': 'not_equals', 'value': 'F'},
+        {'any': [{'column': 'site', 'condition': 'equals', 'value': 'Site A'},
+                 {'column': 'bmi', 'condition': 'is_null'}]},
+    ]
+    df = clinical_data
+    expected = df[df['age'].between(18, 85) & (df['sex'] != 'F')
+                  & ((df['site'] == 'Site A') | df['bmi'].isna())]
+    pd.testing.assert_frame_equal(filter_data(df, filters), expected)
+    positions = filter_data(df, filters, return_index=True)
+    assert (df.index[positions] == expected.index).all()
+
+    with pytest.raises(ValueError):
+        filter_data(df, [{'column': 'age', 'condition': 'bogus', 'value': 1}])
+
+# ============================================================================
+# Column indexes
+# ============================================================================
+
+def test_column_index_matches_scan(tmp_path, clinical_data):
+    """Indexed filters return the same rows and are invalidated with the source"""
+    path = tmp_path / 'raw.csv'
+    clinical_data.to_csv(path, index=False)
+    df = load_data(str(path))
+    index = load_or_build_index(df, ['age', 'systolic_bp', 'bmi', 'site'], str(path))
+    assert (tmp_path / '.raw.csv.index.npz').exists()
+    queries = [
+        [{'column': 'age', 'condition': 'in_range', 'value': (40, 60)}],
+        [{'column': 'systolic_bp', 'condition': 'greater_than', 'value': 140},
+         {'column': 'site', 'condition': 'in_list', 'value': ['Site A', 'SITE A']},
+         {'column': 'sex', 'condition': 'equals', 'value': 'F'}],
+        [{'column': 'bmi', 'condition': 'is_null'}, {'column': 'age', 'condition': 'less_than', 'value': 50}],
+    ]
+    for filters in queries:
+        pd.testing.assert_frame_equal(filter_data(df, filters, index=index), filter_data(df, filters))
+
+    index_path = str(tmp_path / '.raw.csv.index.npz')
+    assert ColumnIndex.load(index_path, str(path)) is not None
+    clinical_data.iloc[:10].to_csv(path, index=False)
+    assert ColumnIndex.load(index_path, str(path)) is None
+
+
+def test_column_index_leaves_invalid_values_to_scan(clinical_data):
+    """NaN and non-numeric comparison values behave exactly as without an index"""
+    index = ColumnIndex.build(clinical_data, ['age', 'bmi'])
+    assert index.lookup('age', 'less_than', np.nan) is None
+    assert len(filter_data(clinical_data, [{'column': 'age', 'condition': 'less_than', 'value': np.nan}],
+                           index=index)) == 0
+    with pytest.raises(TypeError):
+        filter_data(clinical_data, [{'column': 'age', 'condition': 'less_than', 'value': 'x'}], index=index)
+    filters = [{'column': 'age', 'condition': 'in_list', 'value': [45, 60, np.nan]},
+               {'column': 'bmi', 'condition': 'is_null', 'value': False}]
+    pd.testing.assert_frame_equal(filter_data(clinical_data, filters, index=index),
+                                  filter_data(clinical_data, filters))
+
+# ============================================================================
+# Cleaning
+# ============================================================================
+
+def test_clean_data_per_column_sentinels(clinical_data):
+    """Sentinels are replaced only where declared; key-based dedup and inplace"""
+    df = pd.concat([clinical_data, clinical_data.iloc[:5].assign(age=30)], ignore_index=True)
+    cleaned = clean_data(df, sentinel_value=CLINICAL_TRIAL_SENTINELS, subset=['patient_id'])
+    assert len(cleaned) == len(clinical_data)
+    assert not (cleaned['age'] == -999).any() and not (cleaned['bmi'] == -1).any()
+    assert (df['age'] == -999).sum() > 0, "input should not be modified"
+
+    # scalar sentinel keeps the original whole-frame behaviour
+    pd.testing.assert_frame_equal(clean_data(clinical_data),
+                                  clinical_data.drop_duplicates().replace(-999, np.nan))
+
+    target = clinical_data.copy()
+    result = clean_data(target, sentinel_value={'bmi': -1}, inplace=True)
+    assert result is target and not (target['bmi'] == -1).any()
+    assert (target['age'] == -999).any()
+
+
+def test_clean_data_subset_survives_hash_collisions(clinical_data, monkeypatch):
+    """Rows whose key hashes collide are only dropped if the keys really match"""
+    df = pd.concat([clinical_data, clinical_data.iloc[:5]], ignore_index=True)
+    monkeypatch.setattr(pd.util, 'hash_pandas_object',
+                        lambda obj, index=True: pd.Series(np.zeros(len(obj), dtype=np.uint64)))
+    cleaned = clean_data(df, subset=['patient_id'])
+    expected = df.drop_duplicates(subset=['patient_id']).replace(-999, np.nan)
+    pd.testing.assert_frame_equal(cleaned, expected)
+
+# ============================================================================
+# Imputation
+# ============================================================================
+
+def test_fill_missing_many_stratified():
+    """Per-column strategies, grouped medians and no mutation of the input"""
+    df = pd.DataFrame({
+        'site': ['A', 'A', 'A', 'B', 'B', 'B'],
+        'bmi': [20.0, np.nan, 30.0, 40.0, np.nan, 50.0],
+        'glucose': [1.0, np.nan, 3.0, np.nan, 5.0, 9.0],
+        'adherence': [np.nan, 70.0, np.nan, 80.0, np.nan, 90.0],
+    })
+    out = fill_missing_many(df, {'bmi': 'median', 'glucose': 'mean', 'adherence': 'ffill'}, by='site')
+    assert out['bmi'].tolist() == [20.0, 25.0, 30.0, 40.0, 45.0, 50.0]
+    assert out['glucose'].tolist() == [1.0, 2.0, 3.0, 7.0, 5.0, 9.0]
+    assert out['adherence'].isna().tolist() == [True, False, False, False, False, False]
+    assert df['bmi'].isna().sum() == 2, "input should not be modified"
+
+    ungrouped = fill_missing_many(df, {'bmi': 'mean', 'glucose': 'median'})
+    pd.testing.assert_frame_equal(ungrouped, fill_missing(fill_missing(df, 'bmi', 'mean'), 'glucose', 'median'))
+
+def test_compare_imputation_matches_materialized(clinical_data):
+    """Analytical statistics equal those of the actually imputed columns"""
+    report = compare_imputation(clinical_data, ['bmi', 'cholesterol_total', 'age'])
+    for col in ['bmi', 'cholesterol_total', 'age']:
+        for strategy in ['mean', 'median', 'ffill']:
+            filled = fill_missing(clinical_data, col, strategy)[col]
+            row = report.loc[(col, strategy)]
+            assert row['mean'] == pytest.approx(filled.mean())
+            assert row['median'] == pytest.approx(filled.median())
+            assert row['variance'] == pytest.approx(filled.var())
+            assert row['missing'] == filled.isna().sum()
+
+# ============================================================================
+# Grouped aggregation engine
+# ============================================================================
+
+def test_summarize_by_group_matches_pandas(clinical_data):
+    """Factorized multi-key aggregation equals DataFrame.groupby().agg()"""
+    agg = {'age': ['count', 'sum', 'mean', 'std', 'min', 'max', 'median'],
+           'bmi': ['mean', 'var', 'median'], 'follow_up_months': 'max'}
+    for keys in ['site', ['site', 'sex']]:
+        expected = clinical_data.groupby(keys).agg(agg).reset_index()
+        pd.testing.assert_frame_equal(summarize_by_group(clinical_data, keys, agg), expected,
+                                      check_dtype=False)
+    flat = {'age': 'mean', 'follow_up_months': 'sum'}
+    pd.testing.assert_frame_equal(summarize_by_group(clinical_data, 'site', flat),
+                                  clinical_data.groupby('site').agg(flat).reset_index())
+
+def test_group_keys_reuse_and_rate():
+    """GroupKeys can be shared across summaries; 'rate' reads yes/no answers"""
+    df = pd.DataFrame({'arm': ['a', 'b', 'a', 'b', None], 'site': ['x', 'x', 'y', 'y', 'y'],
+                       'cvd': ['Yes', 'no', 'no ', np.nan, 'yes'], 'adherence': [1.0, 2.0, 3.0, 4.0, 5.0]})
+    keys = GroupKeys(df, ['arm'])
+    assert keys.ngroups == 2 and keys.codes.tolist() == [0, 1, 0, 1, -1]
+    summary = summarize_by_group(df, keys, {'cvd': 'rate', 'adherence': ['mean', 'size']})
+    assert summary[('cvd', 'rate')].tolist() == [0.5, 0.0]
+    assert summary[('adherence', 'mean')].tolist() == [2.0, 3.0]
+    assert summarize_by_group(df, keys, {'adherence': 'max'})['adherence'].tolist() == [3.0, 4.0]
+
+# ============================================================================
+# Mergeable group aggregates
+# ============================================================================
+
+def test_group_agg_state_merge_matches_full_summary(clinical_data, tmp_path):
+    """Merged batch states (and a saved copy) equal one full summarize_by_group"""
+    agg = {'age': ['count', 'size', 'sum', 'mean', 'std', 'min', 'max', 'median'],
+           'bmi': ['var', 'median'], 'outcome_cvd': 'rate'}
+    batches = [clinical_data.iloc[i:i + 3000] for i in range(0, len(clinical_data), 3000)]
+    state = GroupAggState.from_frame(batches[0], ['site', 'sex'], ['age', 'bmi', 'outcome_cvd'])
+    for batch in batches[1:]:
+        state = state.update(batch)
+    assert state.rows == len(clinical_data)
+    expected = summarize_by_group(clinical_data, ['site', 'sex'], agg)
+    pd.testing.assert_frame_equal(state.summarize(agg), expected, check_dtype=False)
+
+    state.save(tmp_path / 'state.npz')
+    restored = GroupAggState.load(tmp_path / 'state.npz')
+    pd.testing.assert_frame_equal(restored.summarize(agg), expected, check_dtype=False)
+
+def test_group_agg_state_sketch_bounds_median():
+    """Past sketch_size distinct values the median is approximate but close"""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'g': rng.integers(0, 2, 50_000), 'x': rng.normal(size=50_000)})
+    left = GroupAggState.from_frame(df.iloc[:20_000], 'g', sketch_size=200)
+    state = left.merge(GroupAggState.from_frame(df.iloc[20_000:], 'g', sketch_size=200))
+    assert np.bincount(state.columns['x']['sketch'][0]).max() <= 200
+    exact = df.groupby('g')['x'].median().to_numpy()
+    assert np.abs(state.summarize({'x': 'median'})['x'].to_numpy() - exact).max() < 0.05
+    with pytest.raises(ValueError):
+        state.merge(GroupAggState.from_frame(df, 'g', []))
+
+# ============================================================================
+# Parallel (process pool) mode
+# ============================================================================
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    """Let the 10,000-row file go through the process pool, even on one CPU"""
+    monkeypatch.setattr(q3_data_utils, '_PARALLEL_MIN_ROWS', 0)
+    monkeypatch.setattr(q3_data_utils, '_available_cpus', lambda: 4)
+
+def test_parallel_clean_and_transform_match_serial(clinical_data, small_pool):
+    """Partitioned results are identical to the serial functions"""
+    doubled = pd.concat([clinical_data, clinical_data.iloc[::7]], ignore_index=True)
+    for kwargs in [{}, {'subset': ['patient_id'], 'sentinel_value': CLINICAL_TRIAL_SENTINELS}]:
+        pd.testing.assert_frame_equal(parallel_clean_data(doubled, workers=3, **kwargs),
+                                      clean_data(doubled, **kwargs))
+    type_map = {'enrollment_date': 'datetime', 'age': 'numeric', 'site': 'category'}
+    pd.testing.assert_frame_equal(parallel_transform_types(clinical_data, type_map, workers=3),
+                                  transform_types(clinical_data.copy(), type_map))
+
+def test_parallel_runs_serially_on_one_cpu(clinical_data, monkeypatch):
+    """No pool is started for small frames or without a second CPU"""
+    monkeypatch.setattr(q3_data_utils, '_available_cpus', lambda: 1)
+    monkeypatch.setattr(q3_data_utils, '_PARALLEL_MIN_ROWS', 0)
+    assert q3_data_utils._parallel_workers(clinical_data, 8) is None
+    monkeypatch.setattr(q3_data_utils, '_available_cpus', lambda: 4)
+    assert q3_data_utils._parallel_workers(clinical_data, 8) == 4
+    monkeypatch.setattr(q3_data_utils, '_PARALLEL_MIN_ROWS', len(clinical_data) + 1)
+    assert q3_data_utils._parallel_workers(clinical_data, 8) is None
+
+def test_parallel_fill_and_summarize_match_serial(clinical_data, small_pool):
+    """Row- and group-partitioned fills and summaries equal the serial results"""
+    strategies = {'bmi': 'median', 'age': 'mean', 'adherence_pct': 'ffill'}
+    for by in [None, ['site', 'sex']]:
+        pd.testing.assert_frame_equal(parallel_fill_missing_many(clinical_data, strategies, by=by, workers=3),
+                                      fill_missing_many(clinical_data, strategies, by=by))
+    agg = {'age': ['sum', 'mean', 'std', 'median'], 'outcome_cvd': 'rate'}
+    pd.testing.assert_frame_equal(parallel_summarize_by_group(clinical_data, ['site', 'sex'], agg, workers=3),
+                                  summarize_by_group(clinical_data, ['site', 'sex'], agg))
+
+# ============================================================================
+# Batch binning
+# ============================================================================
+
+def test_bin_columns_matches_pd_cut(clinical_data):
+    """Several binned columns at once, same as pd.cut, without copying columns"""
+    spec = {
+        'age_group': {'column': 'age', 'bins': [0, 40, 55, 70, 100],
+                      'labels': ['<40', '40-54', '55-69', '70+'], 'include_lowest': True},
+        'bmi_category': {'column': 'bmi', 'bins': [0, 18.5, 25, 30, 100],
+                         'labels': ['Underweight', 'Normal', 'Overweight', 'Obese'], 'right': False},
+        'bp_category': {'column': 'systolic_bp', 'bins': [-np.inf, 120, 130, np.inf],
+                        'labels': ['Normal', 'Elevated', 'High'], 'right': False},
+    }
+    out = bin_columns(clinical_data, spec)
+    assert list(clinical_data.columns) == list(pd.read_csv(RAW, nrows=0).columns)
+    for name, rule in spec.items():
+        expected = pd.cut(clinical_data[rule['column']], rule['bins'], labels=rule['labels'],
+                          right=rule.get('right', True), include_lowest=rule.get('include_lowest', False))
+        pd.testing.assert_series_equal(out[name], expected, check_names=False)
+    assert np.shares_memory(out['bmi'].to_numpy(), clinical_data['bmi'].to_numpy())
+    with pytest.raises(ValueError):
+        bin_columns(clinical_data, {'x': {'column': 'age', 'bins': [0, 10], 'labels': ['a', 'b']}})
+
+# ============================================================================
+# Pipeline runner
+# ============================================================================
+
+def test_pipeline_stage_graph_and_hash(tmp_path):
+    """Q4-Q6 depend only on the raw data; notebook outputs don't change the hash"""
+    import json
+    import run_pipeline
+    deps = run_pipeline.stage_dependencies(run_pipeline.STAGES)
+    assert deps == {'q4': [], 'q5': [], 'q6': [], 'q7': ['q6']}
+
+    nb = json.load(open('q7_aggregation.ipynb'))
+    stage = {'name': 'q7', 'notebook': str(tmp_path / 'q7.ipynb'), 'inputs': [RAW], 'outputs': []}
+    json.dump(nb, open(stage['notebook'], 'w'))
+    before = run_pipeline.stage_hash(stage)
+    for cell in nb['cells']:
+        if cell['cell_type'] == 'code':
+            cell['outputs'], cell['execution_count'] = [], 99
+    json.dump(nb, open(stage['notebook'], 'w'))
+    assert run_pipeline.stage_hash(stage) == before
+    next(c for c in nb['cells'] if c['cell_type'] == 'code')['source'].append('\nx = 1')
+    json.dump(nb, open(stage['notebook'], 'w'))
+    assert run_pipeline.stage_hash(stage) != before
+
+# ============================================================================
+# Dataset store
+# ============================================================================
+
+def test_dataset_store_round_trip(clinical_data, tmp_path):
+    """Dtypes, categories, one-hot columns and the index survive a save/load"""
+    df = transform_types(clinical_data.copy(), {'enrollment_date': 'datetime', 'sex': 'category'})
+    df['age'] = df['age'].astype('Int16')
+    df = pd.get_dummies(df, columns=['intervention_group']).iloc[::3]
+    path = save_dataset(df, tmp_path / 'q6.store')
+
+    pd.testing.assert_frame_equal(load_dataset(path), df)
+    pd.testing.assert_frame_equal(load_dataset(path, mmap=True), df)
+    projected = load_dataset(path, columns=['sex', 'bmi', 'intervention_group_Control'])
+    pd.testing.assert_frame_equal(projected, df[['sex', 'bmi', 'intervention_group_Control']])
+
+    mapped = load_dataset(path, columns=['bmi'], mmap=True)
+    mapped.iloc[0, 0] = -1.0
+    assert load_dataset(path, columns=['bmi']).iloc[0, 0] == df['bmi'].iloc[0]
+    with pytest.raises(KeyError):
+        load_dataset(path, columns=['not_a_column'])
+    with pytest.raises(TypeError):
+        save_dataset(pd.DataFrame({'mixed': ['a', 1]}), tmp_path / 'bad.store')
+    assert not (tmp_path / 'bad.store').exists()
+
+# ============================================================================
+# Data generator
+# ============================================================================
+
+def test_generator_deterministic_across_chunk_sizes(tmp_path):
+    """Same seed gives the same file for any chunk size; fewer rows give a prefix"""
+    import generate_data
+    generate_data.write_csv(tmp_path / 'a.csv', 3000, seed=7, chunk_size=3000)
+    generate_data.write_csv(tmp_path / 'b.csv', 3000, seed=7, chunk_size=701)
+    generate_data.write_csv(tmp_path / 'c.csv', 1000, seed=7, chunk_size=250)
+    a = (tmp_path / 'a.csv').read_text()
+    assert a == (tmp_path / 'b.csv').read_text()
+    assert a.startswith((tmp_path / 'c.csv').read_text())
+
+    df = pd.read_csv(tmp_path / 'a.csv')
+    assert list(df.columns) == list(pd.read_csv(RAW, nrows=0).columns)
+    assert df['patient_id'].is_unique and df['patient_id'].iloc[-1] == 'P03000'
+    assert df.dtypes.equals(pd.read_csv(RAW).dtypes)
+    assert a == generate_data.generate_rows(0, 3000, seed=7).to_csv(index=False)
+
+
+def test_generator_partitions_concatenate_to_single_file(tmp_path, monkeypatch):
+    """Parts written by any number of workers concatenate to the one-process file"""
+    import generate_data
+    monkeypatch.setattr(generate_data, 'BLOCK_ROWS', 500)
+    assert generate_data.partition_bounds(2600, 3) == [(0, 1000), (1000, 2000), (2000, 2600)]
+    assert generate_data.partition_bounds(400, 4) == [(0, 400)]
+
+    counts = generate_data.write_csv(tmp_path / 'full.csv', 2600, seed=3, chunk_size=700)
+    full = (tmp_path / 'full.csv').read_text()
+    for workers in (4, 2):
+        paths, part_counts = generate_data.write_partitions(
+            str(tmp_path / 'out.csv'), 2600, seed=3, chunk_size=300, workers=workers)
+        assert sorted(map(str, tmp_path.glob('out.part-*.csv'))) == paths
+        assert ''.join(open(p).read() for p in paths) == full
+        assert part_counts == counts
+
+
+def test_generate_sample_data_bulk_text_and_npy(tmp_path):
+    """Seeded block writer: same values in text and .npy, independent of format"""
+    from q2_process_metadata import generate_sample_data
+    config = {'sample_data_rows': '2500', 'sample_data_min': '18', 'sample_data_max': '75'}
+    generate_sample_data(str(tmp_path / 'a.csv'), config, seed=5, block_rows=1000)
+    generate_sample_data(str(tmp_path / 'b.csv'), config, seed=5, block_rows=1000)
+    generate_sample_data(str(tmp_path / 'a.npy'), config, seed=5, fmt='npy', block_rows=1000)
+
+    text = (tmp_path / 'a.csv').read_text()
+    assert text == (tmp_path / 'b.csv').read_text()
+    lines = text.split('\n')
+    assert lines[-1] == '' and len(lines) == 2501
+    values = np.array(lines[:-1], dtype=int)
+    assert values.min() >= 18 and values.max() <= 75
+    assert np.array_equal(np.load(tmp_path / 'a.npy'), values)
+
+
+def test_stream_statistics_matches_in_memory(tmp_path):
+    """Histogram statistics equal calculate_statistics / numpy on text and .npy files"""
+    from q2_process_metadata import calculate_statistics, generate_sample_data, stream_statistics
+    config = {'sample_data_rows': '1001', 'sample_data_min': '18', 'sample_data_max': '75'}
+    generate_sample_data(str(tmp_path / 's.csv'), config, seed=9)
+    generate_sample_data(str(tmp_path / 's.npy'), config, seed=9, fmt='npy')
+    data = [int(x) for x in (tmp_path / 's.csv').read_text().split()]
+
+    stats = stream_statistics(str(tmp_path / 's.csv'), config, block_bytes=64)
+    assert stream_statistics(str(tmp_path / 's.npy'), config) == stats
+    for key, value in calculate_statistics(data).items():
+        assert stats[key] == value and type(stats[key]) is type(value)
+    assert stats['p25'] == round(float(np.quantile(data, 0.25)), 2)
+    assert stats['variance'] == round(float(np.var(data, ddof=1)), 2)
+
+    (tmp_path / 'bad.csv').write_text('20\n99\n')
+    with pytest.raises(ValueError):
+        stream_statistics(str(tmp_path / 'bad.csv'), config)
+    (tmp_path / 'two.csv').write_text('20\n30 40\n')
+    with pytest.raises(ValueError, match='one integer per line'):
+        stream_statistics(str(tmp_path / 'two.csv'), config)
+
+
+def test_benchmark_records_and_flags_regressions():
+    """The harness measures each function and compare() reports slowdowns only past tolerance"""
+    import benchmark
+    results = benchmark.run_benchmarks([2000], ['clean_data', 'summarize_by_group'], repeat=1, seed=1)
+    assert [(r['function'], r['rows']) for r in results] == [('clean_data', 2000), ('summarize_by_group', 2000)]
+    assert all(r['seconds'] > 0 and r['peak_bytes'] > 0 for r in results)
+
+    baseline = [{'function': 'f', 'rows': 10, 'seconds': 1.0, 'peak_bytes': 100}]
+    same = [{'function': 'f', 'rows': 10, 'seconds': 1.2, 'peak_bytes': 120}]
+    slower = [{'function': 'f', 'rows': 10, 'seconds': 1.5, 'peak_bytes': 200},
+              {'function': 'g', 'rows': 10, 'seconds': 9.0, 'peak_bytes': 9}]
+    assert benchmark.compare(same, baseline) == []
+    assert len(benchmark.compare(slower, baseline)) == 2
+
+
+def test_perf_trace_records_calls_only_when_enabled(tmp_path, clinical_data):
+    """Traced utilities record time, rows and memory per call; nothing while disabled"""
+    import perf_trace
+    perf_trace.clear()
+    fill_missing(clinical_data, 'bmi', 'median')
+    assert perf_trace.records() == []
+
+    perf_trace.enable(str(tmp_path / 'trace.jsonl'))
+    try:
+        with perf_trace.stage('q5'):
+            filled = fill_missing(clinical_data, 'bmi', 'median')
+    finally:
+        perf_trace.disable()
+    outer, inner = sorted(perf_trace.records(), key=lambda r: r['depth'])
+    assert outer['function'] == 'q3_data_utils.fill_missing' and outer['depth'] == 0
+    assert inner['function'] == 'q3_data_utils.fill_missing_many' and inner['depth'] == 1
+    assert outer['stage'] == 'q5' and outer['rows_in'] == outer['rows_out'] == len(filled)
+    assert outer['peak_bytes'] >= inner['peak_bytes'] > 0 and outer['seconds'] >= inner['seconds']
+    assert perf_trace.read_records(str(tmp_path / 'trace.jsonl')) == perf_trace.records()
+
+    summary = perf_trace.summarize(perf_trace.records() * 2)
+    assert [g['calls'] for g in summary] == [2, 2]
+    assert summary[0]['rows_in'] == 2 * len(clinical_data)
+    perf_trace.clear()
+
+    perf_trace.enable(memory=False, max_records=3)
+    try:
+        for _ in range(5):
+            fill_missing(clinical_data, 'bmi', 'median')
+    finally:
+        perf_trace.disable()
+        perf_trace.enable(max_records=perf_trace.MAX_RECORDS)
+        perf_trace.disable()
+    assert len(perf_trace.records()) == 3
+    perf_trace.clear()
+
+
+def test_lazy_frame_matches_eager_calls(clinical_data):
+    """scan_csv plans give the eager results while reading only the needed columns"""
+    from q3_data_utils import scan_csv
+    filters = [{'column': 'site', 'condition': 'equals', 'value': 'Site A'},
+               {'any': [{'column': 'age', 'condition': 'less_than', 'value': 30},
+                        {'column': 'bmi', 'condition': 'greater_than', 'value': 30}]}]
+    lf = scan_csv(RAW, chunksize=1234)
+
+    eager = filter_data(clean_data(clinical_data), filters)
+    pd.testing.assert_frame_equal(lf.clean().filter(filters).collect(), eager)
+    pd.testing.assert_frame_equal(lf.clean().filter(filters).select(['bmi', 'age']).collect(),
+                                  eager[['bmi', 'age']])
+    pd.testing.assert_frame_equal(lf.filter(filters).clean().collect(),
+                                  clean_data(filter_data(clinical_data, filters)))
+
+    query = lf.clean(subset=['patient_id']).filter(filters).summarize(
+        'intervention_group', {'age': ['mean', 'count'], 'bmi': 'median'})
+    assert 'usecols=[\'patient_id\', \'age\', \'bmi\', \'site\', \'intervention_group\']' in query.explain()
+    pd.testing.assert_frame_equal(query.collect(), summarize_by_group(
+        filter_data(clean_data(clinical_data, subset=['patient_id']), filters),
+        'intervention_group', {'age': ['mean', 'count'], 'bmi': 'median'}))
+
+    with pytest.raises(ValueError):
+        query.select(['age'])
+    with pytest.raises(KeyError):
+        lf.filter([{'column': 'nope', 'condition': 'equals', 'value': 1}]).collect()
+
+
+def test_convert_csv_to_dataset_and_open_mapped(tmp_path):
+    """Chunked CSV conversion equals the typed load; open_dataset maps slices and columns"""
+    import pickle
+    from q3_data_utils import convert_csv_to_dataset, open_dataset
+    store = str(tmp_path / 'raw.store')
+    assert convert_csv_to_dataset(RAW, store, chunksize=999) == store
+    typed = load_data(RAW, schema=True, cache=False)
+    pd.testing.assert_frame_equal(load_dataset(store), typed)
+
+    ds = open_dataset(store)
+    assert len(ds) == len(typed) and ds.columns == list(typed.columns)
+    ages = ds.values('age')
+    assert isinstance(ages, np.memmap) and not ages.flags.writeable
+    assert np.array_equal(ds.nulls('age'), typed['age'].isna().to_numpy())
+    assert np.array_equal(ds.nulls('age', slice(5, 43)), typed['age'].isna().to_numpy()[5:43])
+    pd.testing.assert_frame_equal(ds[4321:4400], typed.iloc[4321:4400])
+    pd.testing.assert_series_equal(ds['site'], typed['site'])
+    pd.testing.assert_frame_equal(pickle.loads(pickle.dumps(ds))[['bmi', 'site']], typed[['bmi', 'site']])
+
+
+def test_run_job_per_file_and_combined(tmp_path, clinical_data):
+    """A job spec runs its steps over every matched input and writes the chosen format"""
+    from q3_data_utils import main, run_job
+    for i, site in enumerate(['Site A', 'Site B']):
+        clinical_data[clinical_data['site'] == site].to_csv(tmp_path / f'site_{i}.csv', index=False)
+    steps = [{'op': 'clean', 'sentinel_value': {'age': -999}},
+             {'op': 'filter', 'filters': [{'column': 'age', 'condition': 'greater_than', 'value': 40}]},
+             {'op': 'summarize', 'group_col': 'intervention_group', 'agg_dict': {'age': ['mean', 'count']}}]
+    spec = {'inputs': [str(tmp_path / 'site_*.csv')], 'steps': steps,
+            'output': {'path': str(tmp_path / 'out' / '{stem}.json')}}
+
+    written = run_job(spec, log=lambda line: None)
+    assert written == [str(tmp_path / 'out' / 'site_0.json'), str(tmp_path / 'out' / 'site_1.json')]
+    site_a = clinical_data[clinical_data['site'] == 'Site A'].reset_index(drop=True)
+    expected = summarize_by_group(filter_data(clean_data(site_a, sentinel_value={'age': -999}), steps[1]['filters']),
+                                  'intervention_group', {'age': ['mean', 'count']})
+    got = pd.read_json(written[0])
+    assert list(got.columns) == ['intervention_group', 'age_mean', 'age_count']
+    assert np.allclose(got['age_mean'], expected[('age', 'mean')])
+
+    spec['output'] = {'path': str(tmp_path / 'all.csv'), 'combine': True}
+    assert main([_write_json(tmp_path / 'job.json', spec)]) == 0
+    combined = pd.read_csv(tmp_path / 'all.csv')
+    assert combined['source'].nunique() == 2 and len(combined) == 2 * len(expected)
+    assert not list(tmp_path.glob('.*.cache')), "job inputs are not cached by default"
+
+    with pytest.raises(ValueError):
+        run_job(dict(spec, steps=[{'op': 'explode'}]))
+    with pytest.raises(ValueError, match='same file'):
+        run_job(dict(spec, output={'path': str(tmp_path / 'out.csv')}))
+    assert not (tmp_path / 'out.csv').exists()
+
+
+def _write_json(path, obj):
+    import json
+    path.write_text(json.dumps(obj))
+    return str(path)
+
+
+def test_summarize_text_columns_and_exact_integer_sums():
+    """Non-numeric columns use pandas; int sums stay exact past 2**53; huge key spaces work"""
+    df = pd.read_csv(RAW)
+    got = summarize_by_group(df, 'site', {'patient_id': ['count', 'min', 'max']})
+    expected = df.groupby('site')['patient_id'].agg(['count', 'min', 'max'])
+    assert got[('patient_id', 'count')].tolist() == expected['count'].tolist()
+    assert got[('patient_id', 'max')].tolist() == expected['max'].tolist()
+
+    big = pd.DataFrame({'k': ['a', 'a', 'b'], 'v': np.array([2**62, 2**53 + 1, 5], dtype=np.int64)})
+    assert summarize_by_group(big, 'k', {'v': 'sum'})['v'].tolist() == [2**62 + 2**53 + 1, 5]
+
+    rng = np.random.default_rng(0)
+    wide = pd.DataFrame({f'k{i}': rng.permutation(70_000) for i in range(4)})   # 70000**4 > 2**63
+    keys = GroupKeys(wide, ['k0', 'k1', 'k2', 'k3'])
+    assert keys.ngroups == 70_000
+    assert keys.keys['k0'].tolist() == sorted(wide['k0'])
+
+
+def test_summarize_keeps_nullable_integer_dtypes():
+    """sum/min/max of nullable Int columns come back typed like groupby's"""
+    df = pd.DataFrame({'k': ['a', 'a', 'b', 'c'],
+                       'v': pd.array([1, None, -999, None], dtype='Int16')})
+    agg = {'v': ['sum', 'min', 'max']}
+    got = summarize_by_group(df, 'k', agg)
+    pd.testing.assert_frame_equal(got, df.groupby('k').agg(agg).reset_index())
+    assert got[('v', 'min')].dtype == 'Int16' and got[('v', 'min')].isna().tolist() == [False, False, True]
+
+
+def test_load_data_accepts_buffers():
+    """Inputs that are not local files skip the cache and are parsed by read_csv"""
+    import io
+    text = open(RAW).read()
+    pd.testing.assert_frame_equal(load_data(io.StringIO(text)), pd.read_csv(RAW))
+    typed = load_data(io.StringIO(text), schema=True)
+    assert str(typed['age'].dtype) == 'Int16'
+
+
+def test_q3_imports_without_perf_trace(tmp_path):
+    """perf_trace is optional: q3_data_utils.py and its command line run without it"""
+    import shutil
+    import subprocess
+    import sys
+    shutil.copy('q3_data_utils.py', tmp_path)
+    shutil.copy('run_jobs.py', tmp_path)
+    proc = subprocess.run([sys.executable, 'q3_data_utils.py'], cwd=tmp_path,
+                          capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert 'summarize_by_group()' in proc.stdout
+
+
+def test_run_jobs_starts_without_pandas():
+    """The command line only imports pandas (through q3_data_utils) when a job runs"""
+    import subprocess
+    import sys
+    code = ('import sys, run_jobs; run_jobs.main([]); '
+            'print(sorted(m for m in ("pandas", "numpy", "q3_data_utils") if m in sys.modules))')
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip().endswith('[]')
+
+
+def test_q2_imports_without_perf_trace(tmp_path):
+    """q2_process_metadata.py also runs uninstrumented when perf_trace is missing"""
+    import shutil
+    import subprocess
+    import sys
+    shutil.copy('q2_process_metadata.py', tmp_path)
+    proc = subprocess.run([sys.executable, '-c', 'import q2_process_metadata as q2; '
+                           'print(q2.calculate_statistics([1, 2, 3]))'],
+                          cwd=tmp_path, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+
+
+def test_parse_dates_fallback_without_mixed_format(monkeypatch):
+    """The per-value fallback for pandas < 2 parses the same dates as format='mixed'"""
+    values = pd.Series(['2023-01-05', 'March 3, 2022', '2022/07/08 10:30', 'garbage', None])
+    modern = q3_data_utils.parse_dates(values)
+    monkeypatch.setattr(q3_data_utils, '_PANDAS_MAJOR', 1)
+    legacy = q3_data_utils.parse_dates(values)
+    pd.testing.assert_series_equal(legacy.astype('datetime64[ns]'), modern.astype('datetime64[ns]'))
+    assert legacy.isna().tolist() == [False, False, False, True, True]
+
+
+def test_canonicalize_categories_shares_untouched_columns(clinical_data):
+    """Only the canonicalized columns are new; the others share the input's buffers"""
+    before = clinical_data['site'].copy()
+    out = canonicalize_categories(clinical_data)
+    assert np.shares_memory(out['age'].to_numpy(), clinical_data['age'].to_numpy())
+    assert isinstance(out['site'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_series_equal(clinical_data['site'], before)
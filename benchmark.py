@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Q3 data utilities at several dataset sizes.
+
+Inputs are drawn from generate_data.py's distribution (the same seed gives
+the same rows), written to a temporary CSV for load_data, and every
+function is timed on them: the best wall time of --repeat runs, plus the
+peak memory of one extra run under tracemalloc (which sees Python and
+NumPy allocations). Results go to reports/benchmark_results.json.
+
+When a baseline exists, each (function, rows) result is compared with it
+and the script exits with status 1 if any of them got slower or bigger
+than the tolerance allows. Record a baseline on the machine you compare
+on with --update-baseline.
+
+Usage:
+    python3 benchmark.py                               # 10K, 1M and 10M rows
+    python3 benchmark.py --rows 10000 --repeat 5       # quick check
+    python3 benchmark.py --update-baseline             # accept current numbers
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import generate_data
+from q3_data_utils import (clean_data, create_bins, detect_missing, fill_missing, filter_data,
+                           load_data, summarize_by_group, transform_types)
+
+RESULTS = "reports/benchmark_results.json"
+BASELINE = "reports/benchmark_baseline.json"
+SCALES = [10_000, 1_000_000, 10_000_000]
+
+# Differences below this many seconds are timer noise, not regressions.
+MIN_SECONDS = 0.005
+
+FILTERS = [{"column": "age", "condition": "greater_than", "value": 50},
+           {"column": "site", "condition": "equals", "value": "Site A"}]
+
+# name -> call on the inputs built by build_inputs()
+CASES = {
+    "load_data": lambda d: load_data(d["csv"], cache=False),
+    "load_data_cached": lambda d: load_data(d["csv"], cache=True),
+    "clean_data": lambda d: clean_data(d["raw"]),
+    "detect_missing": lambda d: detect_missing(d["raw"]),
+    "fill_missing": lambda d: fill_missing(d["clean"], "bmi", "median"),
+    "filter_data": lambda d: filter_data(d["clean"], FILTERS),
+    # transform_types assigns converted columns into its argument; a shallow
+    # copy keeps the shared raw frame unconverted without timing a deep copy
+    "transform_types": lambda d: transform_types(
+        d["raw"].copy(deep=False), {"enrollment_date": "datetime", "site": "category", "age": "numeric"}),
+    "create_bins": lambda d: create_bins(d["clean"], "age", [0, 40, 60, 100], ["<40", "40-59", "60+"]),
+    "summarize_by_group": lambda d: summarize_by_group(
+        d["clean"], "site", {"age": ["mean", "count"], "bmi": ["mean", "std"]}),
+}
+
+
+def build_inputs(rows: int, seed: int, workdir: str) -> dict:
+    """Raw and cleaned frames of `rows` generated patients, and their CSV."""
+    csv = os.path.join(workdir, f"patients_{rows}.csv")
+    generate_data.write_csv(csv, rows, seed)
+    raw = pd.read_csv(csv)
+    inputs = {"csv": csv, "raw": raw, "clean": clean_data(raw)}
+    load_data(csv, cache=True)  # builds the cache load_data_cached reads
+    return inputs
+
+
+def measure(fn, repeat: int) -> dict:
+    """Best wall time of `repeat` calls, and the peak traced memory of one more."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(seconds), "peak_bytes": peak}
+
+
+def run_benchmarks(scales: list = SCALES, functions: list = None, repeat: int = 3,
+                   seed: int = 42) -> list:
+    """
+    Time every selected function at every scale.
+
+    Args:
+        scales: Row counts to benchmark
+        functions: Names from CASES (default: all)
+        repeat: Timed runs per function; the fastest is kept
+        seed: generate_data seed for the inputs
+
+    Returns:
+        list: One {function, rows, seconds, peak_bytes} record per measurement
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in scales:
+            inputs = build_inputs(rows, seed, workdir)
+            for name in functions or CASES:
+                record = {"function": name, "rows": rows, **measure(lambda: CASES[name](inputs), repeat)}
+                print(f"  {name:<20} {rows:>11,} rows  {record['seconds']:9.4f}s  "
+                      f"{record['peak_bytes'] / 2**20:9.1f} MiB peak")
+                results.append(record)
+    return results
+
+
+def compare(results: list, baseline: list, time_tolerance: float = 0.25,
+            memory_tolerance: float = 0.25) -> list:
+    """
+    Regressions of results against a baseline.
+
+    Args:
+        results: Records from run_benchmarks
+        baseline: Records of an earlier run; measurements missing from
+                  either side are ignored
+        time_tolerance: Allowed relative slowdown (0.25 = 25%)
+        memory_tolerance: Allowed relative growth of peak memory
+
+    Returns:
+        list: One message per regression (empty if none)
+    """
+    before = {(r["function"], r["rows"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        base = before.get((r["function"], r["rows"]))
+        if base is None:
+            continue
+        label = f"{r['function']} @ {r['rows']:,} rows"
+        if (r["seconds"] > base["seconds"] * (1 + time_tolerance)
+                and r["seconds"] - base["seconds"] > MIN_SECONDS):
+            regressions.append(f"{label}: {base['seconds']:.4f}s -> {r['seconds']:.4f}s")
+        if r["peak_bytes"] > base["peak_bytes"] * (1 + memory_tolerance):
+            regressions.append(f"{label}: peak {base['peak_bytes'] / 2**20:.1f} MiB -> "
+                               f"{r['peak_bytes'] / 2**20:.1f} MiB")
+    return regressions
+
+
+def write_results(path: str, results: list) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Q3 data utilities.")
+    parser.add_argument("--rows", type=int, nargs="+", default=SCALES, help="dataset sizes to run")
+    parser.add_argument("--functions", nargs="+", choices=list(CASES), help="functions to run (default all)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per function (default 3)")
+    parser.add_argument("--seed", type=int, default=42, help="generate_data seed (default 42)")
+    parser.add_argument("--output", default=RESULTS, help="where to write the results JSON")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="allowed slowdown (default 0.25)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25,
+                        help="allowed peak-memory growth (default 0.25)")
+    args = parser.parse_args(argv)
+    if args.repeat < 1 or min(args.rows) < 1:
+        parser.error("--rows and --repeat must be positive")
+
+    results = run_benchmarks(args.rows, args.functions, args.repeat, args.seed)
+    write_results(args.output, results)
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        write_results(args.baseline, results)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print(f"\nREGRESSIONS against {args.baseline}:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"No regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
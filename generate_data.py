@@ -7,29 +7,42 @@ Hidden variables drive the realistic patterns:
 - Treatment response propensity
 - Site quality
 - Patient engagement level
+
+Rows are generated in fixed blocks of BLOCK_ROWS patients, each from its
+own random stream np.random.default_rng([seed, block]), with every step
+vectorized. A block's rows depend only on the seed and the block number,
+so the output is identical for any --chunk-size (which only sets how many
+rows are held in memory and written at a time), and a smaller --rows
+gives a prefix of a larger run.
+
+With --workers N the patient range is cut at block boundaries into up to N
+contiguous parts, each written by its own process to
+<output stem>.part-NNNNN<ext>. Only the first part has the CSV header, so
+concatenating the parts in order (cat data/load_test.part-*.csv) gives
+byte for byte the file a single process writes, whatever N was.
+
+Usage:
+    python3 generate_data.py                                   # 10,000 patients
+    python3 generate_data.py --rows 10000000 --output data/load_test.csv
+    python3 generate_data.py --rows 300000000 --workers 16 --output data/load_test.csv
 """
 
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-
-# Set seed for reproducibility
-np.random.seed(42)
-
-# Number of patients
-N = 10000
-
-print(f"Generating clinical trial data for {N} patients...")
 
-# ============================================================================
-# HIDDEN VARIABLES (drive realistic correlations, not observed in final data)
-# ============================================================================
+# Patients per random stream; part of the dataset's definition (with the seed)
+BLOCK_ROWS = 65_536
 
-# Hidden: Underlying CV health (0-1, lower is worse)
-cv_health = np.random.beta(5, 2, N)  # Skewed toward healthier
+START_DATE = np.datetime64('2022-01-01')
+ENROLLMENT_DAYS = 730
 
-# Hidden: Treatment response propensity (0-1, higher responds better)
-treatment_response = np.random.beta(2, 2, N)  # Centered distribution
+SITES = ['Site A', 'Site B', 'Site C', 'Site D', 'Site E']
+GROUPS = ['Control', 'Treatment A', 'Treatment B']
 
 # Hidden: Site quality (affects data completeness and accuracy)
 site_quality = {
@@ -40,197 +53,6 @@ site_quality = {
     'Site E': 0.60   # Poor (more missing data)
 }
 
-# Hidden: Patient engagement (affects adherence and follow-up)
-engagement = np.random.beta(3, 2, N)  # Skewed toward engaged
-
-# ============================================================================
-# PATIENT DEMOGRAPHICS
-# ============================================================================
-
-# Age: realistic distribution for CVD trial (0-100, peak ~60)
-# Students will filter to 18-85 using filter_data() utility
-age = np.random.gamma(8, 6, N) + 35
-age = np.clip(age, 0, 100).astype(int)
-
-# Sex: roughly balanced
-sex = np.random.choice(['M', 'F'], N, p=[0.48, 0.52])
-
-# BMI: correlated with CV health (worse health -> higher BMI)
-bmi_base = 22 + (1 - cv_health) * 15 + np.random.normal(0, 3, N)
-bmi = np.clip(bmi_base, 16, 45).round(1)
-
-# Patient ID
-patient_id = [f'P{i:05d}' for i in range(1, N+1)]
-
-# ============================================================================
-# TRIAL INFORMATION
-# ============================================================================
-
-# Site: unequal enrollment (Site A enrolled most, Site E least)
-site_probs = [0.30, 0.25, 0.20, 0.15, 0.10]
-site = np.random.choice(['Site A', 'Site B', 'Site C', 'Site D', 'Site E'],
-                        N, p=site_probs)
-
-# Get site quality for each patient
-site_quality_values = np.array([site_quality[s] for s in site])
-
-# Enrollment date: spread over 2 years
-start_date = datetime(2022, 1, 1)
-enrollment_date = [start_date + timedelta(days=int(x))
-                   for x in np.random.uniform(0, 730, N)]
-enrollment_date_str = [d.strftime('%Y-%m-%d') for d in enrollment_date]
-
-# Intervention group: balanced randomization
-intervention_group = np.random.choice(['Control', 'Treatment A', 'Treatment B'],
-                                     N, p=[0.33, 0.33, 0.34])
-
-# Follow-up months: more recent enrollees have less follow-up
-days_since_enrollment = [(datetime(2024, 1, 1) - d).days for d in enrollment_date]
-follow_up_months = np.clip(np.array(days_since_enrollment) / 30, 0, 24).round(0).astype(int)
-
-# ============================================================================
-# CLINICAL MEASUREMENTS (correlated with CV health)
-# ============================================================================
-
-# Systolic BP: higher when CV health is poor
-systolic_bp_base = 110 + (1 - cv_health) * 40 + np.random.normal(0, 12, N)
-systolic_bp = np.clip(systolic_bp_base, 90, 200).round(0).astype(int)
-
-# Diastolic BP: correlated with systolic (roughly 60% of systolic)
-diastolic_bp_base = systolic_bp * 0.6 + np.random.normal(0, 8, N)
-diastolic_bp = np.clip(diastolic_bp_base, 60, 120).round(0).astype(int)
-
-# Total cholesterol: higher when CV health is poor
-cholesterol_total_base = 160 + (1 - cv_health) * 80 + np.random.normal(0, 30, N)
-cholesterol_total = np.clip(cholesterol_total_base, 120, 350).round(0).astype(int)
-
-# HDL cholesterol: higher when CV health is good (protective)
-cholesterol_hdl_base = 40 + cv_health * 30 + np.random.normal(0, 10, N)
-cholesterol_hdl = np.clip(cholesterol_hdl_base, 25, 100).round(0).astype(int)
-
-# LDL cholesterol: roughly total - HDL - 20% (VLDL estimate)
-cholesterol_ldl = np.clip(cholesterol_total - cholesterol_hdl - cholesterol_total * 0.2,
-                          40, 250).round(0).astype(int)
-
-# Fasting glucose: higher when CV health is poor (metabolic syndrome)
-glucose_fasting_base = 85 + (1 - cv_health) * 50 + np.random.normal(0, 15, N)
-glucose_fasting = np.clip(glucose_fasting_base, 70, 250).round(0).astype(int)
-
-# ============================================================================
-# TREATMENT EFFECTS (for Treatment A and Treatment B)
-# ============================================================================
-
-# Treatment A: reduces BP and cholesterol (if patient responds)
-treatment_a_effect = (intervention_group == 'Treatment A') * treatment_response
-systolic_bp = (systolic_bp - treatment_a_effect * 15).round(0).astype(int)
-cholesterol_total = (cholesterol_total - treatment_a_effect * 30).round(0).astype(int)
-
-# Treatment B: reduces glucose primarily (if patient responds)
-treatment_b_effect = (intervention_group == 'Treatment B') * treatment_response
-glucose_fasting = (glucose_fasting - treatment_b_effect * 20).round(0).astype(int)
-systolic_bp = (systolic_bp - treatment_b_effect * 8).round(0).astype(int)
-
-# ============================================================================
-# OUTCOMES (driven by CV health and treatment effects)
-# ============================================================================
-
-# CVD event probability: driven by CV health, age, and treatment
-cvd_risk = (1 - cv_health) * 0.3 + (age - 40) / 200 - treatment_a_effect * 0.1 - treatment_b_effect * 0.05
-cvd_risk = np.clip(cvd_risk, 0, 0.4)
-outcome_cvd = np.random.random(N) < cvd_risk
-outcome_cvd_str = ['Yes' if x else 'No' for x in outcome_cvd]
-
-# Adherence: driven by engagement, site quality, and side effects
-adherence_pct_base = engagement * 85 + site_quality_values * 10 + np.random.normal(0, 10, N)
-adherence_pct = np.clip(adherence_pct_base, 20, 100).round(0).astype(int)
-
-# Adverse events: higher with poor CV health and in treatment groups
-adverse_events_rate = (1 - cv_health) * 0.02 + (intervention_group != 'Control') * 0.01
-adverse_events = np.random.poisson(adverse_events_rate * follow_up_months)
-
-# Dropout: more likely with low engagement, long follow-up, and adverse events
-dropout_risk = (1 - engagement) * 0.3 + (adverse_events > 2) * 0.2 + (follow_up_months > 18) * 0.1
-dropout = np.random.random(N) < dropout_risk
-dropout_str = ['Yes' if x else 'No' for x in dropout]
-
-# ============================================================================
-# INJECT REALISTIC DATA QUALITY ISSUES
-# ============================================================================
-
-# Make a DataFrame
-df = pd.DataFrame({
-    'patient_id': patient_id,
-    'age': age,
-    'sex': sex,
-    'bmi': bmi,
-    'enrollment_date': enrollment_date_str,
-    'systolic_bp': systolic_bp,
-    'diastolic_bp': diastolic_bp,
-    'cholesterol_total': cholesterol_total,
-    'cholesterol_hdl': cholesterol_hdl,
-    'cholesterol_ldl': cholesterol_ldl,
-    'glucose_fasting': glucose_fasting,
-    'site': site,
-    'intervention_group': intervention_group,
-    'follow_up_months': follow_up_months,
-    'adverse_events': adverse_events,
-    'outcome_cvd': outcome_cvd_str,
-    'adherence_pct': adherence_pct,
-    'dropout': dropout_str
-})
-
-print(f"Generated clean data: {df.shape}")
-
-# ============================================================================
-# DATA QUALITY ISSUES (realistic clinical data problems)
-# ============================================================================
-
-# 1. MISSING DATA (more missing at lower-quality sites)
-print("\nInjecting missing data...")
-
-# BMI missing (5-15% depending on site quality)
-missing_bmi_prob = 0.15 - site_quality_values * 0.1
-missing_bmi = np.random.random(N) < missing_bmi_prob
-df.loc[missing_bmi, 'bmi'] = np.nan
-
-# Blood pressure missing (equipment issues, skipped visits)
-missing_bp_prob = 0.08 - site_quality_values * 0.05
-missing_bp = np.random.random(N) < missing_bp_prob
-df.loc[missing_bp, 'systolic_bp'] = np.nan
-df.loc[missing_bp, 'diastolic_bp'] = np.nan
-
-# Cholesterol panel missing (expensive test, not always done)
-missing_chol_prob = 0.12 - site_quality_values * 0.08
-missing_chol = np.random.random(N) < missing_chol_prob
-df.loc[missing_chol, 'cholesterol_total'] = np.nan
-df.loc[missing_chol, 'cholesterol_hdl'] = np.nan
-df.loc[missing_chol, 'cholesterol_ldl'] = np.nan
-
-# Glucose missing (fasting requirement not always met)
-missing_glucose_prob = 0.06 - site_quality_values * 0.03
-missing_glucose = np.random.random(N) < missing_glucose_prob
-df.loc[missing_glucose, 'glucose_fasting'] = np.nan
-
-# Follow-up data missing for dropouts
-df.loc[df['dropout'] == 'Yes', 'adherence_pct'] = np.nan
-
-# 2. SENTINEL VALUES (data entry system codes)
-print("Injecting sentinel values...")
-
-# Age: -999 for missing (old data entry system)
-sentinel_age = np.random.choice(df.index, size=int(N * 0.02), replace=False)
-df.loc[sentinel_age, 'age'] = -999
-
-# BMI: -1 sometimes used instead of NaN
-sentinel_bmi = df[df['bmi'].isna()].sample(frac=0.3).index
-df.loc[sentinel_bmi, 'bmi'] = -1
-
-# 3. DATA ENTRY ERRORS (removed - not covered in assignment)
-# Note: BP swaps and BMI as weight errors removed as they're not part of the assignment scope
-
-# 4. TEXT INCONSISTENCIES
-print("Injecting text inconsistencies...")
-
 # Site names: inconsistent capitalization
 site_variations = {
     'Site A': ['Site A', 'SITE A', 'site a', 'Site  A'],
@@ -240,18 +62,6 @@ site_variations = {
     'Site E': ['Site E', 'SITE E', 'site e']
 }
 
-for site_name, variations in site_variations.items():
-    site_mask = df['site'] == site_name
-    site_indices = df[site_mask].index
-    for idx in site_indices:
-        df.loc[idx, 'site'] = np.random.choice(variations)
-
-# Sex: M/F vs Male/Female
-male_mask = df['sex'] == 'M'
-female_mask = df['sex'] == 'F'
-df.loc[male_mask.sample(frac=0.3).index, 'sex'] = 'Male'
-df.loc[female_mask.sample(frac=0.3).index, 'sex'] = 'Female'
-
 # Intervention group: typos and spacing
 intervention_variations = {
     'Control': ['Control', 'control', 'CONTROL', 'Contrl'],
@@ -259,62 +69,356 @@ intervention_variations = {
     'Treatment B': ['Treatment B', 'TREATMENT B', 'treatment b', 'Treatment  B']
 }
 
-for group_name, variations in intervention_variations.items():
-    group_mask = df['intervention_group'] == group_name
-    group_indices = df[group_mask].index
-    for idx in group_indices:
-        df.loc[idx, 'intervention_group'] = np.random.choice(variations)
-
-# Outcome CVD: Yes/No variations
-yes_mask = df['outcome_cvd'] == 'Yes'
-no_mask = df['outcome_cvd'] == 'No'
-df.loc[yes_mask.sample(frac=0.2).index, 'outcome_cvd'] = 'yes'
-df.loc[no_mask.sample(frac=0.2).index, 'outcome_cvd'] = 'no'
-
-# 5. DATE FORMAT INCONSISTENCIES
-print("Injecting date format issues...")
-
-# Some dates in different formats
-date_sample = df.sample(frac=0.15).index
-for idx in date_sample:
-    original_date = enrollment_date[idx]
-    # Random format: MM/DD/YYYY or DD-MM-YYYY
-    if np.random.random() < 0.5:
-        df.loc[idx, 'enrollment_date'] = original_date.strftime('%m/%d/%Y')
+
+def _variant_table(variations: dict, names: list):
+    """(2-D array of spellings per canonical value, number of spellings per value)."""
+    width = max(len(v) for v in variations.values())
+    table = np.array([variations[n] + [''] * (width - len(variations[n])) for n in names], dtype=object)
+    return table, np.array([len(variations[n]) for n in names])
+
+
+SITE_TABLE, SITE_COUNTS = _variant_table(site_variations, SITES)
+GROUP_TABLE, GROUP_COUNTS = _variant_table(intervention_variations, GROUPS)
+SITE_QUALITY = np.array([site_quality[s] for s in SITES])
+
+# The 730 possible enrollment dates in each layout: YYYY-MM-DD, MM/DD/YYYY, DD-MM-YYYY
+_dates = pd.date_range(str(START_DATE), periods=ENROLLMENT_DAYS, freq='D')
+DATE_TABLE = np.array([_dates.strftime(fmt) for fmt in ('%Y-%m-%d', '%m/%d/%Y', '%d-%m-%Y')], dtype=object)
+
+
+def _with_spaces(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    out = values.copy()
+    out[mask] = ['  ' + v + '  ' for v in values[mask]]
+    return out
+
+
+def generate_block(block: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Generate the BLOCK_ROWS patients of one block.
+
+    Args:
+        block: Block number; patients block * BLOCK_ROWS + 1 onwards
+        seed: Dataset seed
+
+    Returns:
+        pd.DataFrame: One row per patient, columns as in the raw CSV
+    """
+    rng = np.random.default_rng([seed, block])
+    N = BLOCK_ROWS
+
+    # ========================================================================
+    # HIDDEN VARIABLES (drive realistic correlations, not observed in final data)
+    # ========================================================================
+
+    # Hidden: Underlying CV health (0-1, lower is worse)
+    cv_health = rng.beta(5, 2, N)  # Skewed toward healthier
+
+    # Hidden: Treatment response propensity (0-1, higher responds better)
+    treatment_response = rng.beta(2, 2, N)  # Centered distribution
+
+    # Hidden: Patient engagement (affects adherence and follow-up)
+    engagement = rng.beta(3, 2, N)  # Skewed toward engaged
+
+    # ========================================================================
+    # PATIENT DEMOGRAPHICS
+    # ========================================================================
+
+    # Age: realistic distribution for CVD trial (0-100, peak ~60)
+    # Students will filter to 18-85 using filter_data() utility
+    age = np.clip(rng.gamma(8, 6, N) + 35, 0, 100).astype(int)
+
+    # Sex: roughly balanced
+    male = rng.random(N) < 0.48
+
+    # BMI: correlated with CV health (worse health -> higher BMI)
+    bmi = np.clip(22 + (1 - cv_health) * 15 + rng.normal(0, 3, N), 16, 45).round(1)
+
+    # Patient ID
+    ids = np.arange(block * N + 1, block * N + N + 1)
+    patient_id = np.char.add('P', np.char.zfill(ids.astype(str), 5)).astype(object)
+
+    # ========================================================================
+    # TRIAL INFORMATION
+    # ========================================================================
+
+    # Site: unequal enrollment (Site A enrolled most, Site E least)
+    site = rng.choice(len(SITES), N, p=[0.30, 0.25, 0.20, 0.15, 0.10])
+    site_quality_values = SITE_QUALITY[site]
+
+    # Enrollment date: spread over 2 years
+    enrollment_day = rng.uniform(0, ENROLLMENT_DAYS, N).astype(int)
+
+    # Intervention group: balanced randomization
+    group = rng.choice(len(GROUPS), N, p=[0.33, 0.33, 0.34])
+
+    # Follow-up months: more recent enrollees have less follow-up
+    follow_up_months = np.clip((ENROLLMENT_DAYS - enrollment_day) / 30, 0, 24).round(0).astype(int)
+
+    # ========================================================================
+    # CLINICAL MEASUREMENTS (correlated with CV health)
+    # ========================================================================
+
+    # Systolic BP: higher when CV health is poor
+    systolic_bp = np.clip(110 + (1 - cv_health) * 40 + rng.normal(0, 12, N), 90, 200).round(0).astype(int)
+
+    # Diastolic BP: correlated with systolic (roughly 60% of systolic)
+    diastolic_bp = np.clip(systolic_bp * 0.6 + rng.normal(0, 8, N), 60, 120).round(0).astype(int)
+
+    # Total cholesterol: higher when CV health is poor
+    cholesterol_total = np.clip(160 + (1 - cv_health) * 80 + rng.normal(0, 30, N), 120, 350).round(0).astype(int)
+
+    # HDL cholesterol: higher when CV health is good (protective)
+    cholesterol_hdl = np.clip(40 + cv_health * 30 + rng.normal(0, 10, N), 25, 100).round(0).astype(int)
+
+    # LDL cholesterol: roughly total - HDL - 20% (VLDL estimate)
+    cholesterol_ldl = np.clip(cholesterol_total - cholesterol_hdl - cholesterol_total * 0.2,
+                              40, 250).round(0).astype(int)
+
+    # Fasting glucose: higher when CV health is poor (metabolic syndrome)
+    glucose_fasting = np.clip(85 + (1 - cv_health) * 50 + rng.normal(0, 15, N), 70, 250).round(0).astype(int)
+
+    # ========================================================================
+    # TREATMENT EFFECTS (for Treatment A and Treatment B)
+    # ========================================================================
+
+    # Treatment A: reduces BP and cholesterol (if patient responds)
+    treatment_a_effect = (group == 1) * treatment_response
+    systolic_bp = (systolic_bp - treatment_a_effect * 15).round(0).astype(int)
+    cholesterol_total = (cholesterol_total - treatment_a_effect * 30).round(0).astype(int)
+
+    # Treatment B: reduces glucose primarily (if patient responds)
+    treatment_b_effect = (group == 2) * treatment_response
+    glucose_fasting = (glucose_fasting - treatment_b_effect * 20).round(0).astype(int)
+    systolic_bp = (systolic_bp - treatment_b_effect * 8).round(0).astype(int)
+
+    # ========================================================================
+    # OUTCOMES (driven by CV health and treatment effects)
+    # ========================================================================
+
+    # CVD event probability: driven by CV health, age, and treatment
+    cvd_risk = (1 - cv_health) * 0.3 + (age - 40) / 200 - treatment_a_effect * 0.1 - treatment_b_effect * 0.05
+    outcome_cvd = rng.random(N) < np.clip(cvd_risk, 0, 0.4)
+
+    # Adherence: driven by engagement, site quality, and side effects
+    adherence_pct = np.clip(engagement * 85 + site_quality_values * 10 + rng.normal(0, 10, N),
+                            20, 100).round(0).astype(int)
+
+    # Adverse events: higher with poor CV health and in treatment groups
+    adverse_events_rate = (1 - cv_health) * 0.02 + (group != 0) * 0.01
+    adverse_events = rng.poisson(adverse_events_rate * follow_up_months)
+
+    # Dropout: more likely with low engagement, long follow-up, and adverse events
+    dropout_risk = (1 - engagement) * 0.3 + (adverse_events > 2) * 0.2 + (follow_up_months > 18) * 0.1
+    dropout = rng.random(N) < dropout_risk
+
+    # ========================================================================
+    # DATA QUALITY ISSUES (realistic clinical data problems)
+    # ========================================================================
+
+    # 1. MISSING DATA (more missing at lower-quality sites)
+    # Measurements with missing values are float columns, as in the original file
+    bmi = np.where(rng.random(N) < 0.15 - site_quality_values * 0.1, np.nan, bmi)
+    missing_bp = rng.random(N) < 0.08 - site_quality_values * 0.05
+    missing_chol = rng.random(N) < 0.12 - site_quality_values * 0.08
+    missing_glucose = rng.random(N) < 0.06 - site_quality_values * 0.03
+
+    def with_missing(values, mask):
+        return np.where(mask, np.nan, values.astype(float))
+
+    # 2. SENTINEL VALUES (data entry system codes)
+    # Age: -999 for missing (old data entry system)
+    age = np.where(rng.random(N) < 0.02, -999, age)
+    # BMI: -1 sometimes used instead of NaN
+    bmi = np.where(np.isnan(bmi) & (rng.random(N) < 0.3), -1.0, bmi)
+
+    # 4. TEXT INCONSISTENCIES (one spelling drawn per patient)
+    site_text = SITE_TABLE[site, (rng.random(N) * SITE_COUNTS[site]).astype(int)]
+    group_text = GROUP_TABLE[group, (rng.random(N) * GROUP_COUNTS[group]).astype(int)]
+    long_form = rng.random(N) < 0.3  # Sex: M/F vs Male/Female
+    sex_text = np.where(male, np.where(long_form, 'Male', 'M'), np.where(long_form, 'Female', 'F')).astype(object)
+    lower = rng.random(N) < 0.2  # Outcome CVD: Yes/No variations
+    outcome_text = np.where(outcome_cvd, np.where(lower, 'yes', 'Yes'), np.where(lower, 'no', 'No')).astype(object)
+
+    # 5. DATE FORMAT INCONSISTENCIES: 15% in MM/DD/YYYY or DD-MM-YYYY
+    layout = np.where(rng.random(N) < 0.15, 1 + (rng.random(N) < 0.5), 0)
+    enrollment_date = DATE_TABLE[layout, enrollment_day]
+
+    # 6. WHITESPACE IN TEXT FIELDS: random leading/trailing spaces on ~10%
+    site_text = _with_spaces(site_text, rng.random(N) < 0.1)
+    group_text = _with_spaces(group_text, rng.random(N) < 0.1)
+    sex_text = _with_spaces(sex_text, rng.random(N) < 0.1)
+
+    return pd.DataFrame({
+        'patient_id': patient_id,
+        'age': age,
+        'sex': sex_text,
+        'bmi': bmi,
+        'enrollment_date': enrollment_date,
+        'systolic_bp': with_missing(systolic_bp, missing_bp),
+        'diastolic_bp': with_missing(diastolic_bp, missing_bp),
+        'cholesterol_total': with_missing(cholesterol_total, missing_chol),
+        'cholesterol_hdl': with_missing(cholesterol_hdl, missing_chol),
+        'cholesterol_ldl': with_missing(cholesterol_ldl, missing_chol),
+        'glucose_fasting': with_missing(glucose_fasting, missing_glucose),
+        'site': site_text,
+        'intervention_group': group_text,
+        'follow_up_months': follow_up_months,
+        'adverse_events': adverse_events,
+        'outcome_cvd': outcome_text,
+        # Follow-up data missing for dropouts
+        'adherence_pct': with_missing(adherence_pct, dropout),
+        'dropout': np.where(dropout, 'Yes', 'No').astype(object),
+    })
+
+
+def generate_rows(start: int, stop: int, seed: int = 42) -> pd.DataFrame:
+    """Patients start+1 .. stop (0-based row positions [start, stop)) of the dataset."""
+    blocks = [generate_block(b, seed) for b in range(start // BLOCK_ROWS, (stop - 1) // BLOCK_ROWS + 1)]
+    df = pd.concat(blocks, ignore_index=True) if len(blocks) > 1 else blocks[0]
+    offset = start - (start // BLOCK_ROWS) * BLOCK_ROWS
+    return df.iloc[offset:offset + stop - start].reset_index(drop=True)
+
+
+def _as_text(values: np.ndarray) -> list:
+    """CSV text of a column, as DataFrame.to_csv writes it (NaN -> '').
+
+    Numeric columns have few distinct values, so each distinct value is
+    formatted once and the rest is a table lookup.
+    """
+    if values.dtype == object:
+        return values.tolist()
+    uniques, inverse = np.unique(values, return_inverse=True)
+    if values.dtype.kind == 'f':
+        text = np.array(['' if np.isnan(u) else str(float(u)) for u in uniques], dtype=object)
+    else:
+        text = np.array([str(int(u)) for u in uniques], dtype=object)
+    return text[inverse.ravel()].tolist()
+
+
+def to_csv_text(df: pd.DataFrame, header: bool = True) -> str:
+    """The CSV text DataFrame.to_csv(index=False) would write, several times faster.
+
+    Only valid for generated frames: no field contains a comma, quote or newline.
+    """
+    columns = [_as_text(df[col].to_numpy()) for col in df.columns]
+    lines = map(','.join, zip(*columns))
+    return (','.join(df.columns) + '\n' if header else '') + '\n'.join(lines) + '\n'
+
+
+def write_csv(path: str, rows: int, seed: int = 42, chunk_size: int = 1_000_000,
+              start: int = 0) -> dict:
+    """Write `rows` patients from row position `start` to path, holding at most
+    about one chunk in memory. The header is written only when start is 0.
+
+    Returns counts for the summary printed by main().
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    counts = {'cvd': 0, 'dropout': 0, 'missing_bmi': 0, 'missing_chol': 0, 'sites': set(), 'groups': set()}
+    with open(path, 'w', newline='') as f:
+        for lo in range(start, start + rows, chunk_size):
+            chunk = generate_rows(lo, min(lo + chunk_size, start + rows), seed)
+            f.write(to_csv_text(chunk, header=lo == 0))
+            counts['cvd'] += int((chunk['outcome_cvd'].str.lower() == 'yes').sum())
+            counts['dropout'] += int((chunk['dropout'] == 'Yes').sum())
+            counts['missing_bmi'] += int(chunk['bmi'].isna().sum())
+            counts['missing_chol'] += int(chunk['cholesterol_total'].isna().sum())
+            counts['sites'].update(chunk['site'].unique())
+            counts['groups'].update(chunk['intervention_group'].unique())
+    return counts
+
+
+def partition_bounds(rows: int, parts: int) -> list:
+    """Cut [0, rows) into at most `parts` contiguous (start, stop) ranges at
+    BLOCK_ROWS boundaries, so no random stream is split between workers."""
+    blocks = -(-rows // BLOCK_ROWS)
+    cuts = [min(rows, blocks * i // parts * BLOCK_ROWS) for i in range(parts + 1)]
+    return [(lo, hi) for lo, hi in zip(cuts, cuts[1:]) if hi > lo]
+
+
+def partition_path(path: str, part: int) -> str:
+    """data/load_test.csv -> data/load_test.part-00003.csv"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.part-{part:05d}{ext}"
+
+
+def _write_partition(task: tuple) -> dict:
+    path, start, stop, seed, chunk_size = task
+    return write_csv(path, stop - start, seed, chunk_size, start=start)
+
+
+def write_partitions(path: str, rows: int, seed: int = 42, chunk_size: int = 1_000_000,
+                     workers: int = 2) -> tuple:
+    """Write `rows` patients as partition files, one worker process per partition.
+
+    Stale parts from an earlier run with more workers are removed first, so
+    the parts on disk always concatenate to exactly this dataset.
+
+    Returns:
+        tuple: (list of partition paths in order, summed counts)
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    stem, ext = os.path.splitext(path)
+    for stale in glob.glob(glob.escape(stem) + '.part-*' + glob.escape(ext)):
+        os.remove(stale)
+
+    bounds = partition_bounds(rows, workers)
+    paths = [partition_path(path, i) for i in range(len(bounds))]
+    tasks = [(p, lo, hi, seed, chunk_size) for p, (lo, hi) in zip(paths, bounds)]
+    counts = {'cvd': 0, 'dropout': 0, 'missing_bmi': 0, 'missing_chol': 0, 'sites': set(), 'groups': set()}
+    with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+        for part in pool.map(_write_partition, tasks):
+            for key, value in part.items():
+                if isinstance(value, set):
+                    counts[key] |= value
+                else:
+                    counts[key] += value
+    return paths, counts
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Generate the synthetic clinical trial dataset.')
+    parser.add_argument('--rows', type=int, default=10_000, help='number of patients (default 10,000)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed (default 42)')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000,
+                        help='rows generated and written at a time (output does not depend on it)')
+    parser.add_argument('--output', default='data/clinical_trial_raw.csv', help='CSV file to write')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes; above 1, write partition files next to --output')
+    args = parser.parse_args(argv)
+    if args.rows < 1 or args.chunk_size < 1 or args.workers < 1:
+        parser.error('--rows, --chunk-size and --workers must be positive')
+
+    print(f"Generating clinical trial data for {args.rows} patients...")
+    if args.workers == 1:
+        counts = write_csv(args.output, args.rows, args.seed, args.chunk_size)
+        written = args.output
     else:
-        df.loc[idx, 'enrollment_date'] = original_date.strftime('%d-%m-%Y')
-
-# 6. WHITESPACE IN TEXT FIELDS
-print("Injecting whitespace issues...")
-
-# Random leading/trailing spaces
-text_cols = ['site', 'intervention_group', 'sex']
-for col in text_cols:
-    space_sample = df.sample(frac=0.1).index
-    df.loc[space_sample, col] = '  ' + df.loc[space_sample, col] + '  '
-
-# ============================================================================
-# SAVE DATA
-# ============================================================================
-
-output_file = 'data/clinical_trial_raw.csv'
-df.to_csv(output_file, index=False)
-
-print(f"\n✓ Generated clinical trial data: {output_file}")
-print(f"  Rows: {len(df)}")
-print(f"  Columns: {len(df.columns)}")
-print(f"\nData quality issues injected:")
-print(f"  - Missing data: varies by site (5-15%)")
-print(f"  - Sentinel values: ~2% of age as -999")
-print(f"  - Text inconsistencies: capitalization, typos, spacing")
-print(f"  - Date formats: 3 different formats")
-print(f"  - Whitespace: ~10% of text fields")
-
-# Print summary statistics
-print(f"\nSummary statistics:")
-print(f"  Sites: {df['site'].nunique()} unique sites")
-print(f"  Intervention groups: {df['intervention_group'].nunique()} groups")
-print(f"  CVD events: {(df['outcome_cvd'].str.lower() == 'yes').sum()} patients")
-print(f"  Dropouts: {(df['dropout'].str.lower() == 'yes').sum()} patients")
-print(f"  Missing BMI: {df['bmi'].isna().sum()} ({df['bmi'].isna().mean()*100:.1f}%)")
-print(f"  Missing cholesterol: {df['cholesterol_total'].isna().sum()} ({df['cholesterol_total'].isna().mean()*100:.1f}%)")
+        paths, counts = write_partitions(args.output, args.rows, args.seed, args.chunk_size, args.workers)
+        written = f"{len(paths)} partitions {paths[0]} .. {paths[-1]}"
+
+    print(f"\n✓ Generated clinical trial data: {written}")
+    print(f"  Rows: {args.rows}")
+    print(f"  Columns: 18")
+    print(f"\nData quality issues injected:")
+    print(f"  - Missing data: varies by site (5-15%)")
+    print(f"  - Sentinel values: ~2% of age as -999")
+    print(f"  - Text inconsistencies: capitalization, typos, spacing")
+    print(f"  - Date formats: 3 different formats")
+    print(f"  - Whitespace: ~10% of text fields")
+
+    # Print summary statistics
+    print(f"\nSummary statistics:")
+    print(f"  Sites: {len(counts['sites'])} unique sites")
+    print(f"  Intervention groups: {len(counts['groups'])} groups")
+    print(f"  CVD events: {counts['cvd']} patients")
+    print(f"  Dropouts: {counts['dropout']} patients")
+    print(f"  Missing BMI: {counts['missing_bmi']} ({counts['missing_bmi'] / args.rows * 100:.1f}%)")
+    print(f"  Missing cholesterol: {counts['missing_chol']} ({counts['missing_chol'] / args.rows * 100:.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
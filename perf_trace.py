@@ -0,0 +1,207 @@
+"""
+Opt-in per-call timing and memory instrumentation.
+
+Functions decorated with @traced record, for every call while tracing is
+enabled, the wall time, rows in (first argument) and out (result), bytes
+still allocated on return and peak bytes allocated during the call (via
+tracemalloc, which sees Python and NumPy allocations). While disabled the
+decorator costs one global check per call.
+
+Tracing is enabled with enable(), or for a whole process (e.g. a notebook
+kernel started by run_pipeline.py --trace) by setting PERF_TRACE_FILE to a
+JSON-lines file that records are appended to. PERF_TRACE_STAGE labels the
+records and PERF_TRACE_MEMORY=0 skips tracemalloc, which slows
+allocation-heavy code down. Only the last MAX_RECORDS records (or
+enable(max_records=...)) are kept in memory, so tracing can stay on in a
+long-running process; the file, if any, receives every record.
+
+Example:
+    >>> import perf_trace
+    >>> perf_trace.enable()
+    >>> with perf_trace.stage('q5'):
+    ...     df = clean_data(load_data('data/clinical_trial_raw.csv'))
+    >>> print(perf_trace.format_summary(perf_trace.summarize(perf_trace.records())))
+"""
+
+import collections
+import contextlib
+import functools
+import json
+import os
+import time
+import tracemalloc
+
+_enabled = False
+_memory = True
+_started_tracemalloc = False
+_path = None
+_stage = None
+MAX_RECORDS = 100_000
+_records = collections.deque(maxlen=MAX_RECORDS)
+# one {'start', 'peak'} per traced call in progress, innermost last
+_stack = []
+
+
+def enable(path: str = None, memory: bool = True, stage: str = None,
+           max_records: int = None) -> None:
+    """
+    Start recording traced calls.
+
+    Args:
+        path: Optional JSON-lines file each record is appended to
+        memory: Measure allocations with tracemalloc
+        stage: Label stored with every record (see stage())
+        max_records: Records kept in memory, oldest dropped first
+                     (default: keep the current limit, MAX_RECORDS)
+    """
+    global _enabled, _memory, _path, _stage, _started_tracemalloc, _records
+    _enabled, _memory, _path, _stage = True, memory, path, stage
+    if max_records is not None:
+        _records = collections.deque(_records, maxlen=max_records)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+
+
+def disable() -> None:
+    """Stop recording; records already taken are kept."""
+    global _enabled, _started_tracemalloc
+    _enabled = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    _stack.clear()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def records() -> list:
+    """The most recent records of this process (not those only written by other processes)."""
+    return list(_records)
+
+
+def clear() -> None:
+    _records.clear()
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Label the records of calls made inside the block with `name`."""
+    global _stage
+    previous, _stage = _stage, name
+    try:
+        yield
+    finally:
+        _stage = previous
+
+
+def _rows(obj):
+    shape = getattr(obj, "shape", None)
+    if shape:
+        return int(shape[0])
+    if isinstance(obj, (list, tuple)):
+        return len(obj)
+    return None
+
+
+def traced(fn):
+    """Record each call of fn while tracing is enabled."""
+    module = fn.__module__
+    if module == "__main__":  # a script run directly: label it by its file name
+        module = os.path.splitext(os.path.basename(fn.__code__.co_filename))[0]
+    name = f"{module}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return fn(*args, **kwargs)
+        return _call(fn, name, args, kwargs)
+    return wrapper
+
+
+def _call(fn, name, args, kwargs):
+    memory = _memory and tracemalloc.is_tracing()
+    frame = {"start": 0, "peak": 0}
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if _stack:
+            _stack[-1]["peak"] = max(_stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        frame = {"start": current, "peak": current}
+    _stack.append(frame)
+    depth = len(_stack) - 1
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        _stack.pop()
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(frame["peak"], peak)
+            if _stack:
+                _stack[-1]["peak"] = max(_stack[-1]["peak"], peak)
+    record = {
+        "function": name,
+        "stage": _stage,
+        "depth": depth,
+        "seconds": seconds,
+        "rows_in": _rows(args[0]) if args else None,
+        "rows_out": _rows(result),
+        "alloc_bytes": current - frame["start"] if memory else None,
+        "peak_bytes": peak - frame["start"] if memory else None,
+        "pid": os.getpid(),
+    }
+    _records.append(record)
+    if _path:
+        with open(_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    return result
+
+
+def read_records(path: str) -> list:
+    """Records appended to a PERF_TRACE_FILE (none if it doesn't exist)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def summarize(recs: list) -> list:
+    """
+    Aggregate records per (stage, function).
+
+    Returns:
+        list: {stage, function, calls, seconds, rows_in, rows_out,
+            alloc_bytes, peak_bytes} dicts, slowest first; times, rows
+            and allocations are summed, peak_bytes is the largest peak
+    """
+    groups = {}
+    for r in recs:
+        g = groups.setdefault((r["stage"], r["function"]), {
+            "stage": r["stage"], "function": r["function"], "calls": 0, "seconds": 0.0,
+            "rows_in": 0, "rows_out": 0, "alloc_bytes": 0, "peak_bytes": 0})
+        g["calls"] += 1
+        g["seconds"] += r["seconds"]
+        for key in ("rows_in", "rows_out", "alloc_bytes"):
+            g[key] += r[key] or 0
+        g["peak_bytes"] = max(g["peak_bytes"], r["peak_bytes"] or 0)
+    return sorted(groups.values(), key=lambda g: -g["seconds"])
+
+
+def format_summary(summary: list) -> str:
+    """Fixed-width table of summarize() output for logs."""
+    lines = [f"{'stage':<8} {'function':<44} {'calls':>6} {'seconds':>9} "
+             f"{'rows in':>11} {'rows out':>11} {'peak MiB':>9}"]
+    for g in summary:
+        lines.append(f"{g['stage'] or '-':<8} {g['function']:<44} {g['calls']:>6} {g['seconds']:>9.3f} "
+                     f"{g['rows_in']:>11,} {g['rows_out']:>11,} {g['peak_bytes'] / 2**20:>9.1f}")
+    return "\n".join(lines)
+
+
+if os.environ.get("PERF_TRACE_FILE"):
+    enable(os.environ["PERF_TRACE_FILE"], memory=os.environ.get("PERF_TRACE_MEMORY", "1") != "0",
+           stage=os.environ.get("PERF_TRACE_STAGE"))
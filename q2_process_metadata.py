@@ -4,9 +4,20 @@
 # Process configuration files for data generation.
 
 import os
-import random
+import re
 import statistics
+import warnings
 
+import numpy as np
+
+try:
+    from perf_trace import traced
+except ImportError:  # perf_trace.py not shipped alongside: no instrumentation
+    def traced(fn):
+        return fn
+
+
+@traced
 def parse_config(filepath: str) -> dict:
     """
     Parse config file (key=value format) into dictionary.
@@ -36,6 +47,7 @@ def parse_config(filepath: str) -> dict:
     pass
 
 
+@traced
 def validate_config(config: dict) -> dict:
     """
     Validate configuration values using if/elif/else logic.
@@ -83,43 +95,84 @@ def validate_config(config: dict) -> dict:
     pass
 
 
-def generate_sample_data(filename: str, config: dict) -> None:
+# Rows drawn and written per block; bounds memory for any sample_data_rows.
+SAMPLE_BLOCK_ROWS = 1_000_000
+
+# Ranges up to this many values are formatted through a lookup table.
+_TEXT_TABLE_MAX = 1 << 20
+
+
+def _sample_dtype(min_val: int, max_val: int):
+    """Smallest of int32/int64 that holds the configured range."""
+    return np.dtype("<i4") if -2**31 <= min_val and max_val < 2**31 else np.dtype("<i8")
+
+
+@traced
+def generate_sample_data(filename: str, config: dict, seed: int = None,
+                         fmt: str = "text", block_rows: int = SAMPLE_BLOCK_ROWS) -> None:
     """
     Generate a file with random numbers for testing, one number per row with no header.
     Uses config parameters for number of rows and range.
 
+    Values are drawn with NumPy in blocks of block_rows and each block is
+    formatted and written in one call, so 100M rows take seconds rather than
+    minutes. The same seed and block_rows always give the same file.
+
     Args:
         filename: Output filename (e.g., 'sample_data.csv')
         config: Configuration dictionary with sample_data_rows, sample_data_min, sample_data_max
+        seed: Random seed (default: fresh entropy each run)
+        fmt: 'text' (one integer per line) or 'npy' (a NumPy .npy array of
+            int32, or int64 for ranges outside int32; read with np.load)
+        block_rows: Rows drawn and written at a time
 
     Returns:
         None: Creates file on disk
 
     Example:
         >>> config = {'sample_data_rows': '100', 'sample_data_min': '18', 'sample_data_max': '75'}
-        >>> generate_sample_data('sample_data.csv', config)
+        >>> generate_sample_data('sample_data.csv', config, seed=42)
         # Creates file with 100 random numbers between 18-75, one per row
-        >>> import random
-        >>> random.randint(18, 75)  # Returns random integer between 18-75
+        >>> generate_sample_data('sample_data.npy', config, seed=42, fmt='npy')
+        # Same numbers, stored as a binary array
     """
     rows = int(config["sample_data_rows"])
     min_val = int(config["sample_data_min"])
     max_val = int(config["sample_data_max"])
+    if fmt not in ("text", "npy"):
+        raise ValueError(f"Unknown sample data format: {fmt!r}")
 
     directory = os.path.dirname(filename)
     if directory:
         os.makedirs(directory, exist_ok=True)
 
+    rng = np.random.default_rng(seed)
+    dtype = _sample_dtype(min_val, max_val)
+    blocks = ((start, min(start + block_rows, rows)) for start in range(0, rows, block_rows))
+
+    if fmt == "npy":
+        out = np.lib.format.open_memmap(filename, mode="w+", dtype=dtype, shape=(rows,))
+        for start, stop in blocks:
+            out[start:stop] = rng.integers(min_val, max_val, size=stop - start,
+                                           dtype=dtype, endpoint=True)
+        out.flush()
+        del out
+        return
+
+    # text: every value in the range is formatted once, then each block is a lookup and a join
+    table = None
+    if max_val - min_val < _TEXT_TABLE_MAX:
+        table = np.array([f"{v}\n" for v in range(min_val, max_val + 1)], dtype=object)
     with open(filename, "w", encoding="utf-8") as f:
-        for _ in range(rows):
-            f.write(f"{random.randint(min_val, max_val)}\n")
-
-    # TODO: Parse config values (convert strings to int)
-    # TODO: Generate random numbers and save to file
-    # TODO: Use random module with config-specified range
-    pass
+        for start, stop in blocks:
+            values = rng.integers(min_val, max_val, size=stop - start, dtype=dtype, endpoint=True)
+            if table is not None:
+                f.write("".join(table[values - min_val]))
+            else:
+                f.write("\n".join(map(str, values.tolist())) + "\n")
 
 
+@traced
 def calculate_statistics(data: list) -> dict:
     """
     Calculate basic statistics.
@@ -145,6 +198,132 @@ def calculate_statistics(data: list) -> dict:
     pass
 
 
+# Bytes of text (or 8-byte values of .npy) read per block by stream_statistics.
+STATS_BLOCK_BYTES = 1 << 24
+
+
+def _sample_blocks(filename: str, block_bytes: int):
+    """Yield the integers of a sample file as NumPy arrays, one block at a time."""
+    if filename.endswith(".npy"):
+        data = np.load(filename, mmap_mode="r")
+        step = max(1, block_bytes // 8)
+        for start in range(0, len(data), step):
+            yield np.asarray(data[start:start + step], dtype=np.int64)
+        return
+
+    with open(filename, "rb") as f:
+        tail = b""
+        while True:
+            chunk = f.read(block_bytes)
+            if not chunk:
+                break
+            chunk = tail + chunk
+            cut = chunk.rfind(b"\n") + 1
+            chunk, tail = chunk[:cut], chunk[cut:]
+            if chunk.strip():
+                yield _parse_lines(chunk)
+        if tail.strip():
+            yield _parse_lines(tail)
+
+
+# Two values on one line: np.fromstring would read them as separate rows.
+_SEVERAL_PER_LINE = re.compile(rb"\S[ \t\r\f\v]+\S")
+
+
+def _parse_lines(text: bytes):
+    """One integer per line (blank lines skipped) -> int64 array; ValueError on anything else."""
+    crowded = _SEVERAL_PER_LINE.search(text)
+    if crowded:
+        start = text.rfind(b"\n", 0, crowded.start()) + 1
+        end = text.find(b"\n", crowded.end())
+        line = text[start:end if end >= 0 else len(text)]
+        raise ValueError(f"Sample data is not one integer per line: {line.decode(errors='replace')!r}")
+    with warnings.catch_warnings():
+        # NumPy only warns when it stops early on unparseable text
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            return np.fromstring(text, dtype=np.int64, sep="\n")
+        except (DeprecationWarning, ValueError) as e:
+            raise ValueError(f"Sample data is not one integer per line: {e}") from None
+
+
+@traced
+def stream_statistics(filename: str, config: dict, quantiles: tuple = (0.01, 0.25, 0.75, 0.99),
+                      block_bytes: int = STATS_BLOCK_BYTES) -> dict:
+    """
+    Calculate statistics of a sample file in one pass with bounded memory.
+
+    The file is read in blocks into a counting histogram over
+    sample_data_min..sample_data_max, so memory is O(range) whatever the
+    number of rows and nothing is sorted. Count and sum are exact integers,
+    and mean and median equal calculate_statistics on the same values (ints
+    wherever statistics.mean / statistics.median return ints).
+
+    Args:
+        filename: Sample file written by generate_sample_data (text or .npy)
+        config: Configuration dictionary with sample_data_min, sample_data_max
+        quantiles: Extra quantiles to report (linear interpolation, as np.quantile)
+        block_bytes: Bytes read per block
+
+    Returns:
+        dict: {count, sum, mean, median, min, max, variance, stdev, skewness,
+            kurtosis, p<q>...}; variance and stdev are sample statistics,
+            skewness and excess kurtosis are population moments
+
+    Example:
+        >>> stats = stream_statistics('data/sample_data.csv', config)
+        >>> stats['median'], stats['p25']
+        (48, 32.0)
+    """
+    min_val = int(config["sample_data_min"])
+    max_val = int(config["sample_data_max"])
+    counts = np.zeros(max_val - min_val + 1, dtype=np.int64)
+    for values in _sample_blocks(filename, block_bytes):
+        if values.min() < min_val or values.max() > max_val:
+            raise ValueError(f"{filename} has values outside {min_val}..{max_val}")
+        counts += np.bincount(values - min_val, minlength=len(counts))
+
+    present = np.flatnonzero(counts)
+    if not len(present):
+        raise ValueError(f"{filename} has no data")
+    values = present + min_val
+    weights = counts[present]
+    count = int(weights.sum())
+    total = sum(int(v) * int(c) for v, c in zip(values.tolist(), weights.tolist()))
+    cumulative = np.cumsum(weights)
+
+    def quantile(q):
+        # value at 0-based sorted position h, interpolating between neighbours
+        h = (count - 1) * q
+        lo = int(h)
+        below = values[np.searchsorted(cumulative, lo, side="right")]
+        above = values[np.searchsorted(cumulative, min(lo + 1, count - 1), side="right")]
+        return float(below + (h - lo) * (above - below))
+
+    middle = [values[np.searchsorted(cumulative, i, side="right")].item()
+              for i in {(count - 1) // 2, count // 2}]
+    median = middle[0] if len(middle) == 1 else sum(middle) / 2
+
+    mean = total // count if total % count == 0 else total / count
+    deviation = values - mean
+    m2, m3, m4 = (float(np.dot(weights, deviation ** k)) / count for k in (2, 3, 4))
+    stats = {
+        "count": count,
+        "sum": total,
+        "mean": round(mean, 2),
+        "median": round(median, 2),
+        "min": int(values[0]),
+        "max": int(values[-1]),
+        "variance": round(m2 * count / (count - 1), 2) if count > 1 else 0.0,
+        "stdev": round((m2 * count / (count - 1)) ** 0.5, 2) if count > 1 else 0.0,
+        "skewness": round(m3 / m2 ** 1.5, 2) if m2 else 0.0,
+        "kurtosis": round(m4 / m2 ** 2 - 3, 2) if m2 else 0.0,
+    }
+    for q in quantiles:
+        stats[f"p{q * 100:g}"] = round(quantile(q), 2)
+    return stats
+
+
 if __name__ == '__main__':
     config = parse_config("q2_config.txt")
     print("Parsed config:", config)
@@ -155,16 +334,20 @@ if __name__ == '__main__':
     generate_sample_data("data/sample_data.csv", config)
     print("Generated data/sample_data.csv")
 
-    with open("data/sample_data.csv", "r") as f:
-        data = [int(x.strip()) for x in f if x.strip()]
-    stats = calculate_statistics(data)
+    stats = stream_statistics("data/sample_data.csv", config)
     print("Statistics:", stats)
 
+    # statistics.txt keeps calculate_statistics' keys; the rest go alongside
     os.makedirs("output", exist_ok=True)
+    basic = ("count", "sum", "mean", "median")
     with open("output/statistics.txt", "w", encoding="utf-8") as f:
+        for key in basic:
+            f.write(f"{key}={stats[key]}\n")
+    with open("output/histogram_statistics.txt", "w", encoding="utf-8") as f:
         for key, value in stats.items():
-            f.write(f"{key}={value}\n")
-    print("Saved results to output/statistics.txt")
+            if key not in basic:
+                f.write(f"{key}={value}\n")
+    print("Saved results to output/statistics.txt and output/histogram_statistics.txt")
 
     # TODO: Test your functions with sample data
     # Example:
@@ -4,52 +4,168 @@
 #
 # These utilities will be imported and used in Q4-Q7 notebooks.
 
+import difflib
+import hashlib
+import json
+import numbers
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
+try:
+    from perf_trace import traced
+except ImportError:  # perf_trace.py not shipped alongside: no instrumentation
+    def traced(fn):
+        return fn
+
 
-def load_data(filepath: str) -> pd.DataFrame:
+@traced
+def load_data(filepath: str, chunksize: int = None, cache=False,
+              schema: dict = None) -> pd.DataFrame:
     """
     Load CSV file into DataFrame.
 
+    With `cache`, the parsed result is kept in a binary columnar directory
+    (beside the source, e.g. data/.clinical_trial_raw.csv.cache/, or under
+    a cache root), so later loads of an unchanged file skip CSV parsing.
+    The cache is keyed on the file's path, size, mtime and content hash,
+    taken before parsing, and is rebuilt automatically when any of them no
+    longer match; the returned DataFrame is identical to a fresh
+    pd.read_csv().
+
     Args:
         filepath: Path to CSV file
+        chunksize: Optional rows per chunk. When given, an iterator of
+                   DataFrame chunks is returned instead, so peak memory is
+                   bounded by the chunk size (see the stream_* functions)
+        cache: Use the parsed-data cache: True keeps it beside the source,
+               a directory path keeps it under that cache root, False (the
+               default) writes nothing. Only local files are cached
+        schema: Optional {column: dtype} mapping applied while parsing, e.g.
+                CLINICAL_TRIAL_SCHEMA (pass True for that default). Besides
+                pandas dtypes, 'id' parses identifiers such as 'P00042'
+                into a compact Int32 (42)
 
     Returns:
-        pd.DataFrame: Loaded data
+        pd.DataFrame: Loaded data (or an iterator of DataFrames if chunksize)
 
     Example:
         >>> df = load_data('data/clinical_trial_raw.csv')
         >>> df.shape
         (10000, 18)
+        >>> chunks = load_data('data/clinical_trial_raw.csv', chunksize=2500)
+        >>> typed = load_data('data/clinical_trial_raw.csv', schema=True)
+        >>> memory_report(df, typed)
+        >>> df = load_data('data/clinical_trial_raw.csv', cache=True)   # fast next time
     """
-    return pd.read_csv(filepath)
-    pass
+    schema = CLINICAL_TRIAL_SCHEMA if schema is True else (schema or None)
+    if chunksize is not None:
+        chunks = pd.read_csv(filepath, chunksize=chunksize, dtype=_read_dtypes(schema))
+        return chunks if schema is None else (_parse_ids(chunk, schema) for chunk in chunks)
+    if not cache or not isinstance(filepath, (str, os.PathLike)) or not os.path.isfile(filepath):
+        # buffers, URLs and other inputs read_csv accepts are parsed directly
+        return _read_csv_typed(filepath, schema)
+
+    cache_dir = _cache_dir(filepath, schema, None if cache is True else cache)
+    key = _source_key(filepath, cache_dir)
+    if key is not None:
+        try:
+            return _read_columns(cache_dir)
+        except (OSError, ValueError, KeyError):
+            pass  # replaced by another process mid-read; parse the CSV instead
+    # fingerprint first: if the file changes while it is parsed, the stored
+    # key is older than the data and the next load re-parses
+    source = _source_fingerprint(filepath)
+    df = _read_csv_typed(filepath, schema)
+    _write_cache(df, source, cache_dir)
+    return df
+
+
+# Sentinel codes used by the clinical trial data entry systems, per column.
+CLINICAL_TRIAL_SENTINELS = {'age': -999, 'bmi': -1}
+
 
+def _confirmed_duplicates(keys: pd.DataFrame, hashes: pd.Series) -> np.ndarray:
+    """keys.duplicated(), comparing only the rows whose hash occurs more than once."""
+    candidates = np.flatnonzero(hashes.duplicated(keep=False).to_numpy())
+    dup = np.zeros(len(keys), dtype=bool)
+    if len(candidates):
+        dup[candidates] = keys.iloc[candidates].duplicated().to_numpy()
+    return dup
 
+
+@traced
 def clean_data(df: pd.DataFrame, remove_duplicates: bool = True,
-               sentinel_value: float = -999) -> pd.DataFrame:
+               sentinel_value=-999, subset: list = None,
+               inplace: bool = False) -> pd.DataFrame:
     """
     Basic data cleaning: remove duplicates and replace sentinel values with NaN.
 
+    Sentinels are only looked for in numeric columns, with one vectorized
+    mask per targeted column. With `subset`, the key columns are hashed to
+    64-bit values and only rows sharing a hash are compared on their key
+    values, so a hash collision never drops a distinct row.
+
     Args:
         df: Input DataFrame
         remove_duplicates: Whether to drop duplicate rows
-        sentinel_value: Value to replace with NaN (e.g., -999, -1)
+        sentinel_value: Value to replace with NaN (e.g., -999, -1) in every
+                        numeric column, a list of such values, or a dict of
+                        {column: value or list of values}, e.g.
+                        CLINICAL_TRIAL_SENTINELS
+        subset: Optional key columns identifying duplicates (e.g.
+                ['patient_id']); the first occurrence of each key is kept
+        inplace: Modify df instead of returning a new DataFrame
 
     Returns:
-        pd.DataFrame: Cleaned data
+        pd.DataFrame: Cleaned data (df itself when inplace)
 
     Example:
         >>> df_clean = clean_data(df, sentinel_value=-999)
+        >>> df_clean = clean_data(df, sentinel_value=CLINICAL_TRIAL_SENTINELS,
+        ...                       subset=['patient_id'])
     """
+    out = df
     if remove_duplicates:
-        df = df.drop_duplicates()
-    df = df.replace(sentinel_value, np.nan)
-    return df
-    pass
+        if subset is None:
+            dup = out.duplicated().to_numpy()
+        else:
+            hashes = pd.util.hash_pandas_object(out[subset], index=False)
+            dup = _confirmed_duplicates(out[subset], hashes)
+        if dup.any():
+            if inplace:
+                if not out.index.is_unique:
+                    raise ValueError("inplace deduplication needs a unique index")
+                out.drop(index=out.index[dup], inplace=True)
+            else:
+                out = out[~dup]
+    if out is df and not inplace:
+        out = df.copy(deep=False)
+
+    for col, values in _sentinel_targets(out, sentinel_value).items():
+        mask = out[col].isin(values)
+        if mask.any():
+            out[col] = out[col].mask(mask)
+    return out
+
+
+def _sentinel_targets(df: pd.DataFrame, sentinel_value) -> dict:
+    """{numeric column: list of sentinel values} that clean_data() replaces in df."""
+    if isinstance(sentinel_value, dict):
+        targets = sentinel_value
+    else:
+        targets = {col: sentinel_value for col in df.select_dtypes(include=[np.number]).columns}
+    return {col: list(values) if isinstance(values, (list, tuple, set)) else [values]
+            for col, values in targets.items()
+            if col in df.columns and pd.api.types.is_numeric_dtype(df[col].dtype)}
 
 
+@traced
 def detect_missing(df: pd.DataFrame) -> pd.Series:
     """
     Return count of missing values per column.
@@ -66,11 +182,10 @@ def detect_missing(df: pd.DataFrame) -> pd.Series:
         15
     """
     return df.isnull().sum()
-    pass
 
 
-def fill_missing(df, column, strategy):
-    out = df.copy()
+@traced
+def fill_missing(df, column, strategy, by=None):
     """
     Fill missing values in a column using specified strategy.
 
@@ -78,6 +193,8 @@ def fill_missing(df, column, strategy):
         df: Input DataFrame
         column: Column name to fill
         strategy: Fill strategy - 'mean', 'median', or 'ffill'
+        by: Optional column(s) to stratify by, e.g. ['site', 'sex'] fills
+            with the median of each site/sex group (see fill_missing_many)
 
     Returns:
         pd.DataFrame: DataFrame with filled values
@@ -85,44 +202,267 @@ def fill_missing(df, column, strategy):
     Example:
         >>> df_filled = fill_missing(df, 'age', strategy='median')
     """
-    if strategy in ("mean", "median"):
-        val = getattr(out[column].astype(float), strategy)()
-        out[column] = out[column].fillna(val)
-    elif strategy == "ffill":
-        out[column] = out[column].ffill()
-    else:
-        raise ValueError("Unknown strategy")
-    return out
-    pass
+    return fill_missing_many(df, {column: strategy}, by=by)
+
 
+_FILL_STRATEGIES = ("mean", "median", "ffill")
 
-def filter_data(df, filters):
+
+@traced
+def fill_missing_many(df: pd.DataFrame, strategies: dict, by=None,
+                      inplace: bool = False) -> pd.DataFrame:
     """
-    Apply multiple filtering conditions to a DataFrame.
+    Fill missing values in many columns at once, optionally per group.
+
+    The frame is copied at most once (shallowly: only filled columns get new
+    data), and all columns sharing a strategy are filled from one grouped
+    transform when `by` is given. Rows whose group has no observed value
+    (or whose group key is missing) stay missing. Integer columns with
+    missing values are filled as float, since a mean or median need not be
+    whole.
+
+    Args:
+        df: Input DataFrame
+        strategies: {column: 'mean' | 'median' | 'ffill'}
+        by: Optional column name or list of names to stratify by
+        inplace: Modify df instead of returning a new DataFrame
+
+    Returns:
+        pd.DataFrame: DataFrame with filled values
+
+    Example:
+        >>> df_filled = fill_missing_many(
+        ...     df, {'bmi': 'median', 'glucose_fasting': 'median', 'adherence_pct': 'mean'},
+        ...     by=['site', 'sex'])
     """
-    out = df.copy()
-    for f in filters:
-        col = f["column"]
-        cond = f.get("condition", f.get("operator"))
-        val = f["value"]
-
-        if cond == "equals":
-            out = out[out[col] == val]
-        elif cond == "greater_than":
-            out = out[out[col] > val]
-        elif cond == "less_than":
-            out = out[out[col] < val]
-        elif cond == "in_range":
-            lo, hi = val
-            out = out[(out[col] >= lo) & (out[col] <= hi)]
-        elif cond == "in_list":
-            out = out[out[col].isin(val)]
+    for strategy in strategies.values():
+        if strategy not in _FILL_STRATEGIES:
+            raise ValueError("Unknown strategy")
+    out = df if inplace else df.copy(deep=False)
+    groups = None if by is None else out.groupby(by, sort=False, observed=True)
+
+    for strategy in _FILL_STRATEGIES:
+        cols = [c for c, s in strategies.items() if s == strategy]
+        if not cols:
+            continue
+        if strategy == "ffill":
+            filled = out[cols].ffill() if groups is None else groups[cols].ffill()
+            for col in cols:
+                out[col] = filled[col]
+            continue
+        for col in cols:
+            if not pd.api.types.is_float_dtype(out[col].dtype) and out[col].hasnans:
+                out[col] = out[col].astype(float)
+        if groups is None:
+            fills = {col: getattr(out[col], strategy)() for col in cols}
         else:
-            raise ValueError(f"Unknown condition: {cond}")
+            fills = groups[cols].transform(strategy)
+        for col in cols:
+            out[col] = out[col].fillna(fills[col])
+    return out
+
+
+def _median_with_fill(observed: np.ndarray, value: float, k: int) -> float:
+    """Median of sorted `observed` plus k copies of `value`, without building it."""
+    total = len(observed) + k
+    if total == 0:
+        return np.nan
+    at = np.searchsorted(observed, value)
+
+    def kth(r):
+        if r < at:
+            return observed[r]
+        if r < at + k:
+            return value
+        return observed[r - k]
+
+    if total % 2:
+        return float(kth(total // 2))
+    return (kth(total // 2 - 1) + kth(total // 2)) / 2
+
+
+@traced
+def compare_imputation(df: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    """
+    Post-imputation mean, median, variance and remaining-missing count for
+    each fill strategy, without building any imputed copy of the data.
+
+    For 'mean' and 'median' fills the results follow analytically from the
+    observed values: the new mean and (sample) variance from the observed
+    sum and sum of squared deviations, the new median by locating the
+    filled value inside the once-sorted observed values. 'ffill' is
+    computed from one forward-filled array per column. The 'none' row
+    describes the data as it is.
+
+    Args:
+        df: Input DataFrame
+        columns: Numeric columns to evaluate (default: all numeric columns)
+
+    Returns:
+        pd.DataFrame: Indexed by (column, strategy) with columns
+        mean, median, variance and missing
+
+    Example:
+        >>> compare_imputation(df, ['cholesterol_total']).loc['cholesterol_total']
+    """
+    if columns is None:
+        columns = df.select_dtypes(include=[np.number]).columns
+    rows = {}
+    for col in columns:
+        x = df[col].to_numpy(dtype='float64', na_value=np.nan)
+        valid = ~np.isnan(x)
+        observed = np.sort(x[valid])
+        n, k = len(observed), int((~valid).sum())
+        mean = observed.mean() if n else np.nan
+        m2 = ((observed - mean) ** 2).sum() if n else np.nan
+
+        rows[(col, 'none')] = (mean, _median_with_fill(observed, 0.0, 0),
+                               m2 / (n - 1) if n > 1 else np.nan, k)
+        for strategy in ('mean', 'median'):
+            if n == 0:
+                rows[(col, strategy)] = (np.nan, np.nan, np.nan, k)
+                continue
+            value = mean if strategy == 'mean' else _median_with_fill(observed, 0.0, 0)
+            total = n + k
+            new_mean = (observed.sum() + k * value) / total
+            new_m2 = m2 + n * (mean - new_mean) ** 2 + k * (value - new_mean) ** 2
+            rows[(col, strategy)] = (new_mean, _median_with_fill(observed, value, k),
+                                     new_m2 / (total - 1) if total > 1 else np.nan, 0)
+
+        last = np.maximum.accumulate(np.where(valid, np.arange(len(x)), -1))
+        filled = np.where(last >= 0, x[np.maximum(last, 0)], np.nan)
+        still = int((last < 0).sum())
+        present = filled[last >= 0]
+        rows[(col, 'ffill')] = (present.mean() if len(present) else np.nan,
+                                float(np.median(present)) if len(present) else np.nan,
+                                present.var(ddof=1) if len(present) > 1 else np.nan, still)
+
+    out = pd.DataFrame.from_dict(rows, orient='index', columns=['mean', 'median', 'variance', 'missing'])
+    out.index = pd.MultiIndex.from_tuples(out.index, names=['column', 'strategy'])
+    out['missing'] = out['missing'].astype('int64')
     return out
-    pass
 
 
+_CONDITIONS = ('equals', 'not_equals', 'greater_than', 'less_than', 'in_range', 'in_list', 'is_null')
+
+# Frames at least this long get their conditions reordered by a sampled
+# selectivity estimate; below it, sampling costs more than it saves.
+_FILTER_SAMPLE_MIN_ROWS = 4096
+_FILTER_SAMPLE_SIZE = 1024
+
+
+def _compile_filter(f):
+    """Validate one filter spec into ('cond', column, condition, value) or ('any', [...])."""
+    if 'any' in f:
+        return ('any', [_compile_filter(child) for child in f['any']])
+    cond = f.get("condition", f.get("operator"))
+    if cond not in _CONDITIONS:
+        raise ValueError(f"Unknown condition: {cond}")
+    return ('cond', f["column"], cond, f.get("value"))
+
+
+def _condition_mask(values: pd.Series, cond: str, val) -> np.ndarray:
+    if cond == "equals":
+        mask = values == val
+    elif cond == "not_equals":
+        mask = values != val
+    elif cond == "greater_than":
+        mask = values > val
+    elif cond == "less_than":
+        mask = values < val
+    elif cond == "in_range":
+        lo, hi = val
+        mask = (values >= lo) & (values <= hi)
+    elif cond == "in_list":
+        mask = values.isin(val)
+    else:
+        mask = values.isna()
+        if val is False:
+            mask = ~mask
+    return mask.to_numpy(dtype=bool, na_value=False)
+
+
+def _evaluate_filter(df: pd.DataFrame, node, positions: np.ndarray) -> np.ndarray:
+    """Boolean mask over `positions` for one compiled filter node.
+
+    Only the referenced column is gathered at the candidate positions, never
+    the whole frame. OR-groups evaluate each alternative only on the rows no
+    earlier alternative has matched.
+    """
+    if node[0] == 'any':
+        mask = np.zeros(len(positions), dtype=bool)
+        for child in node[1]:
+            todo = np.flatnonzero(~mask)
+            if not len(todo):
+                break
+            mask[todo] = _evaluate_filter(df, child, positions[todo])
+        return mask
+    _, col, cond, val = node
+    values = df[col]
+    if len(positions) != len(df):
+        values = values.iloc[positions]
+    return _condition_mask(values, cond, val)
+
+
+@traced
+def filter_data(df, filters, return_index=False, index=None):
+    """
+    Apply multiple filtering conditions to a DataFrame.
+
+    The filter list is compiled once and evaluated as a single selection:
+    conditions are ANDed, ordered by their estimated selectivity (measured
+    on an evenly spaced sample of large frames), and each one is evaluated
+    only on the rows that survived the previous ones, stopping early when
+    none are left. The frame itself is gathered once, at the end.
+
+    Args:
+        df: Input DataFrame
+        filters: List of {'column': ..., 'condition': ..., 'value': ...}
+                 Conditions: 'equals', 'not_equals', 'greater_than',
+                 'less_than', 'in_range' (value=(lo, hi), inclusive),
+                 'in_list' and 'is_null' (value=False selects non-null).
+                 An {'any': [filter, ...]} entry is an OR-group.
+        return_index: Return the selected row positions (np.ndarray) instead
+                      of materializing the filtered DataFrame; select them
+                      later with df.iloc[positions]. This is the lazy form:
+                      pandas cannot view an arbitrary row selection, so the
+                      DataFrame returned otherwise is always a copy
+        index: Optional ColumnIndex built for df; conditions it covers are
+               answered by binary search / bitmap intersection instead of
+               a column scan
+
+    Returns:
+        pd.DataFrame: Rows matching every filter (or their positions)
+
+    Example:
+        >>> filters = [
+        ...     {'column': 'age', 'condition': 'in_range', 'value': (18, 85)},
+        ...     {'any': [{'column': 'site', 'condition': 'equals', 'value': 'Site A'},
+        ...              {'column': 'systolic_bp', 'condition': 'greater_than', 'value': 140}]},
+        ... ]
+        >>> cohort = filter_data(df, filters)
+    """
+    nodes = [_compile_filter(f) for f in filters]
+    if index is not None:
+        positions, nodes = index.select(nodes, len(df))
+    else:
+        positions = np.arange(len(df))
+
+    if len(nodes) > 1 and len(df) >= _FILTER_SAMPLE_MIN_ROWS:
+        sample = np.linspace(0, len(df) - 1, _FILTER_SAMPLE_SIZE).astype(np.int64)
+        passing = [_evaluate_filter(df, node, sample).mean() for node in nodes]
+        nodes = [nodes[i] for i in np.argsort(passing, kind='stable')]
+
+    for node in nodes:
+        if not len(positions):
+            break
+        positions = positions[_evaluate_filter(df, node, positions)]
+    if return_index:
+        return positions
+    return df.iloc[positions]
+
+
+@traced
 def transform_types(df: pd.DataFrame, type_map: dict) -> pd.DataFrame:
     """
     Convert column data types based on mapping.
@@ -135,6 +475,9 @@ def transform_types(df: pd.DataFrame, type_map: dict) -> pd.DataFrame:
     Returns:
         pd.DataFrame: DataFrame with converted types
 
+    'datetime' uses parse_dates(), which understands the mixed
+    YYYY-MM-DD / MM/DD/YYYY / DD-MM-YYYY enrollment dates.
+
     Example:
         >>> type_map = {
         ...     'enrollment_date': 'datetime',
@@ -145,17 +488,18 @@ def transform_types(df: pd.DataFrame, type_map: dict) -> pd.DataFrame:
     """
     for col, t in type_map.items():
         if t == 'datetime':
-            df[col] = pd.to_datetime(df[col], errors='coerce')
+            df[col] = parse_dates(df[col])
         elif t == 'numeric':
             df[col] = pd.to_numeric(df[col], errors='coerce')
         elif t == 'category':
             df[col] = df[col].astype('category')
     return df
-    pass
 
+
+@traced
 def create_bins(df: pd.DataFrame, column: str, bins: list, labels: list, new_column: str = None) -> pd.DataFrame:
     """
-    Create categorical bins from continuous data using pd.cut().
+    Create categorical bins from continuous data, like pd.cut(include_lowest=True).
 
     Args:
         df: Input DataFrame
@@ -165,24 +509,107 @@ def create_bins(df: pd.DataFrame, column: str, bins: list, labels: list, new_col
         new_column: Optional name for new binned column (default: '{column}_bins')
 
     Returns:
-        pd.DataFrame: DataFrame with new binned column
+        pd.DataFrame: DataFrame with new binned column (a shallow copy of df;
+        see bin_columns() to add several binned columns at once)
     """
-    out = df.copy()
     colname = new_column or f"{column}_bins"
-    out[colname] = pd.cut(out[column], bins=bins, labels=labels, include_lowest=True)
+    return bin_columns(df, {colname: {'column': column, 'bins': bins, 'labels': labels,
+                                      'include_lowest': True}})
+
+
+def _bin_codes(values: np.ndarray, edges: np.ndarray, right: bool) -> np.ndarray:
+    """searchsorted(edges, values) - 1, with NaN giving -1.
+
+    With few edges, counting the edges below each value one vectorized
+    comparison at a time is several times faster than a per-value binary
+    search.
+    """
+    if len(edges) > 32:
+        codes = np.searchsorted(edges, values, side='left' if right else 'right') - 1
+        codes[np.isnan(values)] = -1
+        return codes
+    codes = np.full(len(values), -1, dtype=np.int8)
+    for edge in edges:
+        np.add(codes, values > edge if right else values >= edge, out=codes, casting='unsafe')
+    return codes
+
+
+@traced
+def bin_columns(df: pd.DataFrame, spec: dict, inplace: bool = False) -> pd.DataFrame:
+    """
+    Add several binned (ordered categorical) columns in one call.
+
+    Bin codes are computed for the whole column at once (the searchsorted
+    position of each value among the edges) and the categorical is built
+    directly from those codes. The frame is copied shallowly (or not at all with inplace), so
+    existing columns are never duplicated. Values outside the edges, or
+    missing, get NaN, as with pd.cut().
+
+    Args:
+        df: Input DataFrame
+        spec: {new_column: {'column': source column, 'bins': increasing edges,
+                            'labels': one label per bin (default: the intervals),
+                            'right': bins closed on the right (default True),
+                            'include_lowest': also include the first edge when right}}
+        inplace: Add the columns to df instead of a shallow copy
+
+    Returns:
+        pd.DataFrame: DataFrame with the binned columns added
+
+    Example:
+        >>> df = bin_columns(df, {
+        ...     'bp_category': {'column': 'systolic_bp', 'bins': [-np.inf, 120, 130, np.inf],
+        ...                     'labels': ['Normal', 'Elevated', 'High'], 'right': False},
+        ...     'bmi_category': {'column': 'bmi', 'bins': [0, 18.5, 25, 30, 100],
+        ...                      'labels': ['Underweight', 'Normal', 'Overweight', 'Obese'],
+        ...                      'right': False},
+        ... })
+    """
+    out = df if inplace else df.copy(deep=False)
+    binned = {}
+    for name, rule in spec.items():
+        edges = np.asarray(rule['bins'], dtype='float64')
+        if len(edges) < 2 or np.any(np.diff(edges) <= 0):
+            raise ValueError(f"bins for {name!r} must increase monotonically")
+        right = rule.get('right', True)
+        labels = rule.get('labels')
+        if labels is None:
+            labels = pd.IntervalIndex.from_breaks(rule['bins'], closed='right' if right else 'left')
+        elif len(labels) != len(edges) - 1:
+            raise ValueError(f"{name!r} needs one label per bin ({len(edges) - 1})")
+
+        series = df[rule['column']]
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'iuf':
+            values = series.to_numpy()
+        else:
+            values = series.to_numpy(dtype='float64', na_value=np.nan)
+        codes = _bin_codes(values, edges, right)
+        if right and rule.get('include_lowest', False):
+            codes[values == edges[0]] = 0
+        codes[(codes < 0) | (codes >= len(edges) - 1)] = -1  # outside the edges or NaN
+        binned[name] = pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+    for name, values in binned.items():
+        out[name] = values
     return out
 
 
-def summarize_by_group(df: pd.DataFrame, group_col: str,
+@traced
+def summarize_by_group(df: pd.DataFrame, group_col,
                        agg_dict: dict = None) -> pd.DataFrame:
     """
     Group data and apply aggregations.
 
+    Group keys are factorized once into integer codes (pass a GroupKeys to
+    reuse them across calls) and the aggregations are computed from those
+    codes with bincount-style reductions: count, size, sum, mean, std, var,
+    min, max, median and 'rate' (share of yes/true/1 answers in a yes/no
+    column). Any other aggregation falls back to pandas on the codes.
+
     Args:
         df: Input DataFrame
-        group_col: Column to group by
+        group_col: Column to group by, a list of columns, or a GroupKeys
         agg_dict: Dict of {column: aggregation_function(s)}
-                  If None, uses .describe() on numeric columns
+                  If None, uses 'mean' on numeric columns
 
     Returns:
         pd.DataFrame: Grouped and aggregated data
@@ -197,29 +624,2631 @@ def summarize_by_group(df: pd.DataFrame, group_col: str,
         ...     'site',
         ...     {'age': ['mean', 'std'], 'bmi': 'mean'}
         ... )
+        >>>
+        >>> # Several keys, codes reused across summaries
+        >>> keys = GroupKeys(df, ['site', 'intervention_group'])
+        >>> summary = summarize_by_group(df, keys, {'outcome_cvd': 'rate', 'adherence_pct': 'mean'})
     """
+    keys = group_col if isinstance(group_col, GroupKeys) else GroupKeys(df, group_col)
     if agg_dict is None:
-        agg_dict = {col: 'mean' for col in df.select_dtypes(include=[np.number]).columns}
-    return df.groupby(group_col).agg(agg_dict).reset_index()
-    pass
+        agg_dict = {col: 'mean' for col in df.select_dtypes(include=[np.number]).columns
+                    if col not in keys.columns}
+    flat = all(isinstance(fns, str) or callable(fns) for fns in agg_dict.values())
+
+    result = {}
+    for col, fns in agg_dict.items():
+        reducer = _GroupReducer(df[col], keys)
+        for fn in ([fns] if isinstance(fns, str) or callable(fns) else fns):
+            name = fn if isinstance(fn, str) else getattr(fn, '__name__', str(fn))
+            result[col if flat else (col, name)] = reducer.aggregate(fn)
+    return _summary_frame(keys.keys, result, flat)
+
+
+def _summary_frame(keys: pd.DataFrame, result: dict, flat: bool) -> pd.DataFrame:
+    """Key columns followed by the aggregates, laid out like groupby().agg().reset_index()."""
+    out = keys.copy()
+    for name, values in result.items():
+        out[name] = values
+    if not flat:
+        out.columns = pd.MultiIndex.from_tuples(
+            [(c, '') if isinstance(c, str) and c in keys.columns else c for c in out.columns])
+    return out
+
+
+# ----------------------------------------------------------------------------
+# Grouped aggregation engine
+# ----------------------------------------------------------------------------
+
+class GroupKeys:
+    """
+    Group keys factorized once into dense integer codes.
+
+    Each key column is factorized (sorted, missing keys excluded, as
+    DataFrame.groupby does) and the per-column codes are combined into one
+    group id per row. Build it once and pass it to summarize_by_group() to
+    skip re-hashing string keys on every summary of the same frame.
+
+    Attributes:
+        columns: Key column names
+        codes: np.ndarray of group ids per row (-1 where a key is missing)
+        ngroups: Number of observed groups
+        keys: DataFrame with one row of key values per group, in sorted order
+    """
+
+    def __init__(self, df: pd.DataFrame, columns):
+        self.columns = [columns] if isinstance(columns, str) else list(columns)
+        per_column, uniques = [], []
+        for col in self.columns:
+            codes, values = pd.factorize(df[col], sort=True)
+            per_column.append(codes)
+            uniques.append(values)
+        missing = np.zeros(len(df), dtype=bool)
+        for codes in per_column:
+            missing |= codes < 0
+        sizes = [max(len(u), 1) for u in uniques]
+        space = 1
+        for size in sizes:
+            space *= size                      # exact: may exceed int64
+        if space > np.iinfo(np.int64).max:
+            # too many combinations for one int64 id: find the observed key
+            # tuples directly (rows sort lexicographically, like the ids would)
+            stacked = np.column_stack([c[~missing] for c in per_column])
+            observed_rows, inverse = np.unique(stacked, axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            positions = tuple(observed_rows.T) if len(observed_rows) else tuple(
+                np.empty(0, dtype=np.int64) for _ in per_column)
+        else:
+            combined = np.ravel_multi_index([np.where(missing, 0, c) for c in per_column], sizes)[~missing]
+            if space <= max(4 * len(combined), 1 << 16):
+                # dense key space: compress the observed combinations with a bincount
+                present = np.bincount(combined, minlength=space) > 0
+                observed = np.flatnonzero(present)
+                inverse = (np.cumsum(present) - 1)[combined]
+            else:
+                observed, inverse = np.unique(combined, return_inverse=True)
+            positions = np.unravel_index(observed, sizes)
+        self.codes = np.full(len(df), -1, dtype=np.int64)
+        self.codes[~missing] = inverse
+        self.ngroups = len(positions[0])
+        self.keys = pd.DataFrame({col: pd.Series(u).take(pos).reset_index(drop=True)
+                                  for col, u, pos in zip(self.columns, uniques, positions)})
+        self._order = None
+
+    @property
+    def order(self):
+        """(row order grouping rows by id, start offset of each group); computed once."""
+        if self._order is None:
+            grouped = self.codes[self.codes >= 0]
+            # narrow ids let numpy's stable sort use radix sort
+            order = np.argsort(grouped.astype(np.min_scalar_type(max(self.ngroups - 1, 0))), kind='stable')
+            starts = np.concatenate([[0], np.cumsum(np.bincount(grouped, minlength=self.ngroups))])
+            self._order = (order, starts)
+        return self._order
+
+
+_YES_NO = {'yes': 1.0, 'y': 1.0, 'true': 1.0, '1': 1.0, 'no': 0.0, 'n': 0.0, 'false': 0.0, '0': 0.0}
+
+
+def _yes_no_flags(series: pd.Series) -> np.ndarray:
+    """1.0 / 0.0 per yes/no answer, NaN for anything else; each distinct spelling parsed once."""
+    codes, uniques = pd.factorize(series)
+    lookup = np.array([_YES_NO.get(str(u).strip().lower(), np.nan) for u in uniques] + [np.nan])
+    return lookup[codes]
+
+
+class _GroupReducer:
+    """Aggregations of one column over GroupKeys, sharing intermediate arrays."""
+
+    def __init__(self, series: pd.Series, keys: GroupKeys):
+        self.series = series
+        self.keys = keys
+        self.rows = keys.codes >= 0
+        self.ids = keys.codes[self.rows]
+        self._cache = {}
+
+    def _get(self, name):
+        """Lazily computed intermediates shared by several aggregations."""
+        if name not in self._cache:
+            if name == 'values':
+                value = self.series.to_numpy(dtype='float64', na_value=np.nan)[self.rows]
+            elif name == 'valid':
+                value = ~np.isnan(self._get('values'))
+            elif name == 'count':
+                value = self._bincount(self._get('valid'))
+            elif name == 'total':
+                value = self._bincount(self._get('valid'), self._get('values'))
+            elif name == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    value = self._get('total') / self._get('count')
+            else:  # 'grouped': values ordered so each group is contiguous
+                value = self._get('values')[self.keys.order[0]]
+            self._cache[name] = value
+        return self._cache[name]
+
+    def _bincount(self, mask, weights=None):
+        return np.bincount(self.ids[mask], weights=None if weights is None else weights[mask],
+                           minlength=self.keys.ngroups)
 
+    def _integral(self) -> bool:
+        dtype = self.series.dtype
+        return isinstance(dtype, np.dtype) and dtype.kind in 'iub'
 
+    def _nullable_integral(self) -> bool:
+        dtype = self.series.dtype
+        return not isinstance(dtype, np.dtype) and pd.api.types.is_integer_dtype(dtype)
+
+    def _nullable_reduce(self, fn):
+        """Exact sum/min/max of a nullable Int column, typed the way groupby types them."""
+        dtype = self.series.dtype
+        wide = np.uint64 if dtype.kind == 'u' else np.int64
+        if not self.keys.ngroups:
+            return pd.array([], dtype=dtype)
+        fill = {'sum': 0, 'min': np.iinfo(wide).max, 'max': np.iinfo(wide).min}[fn]
+        values = self.series.to_numpy(dtype=wide, na_value=fill)[self.rows][self.keys.order[0]]
+        ufunc = {'sum': np.add, 'min': np.minimum, 'max': np.maximum}[fn]
+        out = ufunc.reduceat(values, self.keys.order[1][:-1])
+        if fn == 'sum':
+            # groupby keeps the column's dtype when every total fits in it
+            limits = np.iinfo(dtype.numpy_dtype)
+            fits = limits.min <= out.min() and out.max() <= limits.max
+            return pd.array(out, dtype=dtype if fits else ('UInt64' if dtype.kind == 'u' else 'Int64'))
+        # groups without a value hold the fill value; they become <NA>
+        return pd.arrays.IntegerArray(out.astype(dtype.numpy_dtype), self._get('count') == 0)
+
+    def aggregate(self, fn):
+        if fn == 'size':
+            return np.bincount(self.ids, minlength=self.keys.ngroups)
+        if fn == 'rate':
+            flags = _yes_no_flags(self.series)[self.rows]
+            valid = ~np.isnan(flags)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return self._bincount(valid, flags) / self._bincount(valid)
+        if (not isinstance(fn, str) or fn not in ('count', 'sum', 'mean', 'std', 'var', 'min', 'max', 'median')
+                or not pd.api.types.is_numeric_dtype(self.series.dtype)):
+            # text, datetime and custom aggregations: pandas on the group ids
+            return self.series[self.rows].groupby(self.ids).agg(fn).reindex(range(self.keys.ngroups)).to_numpy()
+
+        if fn in ('sum', 'min', 'max') and self._nullable_integral():
+            return self._nullable_reduce(fn)
+        if fn == 'sum' and self._integral():
+            # exact int64 totals; a float64 bincount would round beyond 2**53
+            if not self.keys.ngroups:
+                return np.zeros(0, dtype=np.int64)
+            values = self.series.to_numpy()[self.rows].astype(np.int64)
+            return np.add.reduceat(values[self.keys.order[0]], self.keys.order[1][:-1])
+        count = self._get('count')
+        if fn == 'count':
+            return count
+        if fn == 'sum':
+            return self._get('total')
+        if fn == 'mean':
+            return self._get('mean')
+        if fn in ('std', 'var'):
+            valid = self._get('valid')
+            centered = np.where(valid, self._get('values') - self._get('mean')[self.ids], 0.0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                var = self._bincount(valid, centered ** 2) / (count - 1)
+            var[count < 2] = np.nan
+            return np.sqrt(var) if fn == 'std' else var
+
+        grouped = self._get('grouped')
+        starts = self.keys.order[1]
+        if fn in ('min', 'max'):
+            if not len(grouped):
+                return np.full(self.keys.ngroups, np.nan)
+            # fmin/fmax skip NaN; every observed group has at least one row
+            out = (np.fmin if fn == 'min' else np.fmax).reduceat(grouped, starts[:-1])
+            if self._integral():
+                return out.astype(self.series.dtype)
+            return out
+        # median: each contiguous group is partitioned (np.median) rather
+        # than the whole column sorted
+        out = np.full(self.keys.ngroups, np.nan)
+        for g in np.flatnonzero(count):
+            segment = grouped[starts[g]:starts[g + 1]]
+            out[g] = np.median(segment[~np.isnan(segment)])
+        return out
+
+
+# ----------------------------------------------------------------------------
+# Mergeable group aggregates
+# ----------------------------------------------------------------------------
+
+_STATE_FIELDS = ('n', 'sum', 'm2', 'min', 'max')
+_STATE_AGGS = ('count', 'size', 'sum', 'mean', 'std', 'var', 'min', 'max', 'median', 'rate')
+
+
+def _compress_sketch(groups: np.ndarray, values: np.ndarray, weights: np.ndarray,
+                     ngroups: int, size: int):
+    """
+    Collapse (group, value, weight) points into at most `size` centroids per group.
+
+    Equal values within a group are merged first, so a group with at most
+    `size` distinct values keeps them all (and its median stays exact).
+    Larger groups are cut into `size` buckets of equal weight, each kept as
+    its weighted mean. Returns (groups, values, weights) sorted by group,
+    then value.
+    """
+    valid = ~np.isnan(values)
+    groups, values, weights = groups[valid], values[valid], weights[valid]
+    order = np.lexsort((values, groups))
+    groups, values, weights = groups[order], values[order], weights[order]
+    if not len(groups):
+        return groups, values, weights
+    distinct = np.ones(len(groups), dtype=bool)
+    distinct[1:] = (groups[1:] != groups[:-1]) | (values[1:] != values[:-1])
+    ids = np.cumsum(distinct) - 1
+    weights = np.bincount(ids, weights)
+    groups, values = groups[distinct], values[distinct]
+
+    centroids = np.bincount(groups, minlength=ngroups)
+    if centroids.max() <= size:
+        return groups, values, weights
+    first = np.concatenate([[0], np.cumsum(centroids)])[:-1]
+    total = np.bincount(groups, weights, minlength=ngroups)
+    before = np.cumsum(weights) - weights - np.concatenate([[0], np.cumsum(total)])[:-1][groups]
+    bucket = np.floor((before + weights / 2) / total[groups] * size).astype(np.int64)
+    slot = np.where(centroids[groups] > size, bucket, np.arange(len(groups)) - first[groups])
+    key = groups * size + slot
+    ids = np.cumsum(np.concatenate([[True], key[1:] != key[:-1]])) - 1
+    merged = np.bincount(ids, weights)
+    return (groups[np.concatenate([[0], np.flatnonzero(np.diff(ids)) + 1])],
+            np.bincount(ids, weights * values) / merged, merged)
+
+
+def _sketch_median(groups: np.ndarray, values: np.ndarray, weights: np.ndarray,
+                   ngroups: int) -> np.ndarray:
+    """Per-group median of a sketch (exact while the group is uncompressed)."""
+    out = np.full(ngroups, np.nan)
+    if not len(groups):
+        return out
+    total = np.bincount(groups, weights, minlength=ngroups)
+    offset = np.concatenate([[0], np.cumsum(total)])[:-1]
+    cum = np.cumsum(weights)
+    present = np.flatnonzero(total > 0)
+    half = (total[present] - 1) / 2
+    lo = values[np.searchsorted(cum, offset[present] + np.floor(half), 'right')]
+    hi = values[np.searchsorted(cum, offset[present] + np.ceil(half), 'right')]
+    out[present] = (lo + hi) / 2
+    return out
+
+
+class GroupAggState:
+    """
+    Serializable, mergeable per-group partial aggregates.
+
+    For every group and column the state keeps the count of non-missing
+    values, their sum, the centered sum of squares (M2), min, max and a
+    quantile sketch of at most `sketch_size` centroids. States built from
+    separate batches or partitions merge into the state of their union,
+    so a refresh only has to aggregate the new rows. count, size, sum,
+    min and max are exact; mean, std and var agree with a full recompute
+    to floating-point rounding; median is exact while a group has no more
+    than `sketch_size` distinct values and approximate beyond that.
+
+    Text columns are read as yes/no answers (as summarize_by_group's
+    'rate' does), so their 'rate' or 'mean' is the share of yes.
+
+    Attributes:
+        keys: DataFrame with one row of key values per group, in sorted order
+        size: np.ndarray of rows per group
+        columns: {column: {field: np.ndarray}} partial aggregates
+        rows: Number of rows folded into the state
+        sketch_size: Maximum centroids per group and column
+
+    Example:
+        >>> state = GroupAggState.from_frame(df, 'site', ['age', 'bmi'])
+        >>> state.save('output/site_state.npz')
+        >>> # nightly: fold in only the rows appended since
+        >>> state = GroupAggState.load('output/site_state.npz')
+        >>> state = state.update(load_data(path).iloc[state.rows:])
+        >>> summary = state.summarize({'age': ['mean', 'median'], 'bmi': 'std'})
+    """
+
+    def __init__(self, keys: pd.DataFrame, size: np.ndarray, columns: dict,
+                 rows: int = 0, sketch_size: int = 1024):
+        self.keys = keys
+        self.size = size
+        self.columns = columns
+        self.rows = rows
+        self.sketch_size = sketch_size
+
+    @property
+    def ngroups(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, group_col, columns: list = None,
+                   sketch_size: int = 1024) -> 'GroupAggState':
+        """
+        Aggregate one batch.
+
+        Args:
+            df: Rows to aggregate
+            group_col: Column, list of columns, or GroupKeys to group by
+            columns: Columns to aggregate (default: numeric non-key columns)
+            sketch_size: Maximum quantile-sketch centroids per group
+
+        Returns:
+            GroupAggState: Partial aggregates of df
+        """
+        keys = group_col if isinstance(group_col, GroupKeys) else GroupKeys(df, group_col)
+        if columns is None:
+            columns = [col for col in df.select_dtypes(include=[np.number]).columns
+                       if col not in keys.columns]
+        group_keys = keys.keys.copy()
+        for col in keys.columns:
+            if isinstance(group_keys[col].dtype, pd.CategoricalDtype):
+                group_keys[col] = group_keys[col].astype(group_keys[col].cat.categories.dtype)
+        sizes = np.bincount(keys.codes[keys.codes >= 0], minlength=keys.ngroups)
+        starts = keys.order[1]
+        sketch_groups = np.repeat(np.arange(keys.ngroups), np.diff(starts))
+
+        state = {}
+        for col in columns:
+            series = df[col]
+            if not pd.api.types.is_numeric_dtype(series.dtype):
+                series = pd.Series(_yes_no_flags(series), index=series.index)
+            reducer = _GroupReducer(series, keys)
+            n = reducer.aggregate('count')
+            var = reducer.aggregate('var')
+            grouped = reducer._get('grouped')
+            state[col] = {
+                'n': n.astype(np.int64),
+                'sum': reducer._get('total'),
+                'm2': np.where(n > 1, var * (n - 1), 0.0),
+                'min': pd.Series(reducer.aggregate('min')).to_numpy(dtype='float64', na_value=np.nan),
+                'max': pd.Series(reducer.aggregate('max')).to_numpy(dtype='float64', na_value=np.nan),
+                'sketch': _compress_sketch(sketch_groups, grouped, np.ones(len(grouped)),
+                                           keys.ngroups, sketch_size),
+                'integral': reducer._integral(),
+            }
+        return cls(group_keys, sizes, state, rows=len(df), sketch_size=sketch_size)
+
+    def merge(self, other: 'GroupAggState') -> 'GroupAggState':
+        """Combine with the state of another batch or partition; neither is modified."""
+        if list(self.keys.columns) != list(other.keys.columns) or set(self.columns) != set(other.columns):
+            raise ValueError("can only merge states with the same key and value columns")
+        both = GroupKeys(pd.concat([self.keys, other.keys], ignore_index=True), list(self.keys.columns))
+        ids = both.codes
+        ngroups = both.ngroups
+        n_self = len(self.keys)
+
+        def remap(groups, side):
+            return ids[groups] if side == 0 else ids[n_self + groups]
+
+        columns = {}
+        for col in self.columns:
+            a, b = self.columns[col], other.columns[col]
+            part_n = np.concatenate([a['n'], b['n']])
+            part_sum = np.concatenate([a['sum'], b['sum']])
+            n = np.bincount(ids, part_n, minlength=ngroups).astype(np.int64)
+            total = np.bincount(ids, part_sum, minlength=ngroups)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = total / n
+                # Chan et al.: sum of M2 plus each part's offset from the merged mean
+                spread = np.where(part_n > 0, part_n * (part_sum / part_n - mean[ids]) ** 2, 0.0)
+            low = np.full(ngroups, np.nan)
+            high = np.full(ngroups, np.nan)
+            np.fmin.at(low, ids, np.concatenate([a['min'], b['min']]))
+            np.fmax.at(high, ids, np.concatenate([a['max'], b['max']]))
+            (ga, va, wa), (gb, vb, wb) = a['sketch'], b['sketch']
+            columns[col] = {
+                'n': n,
+                'sum': total,
+                'm2': np.bincount(ids, np.concatenate([a['m2'], b['m2']]) + spread, minlength=ngroups),
+                'min': low,
+                'max': high,
+                'sketch': _compress_sketch(np.concatenate([remap(ga, 0), remap(gb, 1)]),
+                                           np.concatenate([va, vb]), np.concatenate([wa, wb]),
+                                           ngroups, self.sketch_size),
+                'integral': a['integral'] and b['integral'],
+            }
+        size = np.bincount(ids, np.concatenate([self.size, other.size]), minlength=ngroups)
+        return GroupAggState(both.keys, size.astype(np.int64), columns,
+                             rows=self.rows + other.rows, sketch_size=self.sketch_size)
+
+    def update(self, df: pd.DataFrame) -> 'GroupAggState':
+        """Fold new rows (e.g. newly enrolled patients) into a copy of the state."""
+        batch = GroupAggState.from_frame(df, list(self.keys.columns), list(self.columns),
+                                         sketch_size=self.sketch_size)
+        return self.merge(batch)
+
+    def summarize(self, agg_dict: dict = None) -> pd.DataFrame:
+        """
+        Final aggregates, laid out like summarize_by_group().
+
+        Args:
+            agg_dict: Dict of {column: aggregation(s)} using any of count,
+                      size, sum, mean, std, var, min, max, median, rate.
+                      If None, uses 'mean' for every column in the state
+
+        Returns:
+            pd.DataFrame: One row per group
+        """
+        if agg_dict is None:
+            agg_dict = {col: 'mean' for col in self.columns}
+        flat = all(isinstance(fns, str) for fns in agg_dict.values())
+        result = {}
+        for col, fns in agg_dict.items():
+            st = self.columns[col]
+            n = st['n']
+            for fn in ([fns] if isinstance(fns, str) else fns):
+                if fn not in _STATE_AGGS:
+                    raise ValueError(f"Unsupported aggregation for {col}: {fn!r}")
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    if fn == 'count':
+                        val = n
+                    elif fn == 'size':
+                        val = self.size
+                    elif fn in ('sum', 'min', 'max'):
+                        val = st[fn].astype(np.int64) if st['integral'] else st[fn]
+                    elif fn in ('mean', 'rate'):
+                        val = st['sum'] / n
+                    elif fn in ('var', 'std'):
+                        val = np.where(n > 1, st['m2'] / (n - 1), np.nan)
+                        if fn == 'std':
+                            val = np.sqrt(val)
+                    else:
+                        val = _sketch_median(*st['sketch'], self.ngroups)
+                result[col if flat else (col, fn)] = val
+        return _summary_frame(self.keys, result, flat)
+
+    def save(self, path: str) -> None:
+        """Persist the state as an .npz file."""
+        meta = {'keys': list(self.keys.columns), 'columns': [], 'rows': self.rows,
+                'sketch_size': self.sketch_size}
+        arrays = {'size': self.size}
+        for j, col in enumerate(self.keys.columns):
+            values = self.keys[col]
+            arrays[f'k{j}'] = (values.to_numpy() if pd.api.types.is_numeric_dtype(values.dtype)
+                               else values.astype(str).to_numpy(dtype=str))
+        for j, (col, st) in enumerate(self.columns.items()):
+            meta['columns'].append([col, bool(st['integral'])])
+            for field in _STATE_FIELDS:
+                arrays[f'c{j}_{field}'] = st[field]
+            arrays[f'c{j}_sg'], arrays[f'c{j}_sv'], arrays[f'c{j}_sw'] = st['sketch']
+        with open(path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'GroupAggState':
+        """Load a state written by save()."""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            keys = pd.DataFrame({col: data[f'k{j}'] for j, col in enumerate(meta['keys'])})
+            columns = {}
+            for j, (col, integral) in enumerate(meta['columns']):
+                columns[col] = {field: data[f'c{j}_{field}'] for field in _STATE_FIELDS}
+                columns[col]['sketch'] = (data[f'c{j}_sg'], data[f'c{j}_sv'], data[f'c{j}_sw'])
+                columns[col]['integral'] = integral
+            return cls(keys, data['size'], columns, rows=meta['rows'], sketch_size=meta['sketch_size'])
+
+
+# ----------------------------------------------------------------------------
+# Streaming (chunked) mode
+#
+# These mirror the in-memory functions above but consume an iterator of
+# DataFrame chunks, e.g. load_data(path, chunksize=100_000). Operations that
+# are row-local (sentinel replacement, filtering, forward fill) run with
+# memory bounded by the chunk size. Operations that need global state say so
+# in their docstring.
+# ----------------------------------------------------------------------------
+
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Hash each row to a uint64, treating int and float columns alike.
+
+    read_csv infers dtypes per chunk, so the same column can be int64 in one
+    chunk and float64 (because of a NaN) in the next. Casting numeric columns
+    to float64 first keeps equal rows hashing equally across chunks.
+    """
+    numeric = df.select_dtypes(include=[np.number]).columns
+    if len(numeric):
+        df = df.astype({c: 'float64' for c in numeric})
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class _SeenHashes:
+    """Row hashes seen so far, as a few sorted uint64 runs (8 bytes per hash).
+
+    Each new batch becomes a run; runs of similar size are merged, so there
+    are O(log n) of them and every hash is re-sorted O(log n) times.
+    """
+
+    def __init__(self):
+        self.runs = []
+
+    def first_seen(self, hashes: np.ndarray) -> np.ndarray:
+        """Mask of the rows whose hash is new: not seen before nor earlier in the batch."""
+        uniq, first = np.unique(hashes, return_index=True)
+        new = np.ones(len(uniq), dtype=bool)
+        for run in self.runs:
+            pos = np.minimum(np.searchsorted(run, uniq), len(run) - 1)
+            new &= run[pos] != uniq
+        mask = np.zeros(len(hashes), dtype=bool)
+        mask[first[new]] = True
+        run = uniq[new]
+        while self.runs and len(self.runs[-1]) <= 2 * len(run):
+            run = np.sort(np.concatenate([self.runs.pop(), run]))
+        if len(run):
+            self.runs.append(run)
+        return mask
+
+
+def stream_clean_data(chunks, remove_duplicates: bool = True,
+                      sentinel_value=-999, subset: list = None):
+    """
+    Chunk-by-chunk version of clean_data().
+
+    Duplicates are detected across chunk boundaries by keeping the 64-bit hash
+    of every distinct row seen so far, as sorted uint64 arrays checked with
+    one vectorized search per chunk; the first occurrence of each row is
+    kept, as drop_duplicates() does. These arrays are the only global state:
+    8 bytes per distinct row, independent of the row width. Rows are compared
+    by hash only, so two distinct rows would be merged if their 64-bit hashes
+    collided (about n**2 / 2**65 for n distinct rows, i.e. ~3e-8 at 1M rows).
+
+    Args:
+        chunks: Iterable of DataFrames (e.g. from load_data(..., chunksize=n))
+        remove_duplicates: Whether to drop duplicate rows
+        sentinel_value: Value, list or {column: value} map, as in clean_data()
+        subset: Optional key columns identifying duplicates
+
+    Yields:
+        pd.DataFrame: Cleaned chunks
+
+    Example:
+        >>> chunks = load_data('data/clinical_trial_raw.csv', chunksize=2500)
+        >>> df_clean = pd.concat(stream_clean_data(chunks))
+    """
+    seen = _SeenHashes()
+    for chunk in chunks:
+        if remove_duplicates:
+            hashes = _row_hashes(chunk if subset is None else chunk[subset])
+            chunk = chunk[seen.first_seen(hashes)]
+        yield clean_data(chunk, remove_duplicates=False,
+                         sentinel_value=sentinel_value)
+
+
+def stream_filter_data(chunks, filters: list):
+    """
+    Chunk-by-chunk version of filter_data(). Filters are row-local, so the
+    concatenated output equals filter_data() on the whole file.
+
+    Args:
+        chunks: Iterable of DataFrames
+        filters: Same filter list accepted by filter_data()
+
+    Yields:
+        pd.DataFrame: Filtered chunks
+    """
+    for chunk in chunks:
+        yield filter_data(chunk, filters)
+
+
+@traced
+def stream_fill_value(chunks, column: str, strategy: str) -> float:
+    """
+    Compute the global fill value for stream_fill_missing() in one pass.
+
+    'mean' keeps only a running sum and count. 'median' needs every observed
+    value of the column, so it holds that single column (8 bytes per non-null
+    row) in memory; the result is the exact median, identical to the
+    in-memory path.
+
+    Args:
+        chunks: Iterable of DataFrames
+        column: Column name
+        strategy: 'mean' or 'median'
+
+    Returns:
+        float: The value fill_missing() would use on the full data
+    """
+    if strategy not in ("mean", "median"):
+        raise ValueError("Unknown strategy")
+    total, count, parts = 0.0, 0, []
+    for chunk in chunks:
+        values = chunk[column].astype(float).to_numpy()
+        values = values[~np.isnan(values)]
+        if strategy == "mean":
+            total += values.sum()
+            count += len(values)
+        else:
+            parts.append(values)
+    if strategy == "mean":
+        return total / count if count else np.nan
+    values = np.concatenate(parts) if parts else np.array([])
+    return float(np.median(values)) if len(values) else np.nan
+
+
+def stream_fill_missing(chunks, column: str, strategy: str,
+                        fill_value: float = None):
+    """
+    Chunk-by-chunk version of fill_missing().
+
+    'ffill' carries the last valid value across chunk boundaries, so it needs
+    no global state. 'mean' and 'median' depend on the whole column: compute
+    fill_value first with stream_fill_value() over a fresh iterator (a second
+    pass over the file), then stream the data through here.
+
+    Args:
+        chunks: Iterable of DataFrames
+        column: Column name to fill
+        strategy: 'mean', 'median', or 'ffill'
+        fill_value: Precomputed value for 'mean'/'median'
+
+    Yields:
+        pd.DataFrame: Chunks with filled values
+
+    Example:
+        >>> path = 'data/clinical_trial_raw.csv'
+        >>> value = stream_fill_value(load_data(path, chunksize=2500), 'bmi', 'median')
+        >>> chunks = stream_fill_missing(load_data(path, chunksize=2500), 'bmi',
+        ...                              'median', fill_value=value)
+    """
+    if strategy in ("mean", "median"):
+        if fill_value is None:
+            raise ValueError(f"'{strategy}' needs fill_value; "
+                             "compute it with stream_fill_value()")
+    elif strategy != "ffill":
+        raise ValueError("Unknown strategy")
+
+    last = None
+    for chunk in chunks:
+        out = chunk.copy()
+        if strategy == "ffill":
+            out[column] = out[column].ffill()
+            if last is not None:
+                out[column] = out[column].fillna(last)
+            valid = out[column].dropna()
+            if len(valid):
+                last = valid.iloc[-1]
+        else:
+            out[column] = out[column].astype(float).fillna(fill_value)
+        yield out
+
+
+_STREAM_AGGS = ('count', 'size', 'sum', 'mean', 'min', 'max', 'std', 'var', 'median')
+
+
+def _merge_partials(partials: pd.DataFrame, group_col: str) -> pd.DataFrame:
+    """Merge per-chunk (n, sum, min, max, m2) rows into one row per group."""
+    g = partials.groupby(group_col, sort=False)
+    n = g['n'].sum()
+    s = g['sum'].sum()
+    mean = s / n.where(n > 0)
+    # Chan et al. parallel variance: sum of M2 plus the between-chunk term.
+    chunk_mean = partials['sum'] / partials['n'].where(partials['n'] > 0)
+    spread = partials['n'] * (chunk_mean - partials[group_col].map(mean)) ** 2
+    m2 = g['m2'].sum() + spread.groupby(partials[group_col], sort=False).sum()
+    return pd.DataFrame({
+        'n': n, 'size': g['size'].sum(), 'sum': s,
+        'min': g['min'].min(), 'max': g['max'].max(), 'm2': m2,
+    }).rename_axis(group_col).reset_index()
+
+
+@traced
+def stream_summarize_by_group(chunks, group_col: str, agg_dict: dict = None) -> pd.DataFrame:
+    """
+    Chunk-by-chunk version of summarize_by_group().
+
+    Each chunk is reduced to per-group partial aggregates (count, sum, min,
+    max and the centered sum of squares), which are merged as chunks arrive,
+    so memory is bounded by chunk size x number of groups. count, size, sum,
+    min and max match the in-memory result exactly; mean, std and var are
+    combined from the partials and agree to floating-point rounding.
+    'median' has no exact mergeable form, so it keeps every value of the
+    aggregated column (grouped) in memory and is then exact.
+
+    Args:
+        chunks: Iterable of DataFrames
+        group_col: Column to group by
+        agg_dict: Dict of {column: aggregation(s)} using any of
+                  count, size, sum, mean, min, max, std, var, median.
+                  If None, uses 'mean' for every numeric column of the
+                  first chunk
+
+    Returns:
+        pd.DataFrame: Grouped and aggregated data, same layout as
+        summarize_by_group()
+    """
+    states = {}
+    medians = {}
+    specs = None
+    for chunk in chunks:
+        if specs is None:
+            if agg_dict is None:
+                agg_dict = {col: 'mean' for col in chunk.select_dtypes(include=[np.number]).columns
+                            if col != group_col}
+            specs = {col: ([fns] if isinstance(fns, str) else list(fns))
+                     for col, fns in agg_dict.items()}
+            for col, fns in specs.items():
+                unknown = set(fns) - set(_STREAM_AGGS)
+                if unknown:
+                    raise ValueError(f"Unsupported streaming aggregation(s) for {col}: {sorted(unknown)}")
+            medians = {col: {} for col, fns in specs.items() if 'median' in fns}
+        keys = chunk[group_col]
+        for col, fns in specs.items():
+            values = chunk[col]
+            g = values.groupby(keys)
+            count = g.count()
+            partial = pd.DataFrame({
+                'n': count, 'size': g.size(), 'sum': g.sum(),
+                'min': g.min(), 'max': g.max(),
+                'm2': g.var(ddof=0).fillna(0) * count,
+            }).rename_axis(group_col).reset_index()
+            if col in states:
+                partial = _merge_partials(pd.concat([states[col], partial], ignore_index=True), group_col)
+            states[col] = partial
+            if 'median' in fns:
+                for key, part in g:
+                    medians[col].setdefault(key, []).append(part.dropna().to_numpy())
+
+    if specs is None:
+        return pd.DataFrame(columns=[group_col])
+
+    flat = all(isinstance(fns, str) for fns in agg_dict.values())
+    result = {}
+    for col, fns in specs.items():
+        st = states[col].sort_values(group_col).set_index(group_col)
+        n = st['n']
+        for fn in fns:
+            if fn == 'count':
+                val = n
+            elif fn == 'size':
+                val = st['size']
+            elif fn in ('sum', 'min', 'max'):
+                val = st[fn]
+            elif fn == 'mean':
+                val = st['sum'] / n.where(n > 0)
+            elif fn in ('var', 'std'):
+                val = st['m2'] / (n - 1).where(n > 1)
+                if fn == 'std':
+                    val = np.sqrt(val)
+            else:
+                val = pd.Series({key: np.median(np.concatenate(parts)) if sum(map(len, parts)) else np.nan
+                                 for key, parts in medians[col].items()}, dtype='float64').reindex(st.index)
+            result[col if flat else (col, fn)] = val
+    out = pd.DataFrame(result)
+    out.index.name = group_col
+    return out.reset_index()
+
+
+
+# ----------------------------------------------------------------------------
+# Typed loading
+# ----------------------------------------------------------------------------
+
+# Declared dtypes for the 18 columns emitted by generate_data.py. Nullable
+# Int16/Int8 hold the integer measurements despite missing values (and the
+# -999 age sentinel), and the low-cardinality text columns (including the
+# raw, un-normalized variants) are categoricals. BMI stays float64: float32
+# would store 25.7 as 25.7000007629..., which then shows up in every mean
+# and median. 'id' stores 'P00042' as Int32 42.
+CLINICAL_TRIAL_SCHEMA = {
+    'patient_id': 'id',
+    'age': 'Int16',
+    'sex': 'category',
+    'bmi': 'float64',
+    'enrollment_date': 'category',
+    'systolic_bp': 'Int16',
+    'diastolic_bp': 'Int16',
+    'cholesterol_total': 'Int16',
+    'cholesterol_hdl': 'Int16',
+    'cholesterol_ldl': 'Int16',
+    'glucose_fasting': 'Int16',
+    'site': 'category',
+    'intervention_group': 'category',
+    'follow_up_months': 'Int8',
+    'adverse_events': 'Int16',
+    'outcome_cvd': 'category',
+    'adherence_pct': 'Int8',
+    'dropout': 'category',
+}
+
+
+def _read_dtypes(schema: dict):
+    if schema is None:
+        return None
+    return {col: ('str' if t == 'id' else t) for col, t in schema.items()}
+
+
+def _parse_ids(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """Turn 'id' columns such as 'P00042' into Int32 by dropping the letter prefix."""
+    for col, t in schema.items():
+        if t == 'id' and col in df.columns:
+            digits = df[col].str.replace(r'^\D+', '', regex=True)
+            df[col] = pd.to_numeric(digits, errors='coerce').astype('Int32')
+    return df
+
+
+def _read_csv_typed(filepath: str, schema: dict = None) -> pd.DataFrame:
+    if schema is None:
+        return pd.read_csv(filepath)
+    return _parse_ids(pd.read_csv(filepath, dtype=_read_dtypes(schema)), schema)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compare per-column memory of two versions of the same data.
+
+    Args:
+        before: e.g. load_data(path)
+        after: e.g. load_data(path, schema=True)
+
+    Returns:
+        pd.DataFrame: bytes before/after, bytes saved and % saved per column,
+        with a final 'TOTAL' row
+
+    Example:
+        >>> memory_report(load_data(path), load_data(path, schema=True)).loc['TOTAL']
+    """
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_before': before.memory_usage(deep=True, index=False),
+        'bytes_after': after.memory_usage(deep=True, index=False),
+    })
+    report.loc['TOTAL'] = ['', '', report['bytes_before'].sum(), report['bytes_after'].sum()]
+    report['bytes_saved'] = report['bytes_before'] - report['bytes_after']
+    report['pct_saved'] = (100 * report['bytes_saved'] / report['bytes_before']).round(1)
+    return report
+
+
+# ----------------------------------------------------------------------------
+# Category canonicalization
+# ----------------------------------------------------------------------------
+
+# Declarative rules for the messy text columns produced by generate_data.py.
+# 'values' lists the canonical spellings, 'aliases' maps extra spellings to
+# one of them, and 'fuzzy' is the difflib similarity cutoff used for typos
+# such as 'Contrl' or 'Treatmen A' (omit it to disable fuzzy matching).
+# Matching ignores case, whitespace and punctuation, so 'SITE A', 'site a',
+# 'Site  A' and 'Site_A' are all the same key.
+CANONICAL_RULES = {
+    'site': {'values': ['Site A', 'Site B', 'Site C', 'Site D', 'Site E'], 'fuzzy': 0.9},
+    'sex': {'values': ['M', 'F'], 'aliases': {'Male': 'M', 'Female': 'F'}},
+    'intervention_group': {'values': ['Control', 'Treatment A', 'Treatment B'], 'fuzzy': 0.8},
+    'outcome_cvd': {'values': ['Yes', 'No'], 'aliases': {'Y': 'Yes', 'N': 'No'}},
+    'dropout': {'values': ['Yes', 'No'], 'aliases': {'Y': 'Yes', 'N': 'No'}},
+}
+
+# Variant -> canonical mappings already resolved in this process, per column
+# and rule set; optionally persisted with cache_path.
+_CANONICAL_MEMO = {}
+
+
+def _canon_key(value: str) -> str:
+    return re.sub(r'[^0-9a-z]', '', value.lower())
+
+
+def _resolve_variant(value, rule: dict, lookup: dict):
+    """Map one distinct raw value to its canonical spelling (or None)."""
+    if not isinstance(value, str):
+        return None
+    key = _canon_key(value)
+    if key in lookup:
+        return lookup[key]
+    cutoff = rule.get('fuzzy')
+    if cutoff and key:
+        match = difflib.get_close_matches(key, list(lookup), n=1, cutoff=cutoff)
+        if match:
+            return lookup[match[0]]
+    return None
+
+
+@traced
+def canonicalize_categories(df: pd.DataFrame, rules: dict = None, columns: list = None,
+                            cache_path: str = None, inplace: bool = False) -> pd.DataFrame:
+    """
+    Normalize messy text categories to canonical values.
+
+    Only the distinct values of each column are examined (once); the row
+    data is then remapped in bulk through integer codes, so the cost scales
+    with the number of distinct spellings, not the number of rows. Results
+    are categoricals whose categories follow the rule's 'values' order.
+    Values that match no rule become NaN.
+
+    Args:
+        df: Input DataFrame
+        rules: {column: rule} as in CANONICAL_RULES (the default)
+        columns: Columns to normalize (default: every rule column in df)
+        cache_path: Optional JSON file that persists the variant -> canonical
+                    dictionaries between runs
+        inplace: Modify df instead of returning a copy
+
+    Returns:
+        pd.DataFrame: Data with canonical categorical columns
+
+    Example:
+        >>> df = canonicalize_categories(df)
+        >>> df['site'].unique().tolist()
+        ['Site B', 'Site A', 'Site E', 'Site C', 'Site D']
+    """
+    rules = CANONICAL_RULES if rules is None else rules
+    columns = [c for c in (columns or rules) if c in df.columns]
+    out = df if inplace else df.copy(deep=False)
+
+    stored = {}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as f:
+            stored = json.load(f)
+    changed = False
+
+    for col in columns:
+        rule = rules[col]
+        canonical = list(rule['values'])
+        fingerprint = json.dumps(rule, sort_keys=True)
+        memo = _CANONICAL_MEMO.setdefault((col, fingerprint), {})
+        entry = stored.get(col, {})
+        if entry.get('rule') == fingerprint:
+            memo.update(entry.get('mapping', {}))
+
+        lookup = {_canon_key(v): v for v in canonical}
+        lookup.update({_canon_key(a): v for a, v in rule.get('aliases', {}).items()})
+
+        series = out[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+        else:
+            codes, uniques = pd.factorize(series)
+        position = {v: i for i, v in enumerate(canonical)}
+        target = np.empty(len(uniques) + 1, dtype=np.int64)
+        target[-1] = -1  # code -1 (missing) maps to missing
+        for i, raw in enumerate(uniques):
+            if raw not in memo:
+                memo[raw] = _resolve_variant(raw, rule, lookup)
+                changed = True
+            value = memo[raw]
+            target[i] = position[value] if value is not None else -1
+        out[col] = pd.Categorical.from_codes(target[codes], categories=canonical)
+
+        if cache_path:
+            stored[col] = {'rule': fingerprint,
+                           'mapping': {k: v for k, v in memo.items() if isinstance(k, str)}}
+
+    if cache_path and (changed or not os.path.exists(cache_path)):
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=1, sort_keys=True)
+    return out
+
+
+# ----------------------------------------------------------------------------
+# Date parsing
+# ----------------------------------------------------------------------------
+
+# (name, pattern, strptime format) for the date layouts generate_data.py
+# writes. Patterns are tried in order; each string is parsed with the
+# explicit format of the first pattern it matches.
+DATE_FORMATS = [
+    ('YYYY-MM-DD', r'^\d{4}-\d{1,2}-\d{1,2}$', '%Y-%m-%d'),
+    ('MM/DD/YYYY', r'^\d{1,2}/\d{1,2}/\d{4}$', '%m/%d/%Y'),
+    ('DD-MM-YYYY', r'^\d{1,2}-\d{1,2}-\d{4}$', '%d-%m-%Y'),
+]
+
+
+_PANDAS_MAJOR = int(pd.__version__.split('.')[0])
+
+
+def _parse_any_dates(text: pd.Series) -> pd.Series:
+    """Parse each value by inference (NaT if unparseable).
+
+    format='mixed' only exists from pandas 2.0; older versions parse the
+    values one by one, which is affordable because only distinct values
+    that matched no known layout get here.
+    """
+    if _PANDAS_MAJOR >= 2:
+        return pd.to_datetime(text, errors='coerce', format='mixed')
+    return pd.Series([pd.to_datetime(v, errors='coerce') for v in text], index=text.index,
+                     dtype='datetime64[ns]')
+
+
+@traced
+def parse_dates(values: pd.Series, formats: list = None, report: bool = False):
+    """
+    Parse a column of date strings written in several known layouts.
+
+    The column is factorized first, so every distinct string is classified
+    and parsed exactly once however often it repeats. Each distinct string
+    is matched against the patterns in `formats` (vectorized regex) and
+    parsed with that pattern's explicit format; strings matching no pattern
+    fall back to pandas' per-element inference. Unparseable strings
+    become NaT.
+
+    Args:
+        values: Series of date strings (object, string or category dtype)
+        formats: List of (name, regex, strptime format); default DATE_FORMATS
+        report: Also return a per-format parse report
+
+    Returns:
+        pd.Series: datetime64 values aligned with `values`, and if report is
+        True a pd.DataFrame indexed by format with the number of rows and
+        distinct strings matched and rows that failed to parse
+
+    Example:
+        >>> dates, rep = parse_dates(df['enrollment_date'], report=True)
+        >>> rep.loc['MM/DD/YYYY', 'rows']
+        740
+    """
+    formats = DATE_FORMATS if formats is None else formats
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), pd.Index(values.cat.categories)
+    else:
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Index(uniques)
+    text = pd.Series(uniques.astype(str), dtype=object).str.strip()
+    rows_per_unique = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+    pending = np.ones(len(uniques), dtype=bool)
+    pieces, stats = [], {}
+    for name, pattern, fmt in formats:
+        matched = pending & text.str.match(pattern).to_numpy()
+        parsed = pd.to_datetime(text[matched], format=fmt, errors='coerce')
+        pieces.append(parsed)
+        pending &= ~matched
+        failed = parsed.isna().to_numpy()
+        stats[name] = (rows_per_unique[matched].sum(), matched.sum(),
+                       rows_per_unique[np.flatnonzero(matched)[failed]].sum())
+    if pending.any():
+        parsed = _parse_any_dates(text[pending])
+        pieces.append(parsed)
+        failed = parsed.isna().to_numpy()
+        stats['other'] = (rows_per_unique[pending].sum(), pending.sum(),
+                          rows_per_unique[np.flatnonzero(pending)[failed]].sum())
+
+    parsed = pd.concat(pieces).reindex(range(len(uniques) + 1))  # last slot: missing
+    result = pd.Series(parsed.to_numpy()[codes], index=values.index, name=values.name)
+    if not report:
+        return result
+    rep = pd.DataFrame.from_dict(stats, orient='index', columns=['rows', 'distinct', 'failed'])
+    rep.loc['missing'] = [int((codes < 0).sum()), 0, 0]
+    rep.index.name = 'format'
+    return result, rep.astype('int64')
+
+
+# ----------------------------------------------------------------------------
+# Parsed-data cache
+#
+# A cache is a directory holding meta.json plus one raw binary file per
+# column: numeric columns are stored as their numpy buffer, string columns
+# as int32 dictionary codes (-1 = missing) plus a fixed-width unicode
+# dictionary of the distinct values.
+# ----------------------------------------------------------------------------
+
+_CACHE_FORMAT = 1
+
+
+class _UnsupportedColumn(TypeError):
+    """Raised when a column cannot be stored in the columnar format."""
+
+
+def _cache_dir(filepath: str, schema: dict = None, root: str = None) -> str:
+    """Cache directory of filepath: beside it, or under root (tagged with its directory)."""
+    directory, name = os.path.split(os.path.abspath(filepath))
+    if root is not None:
+        name = f"{name}.{hashlib.blake2b(directory.encode(), digest_size=4).hexdigest()}"
+        directory = root
+    if schema is not None:
+        tag = hashlib.blake2b(json.dumps(schema, sort_keys=True).encode(), digest_size=4).hexdigest()
+        name = f"{name}.{tag}"
+    return os.path.join(directory, f".{name}.cache")
+
+
+def _file_hash(filepath: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_fingerprint(filepath: str) -> dict:
+    st = os.stat(filepath)
+    return {"path": os.path.abspath(filepath), "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns, "hash": _file_hash(filepath)}
+
+
+def _source_matches(key: dict, filepath: str) -> bool:
+    """Whether a stored fingerprint still describes filepath.
+
+    Size and mtime are checked first; if only the mtime changed (e.g. after a
+    git checkout) the content hash decides, and a matching hash refreshes
+    key["mtime_ns"] in place so the caller can store it and make the next
+    check cheap again.
+    """
+    st = os.stat(filepath)
+    if key.get("path") != os.path.abspath(filepath) or key.get("size") != st.st_size:
+        return False
+    if key.get("mtime_ns") != st.st_mtime_ns:
+        if key.get("hash") != _file_hash(filepath):
+            return False
+        key["mtime_ns"] = st.st_mtime_ns
+    return True
+
+
+def _source_key(filepath: str, cache_dir: str):
+    """Return the cache's source key if it is still valid for filepath, else None."""
+    meta_path = os.path.join(cache_dir, "meta.json")
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    key = meta.get("source", {})
+    mtime_ns = key.get("mtime_ns")
+    if (meta.get("format") != _CACHE_FORMAT or meta.get("pandas") != pd.__version__
+            or not _source_matches(key, filepath)):
+        return None
+    if key["mtime_ns"] != mtime_ns:
+        try:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        except OSError:
+            pass
+    return key
+
+
+def _write_dictionary(values, path: str) -> str:
+    """Write distinct strings as a fixed-width unicode array; return its dtype."""
+    if not all(isinstance(v, str) for v in values):
+        raise _UnsupportedColumn("dictionary mixes strings and other objects")
+    dictionary = np.array(list(values), dtype=str) if len(values) else np.array([], dtype="<U1")
+    dictionary.tofile(path)
+    return dictionary.dtype.str
+
+
+def _write_columns(df: pd.DataFrame, dirpath: str, extra: dict = None) -> None:
+    """Write df as one binary file per column plus meta.json into dirpath.
+
+    Column kinds: 'numeric' (numpy buffer, including datetime64 /
+    timedelta64), 'masked' (nullable Int/Float/
+    boolean: numpy buffer plus a packed null bitmap), 'string' (int32 codes
+    into a string dictionary) and 'category' (pandas codes plus categories,
+    stored as a string dictionary or a numeric buffer).
+    """
+    index = df.index
+    if not (isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1):
+        raise _UnsupportedColumn("only a default RangeIndex can be stored")
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df.iloc[:, i]
+        dtype = series.dtype
+        base = os.path.join(dirpath, f"c{i}")
+        entry = {"name": name, "file": f"c{i}", "dtype": str(dtype)}
+        if isinstance(dtype, np.dtype) and dtype.kind in "biufmM":
+            entry["kind"] = "numeric"
+            series.to_numpy().tofile(base + ".values")
+        elif isinstance(series.array, pd.api.extensions.ExtensionArray) and hasattr(dtype, "numpy_dtype") \
+                and not isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype)):
+            mask = series.isna().to_numpy()
+            values = series.to_numpy(dtype=dtype.numpy_dtype, na_value=False if dtype.kind == "b" else 0)
+            entry.update(kind="masked", values_dtype=values.dtype.str)
+            values.tofile(base + ".values")
+            np.packbits(mask).tofile(base + ".nulls")
+        elif isinstance(dtype, pd.CategoricalDtype):
+            categories = dtype.categories
+            entry.update(kind="category", codes_dtype=series.cat.codes.dtype.str,
+                         ordered=bool(dtype.ordered), categories_dtype=str(categories.dtype))
+            series.cat.codes.to_numpy().tofile(base + ".values")
+            if categories.dtype.kind in "biuf":
+                entry["dict_dtype"] = categories.dtype.str
+                categories.to_numpy().tofile(base + ".dict")
+            else:
+                entry["dict_dtype"] = _write_dictionary(categories, base + ".dict")
+        elif dtype == object or pd.api.types.is_string_dtype(dtype):
+            codes, uniques = pd.factorize(series)
+            entry.update(kind="string", dict_dtype=_write_dictionary(uniques, base + ".dict"))
+            codes.astype(np.int32).tofile(base + ".values")
+        else:
+            raise _UnsupportedColumn(f"column {name!r} has unsupported dtype {dtype}")
+        columns.append(entry)
+    meta = {"format": _CACHE_FORMAT, "pandas": pd.__version__, "nrows": len(df), "columns": columns}
+    meta.update(extra or {})
+    with open(os.path.join(dirpath, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def _read_array(path: str, dtype, start: int = 0, count: int = -1, mmap: bool = False) -> np.ndarray:
+    """Read `count` items from `start` (all by default).
+
+    Slices, and everything when mmap is set, are memory-mapped copy-on-write:
+    pages are loaded on first access and writes never reach the file.
+    """
+    dtype = np.dtype(dtype)
+    if count < 0:
+        count = os.path.getsize(path) // dtype.itemsize - start
+        if not mmap and start == 0:
+            return np.fromfile(path, dtype=dtype)
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="c", offset=start * dtype.itemsize,
+                     shape=(count,)).view(np.ndarray)
+
+
+def _read_columns(dirpath: str, rows: slice = None, columns: list = None,
+                  mmap: bool = False) -> pd.DataFrame:
+    """Rebuild the DataFrame written by _write_columns().
+
+    With `rows` (a step-1 slice), only that block of rows is mapped and
+    read, and the result keeps its positions as a RangeIndex. `columns`
+    limits the read to those columns (in that order). With mmap, numeric
+    columns are backed by the memory-mapped files instead of being read.
+    """
+    with open(os.path.join(dirpath, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    entries = meta["columns"]
+    if columns is not None:
+        by_name = {entry["name"]: entry for entry in entries}
+        missing = [c for c in columns if c not in by_name]
+        if missing:
+            raise KeyError(f"columns not in the dataset: {missing}")
+        entries = [by_name[c] for c in columns]
+    start, stop = 0, meta["nrows"]
+    if rows is not None:
+        start, stop, _ = rows.indices(meta["nrows"])
+        stop = max(start, stop)
+    nrows = stop - start
+    count = -1 if rows is None else nrows
+    data = {}
+    for entry in entries:
+        base = os.path.join(dirpath, entry["file"])
+        kind = entry["kind"]
+        if kind == "numeric":
+            data[entry["name"]] = _read_array(base + ".values", entry["dtype"], start, count, mmap)
+        elif kind == "masked":
+            values = np.array(_read_array(base + ".values", entry["values_dtype"], start, count))
+            first = start // 8
+            bits = _read_array(base + ".nulls", np.uint8, first,
+                               -1 if rows is None else (stop + 7) // 8 - first)
+            mask = np.unpackbits(bits, count=(stop + 7) // 8 * 8 - first * 8)[start - first * 8:][:nrows]
+            array_type = pd.api.types.pandas_dtype(entry["dtype"]).construct_array_type()
+            data[entry["name"]] = pd.Series(array_type(values, mask.astype(bool)))
+        elif kind == "category":
+            codes = _read_array(base + ".values", entry["codes_dtype"], start, count, mmap)
+            categories = np.fromfile(base + ".dict", dtype=entry["dict_dtype"])
+            categories = pd.Index(categories.astype(object) if categories.dtype.kind == "U" else categories,
+                                  dtype=entry["categories_dtype"])
+            data[entry["name"]] = pd.Series(pd.Categorical.from_codes(codes, categories=categories,
+                                                                      ordered=entry["ordered"]))
+        else:
+            codes = _read_array(base + ".values", np.int32, start, count)
+            dictionary = np.fromfile(base + ".dict", dtype=entry["dict_dtype"]).astype(object)
+            values = dictionary[codes] if len(dictionary) else np.empty(len(codes), dtype=object)
+            values[codes < 0] = np.nan
+            data[entry["name"]] = pd.Series(values, dtype=entry["dtype"])
+    out = pd.DataFrame(data, index=pd.RangeIndex(nrows), copy=False)
+    if start:
+        out.index = pd.RangeIndex(start, stop)
+    return out
+
+
+def _write_cache(df: pd.DataFrame, source: dict, cache_dir: str) -> None:
+    """Store df as the cache for the source fingerprinted as `source`; failures only cost the cache."""
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=os.path.basename(cache_dir) + ".",
+                               dir=os.path.dirname(cache_dir))
+        _write_columns(df, tmp, {"source": source})
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.rename(tmp, cache_dir)
+        tmp = None
+    except (OSError, _UnsupportedColumn):
+        pass
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+# ----------------------------------------------------------------------------
+# Dataset store
+# ----------------------------------------------------------------------------
+
+@traced
+def save_dataset(df: pd.DataFrame, path: str) -> str:
+    """
+    Save a DataFrame in the columnar binary format, keeping its dtypes.
+
+    Numeric, boolean (e.g. one-hot) and datetime columns are written as
+    raw buffers, nullable Int/Float columns with a null bitmap, categoricals
+    as codes plus their categories, and text columns as codes into a string
+    dictionary. A non-default index is stored as extra columns. The
+    dataset is written to a temporary directory and renamed into place, so
+    a reader never sees a partly written dataset.
+
+    Args:
+        df: DataFrame to save
+        path: Dataset directory to create or replace (e.g. 'output/q6_transformed_data.store')
+
+    Returns:
+        str: path
+
+    Raises:
+        TypeError: If a column has a dtype the format cannot store (e.g.
+                   mixed Python objects or timezone-aware datetimes)
+
+    Example:
+        >>> save_dataset(df, 'output/q6_transformed_data.store')
+        >>> df = load_dataset('output/q6_transformed_data.store')
+    """
+    extra = {}
+    index = df.index
+    if not (isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1
+            and index.name is None):
+        names = [name if name is not None else f"__index_level_{i}__" for i, name in enumerate(index.names)]
+        extra["index"] = {"columns": names, "names": list(index.names)}
+        df = df.copy(deep=False)
+        df.index = index.set_names(names)
+        df = df.reset_index()
+    target = os.path.abspath(path)
+    tmp = tempfile.mkdtemp(prefix=os.path.basename(target) + ".", dir=os.path.dirname(target))
+    try:
+        _write_columns(df, tmp, extra)
+        shutil.rmtree(target, ignore_errors=True)
+        os.rename(tmp, target)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return path
+
+
+@traced
+def load_dataset(path: str, columns: list = None, mmap: bool = False) -> pd.DataFrame:
+    """
+    Load a dataset written by save_dataset().
+
+    Args:
+        path: Dataset directory
+        columns: Only read these columns (the others are never touched)
+        mmap: Back numeric columns by the memory-mapped files instead of
+              reading them; pages load on first access and changes to the
+              frame are never written back
+
+    Returns:
+        pd.DataFrame: The saved frame, with its dtypes and index
+
+    Example:
+        >>> df = load_dataset('output/q6_transformed_data.store', columns=['site', 'age', 'bmi'])
+    """
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        index = json.load(f).get("index")
+    if columns is not None and index is not None:
+        columns = index["columns"] + [c for c in columns if c not in index["columns"]]
+    df = _read_columns(path, columns=columns, mmap=mmap)
+    if index is not None:
+        df = df.set_index(index["columns"])
+        df.index.names = index["names"]
+    return df
+
+
+def _smallest_code_dtype(n: int) -> np.dtype:
+    """The signed integer dtype pandas uses for the codes of n categories."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class _ColumnWriter:
+    """Appends one column, chunk by chunk, in the _write_columns() layout.
+
+    Dictionaries (string values, categories) are global: each chunk's values
+    are mapped to codes in order of first appearance across the whole file.
+    """
+
+    def __init__(self, dirpath: str, i: int, name, series: pd.Series):
+        self.base = os.path.join(dirpath, f"c{i}")
+        self.dtype = series.dtype
+        self.entry = {"name": name, "file": f"c{i}", "dtype": str(series.dtype)}
+        self.codes = {}
+        dtype = series.dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in "biufmM":
+            self.entry["kind"] = "numeric"
+        elif isinstance(dtype, pd.CategoricalDtype):
+            self.entry.update(kind="category", ordered=False,
+                              categories_dtype=str(dtype.categories.dtype))
+        elif hasattr(dtype, "numpy_dtype") and not isinstance(dtype, pd.StringDtype):
+            self.entry.update(kind="masked", values_dtype=np.dtype(dtype.numpy_dtype).str)
+        elif dtype == object or pd.api.types.is_string_dtype(dtype):
+            self.entry["kind"] = "string"
+        else:
+            raise _UnsupportedColumn(f"column {name!r} has unsupported dtype {dtype}")
+        self.values = open(self.base + ".values", "wb")
+        self.nulls = open(self.base + ".nulls", "wb") if self.entry["kind"] == "masked" else None
+
+    def _global_codes(self, local_codes: np.ndarray, uniques) -> np.ndarray:
+        lookup = np.array([self.codes.setdefault(u, len(self.codes)) for u in uniques] + [-1],
+                          dtype=np.int32)
+        return lookup[local_codes]           # local -1 (missing) hits the trailing -1
+
+    def append(self, series: pd.Series) -> None:
+        kind = self.entry["kind"]
+        if series.dtype != self.dtype and not (kind == "category" and isinstance(series.dtype, pd.CategoricalDtype)):
+            raise _UnsupportedColumn(f"column {self.entry['name']!r} changed dtype between chunks")
+        if kind == "numeric":
+            series.to_numpy().tofile(self.values)
+        elif kind == "masked":
+            na = False if self.dtype.kind == "b" else 0
+            series.to_numpy(dtype=self.dtype.numpy_dtype, na_value=na).tofile(self.values)
+            np.packbits(series.isna().to_numpy()).tofile(self.nulls)
+        elif kind == "category":
+            codes = series.cat.codes.to_numpy()
+            self._global_codes(codes, list(series.cat.categories)).tofile(self.values)
+        else:
+            codes, uniques = pd.factorize(series)
+            self._global_codes(codes, list(uniques)).tofile(self.values)
+
+    def finish(self) -> dict:
+        self.values.close()
+        if self.nulls is not None:
+            self.nulls.close()
+        kind = self.entry["kind"]
+        if kind == "string":
+            self.entry["dict_dtype"] = _write_dictionary(list(self.codes), self.base + ".dict")
+        elif kind == "category":
+            # sorted categories, as read_csv(dtype='category') gives for inputs
+            # it parses in one piece; renumber the codes to match
+            categories = sorted(self.codes)
+            rank = np.empty(len(categories) + 1, dtype=np.int64)
+            rank[[self.codes[c] for c in categories]] = np.arange(len(categories))
+            rank[-1] = -1
+            code_dtype = _smallest_code_dtype(len(categories))
+            codes = np.fromfile(self.base + ".values", dtype=np.int32)
+            rank[codes].astype(code_dtype).tofile(self.base + ".values")
+            self.entry.update(codes_dtype=code_dtype.str,
+                              dict_dtype=_write_dictionary(categories, self.base + ".dict"))
+        return self.entry
+
+
+@traced
+def convert_csv_to_dataset(filepath: str, path: str, schema=True,
+                           chunksize: int = 1_000_000) -> str:
+    """
+    Convert a CSV file to a dataset store without loading it whole.
+
+    The CSV is parsed chunk by chunk with the declared dtypes and each column
+    is appended to its binary file: fixed-width numbers, nullable integers
+    with a null bitmap, and text and categoricals as codes into a dictionary
+    shared by all chunks. Peak memory is one chunk plus the dictionaries.
+    The result loads like save_dataset(load_data(filepath, schema=schema)),
+    except that categories are always sorted (read_csv orders them by first
+    appearance across its internal blocks on large files).
+
+    Args:
+        filepath: Path to CSV file
+        path: Dataset directory to create or replace
+        schema: {column: dtype} as in load_data(); True for
+                CLINICAL_TRIAL_SCHEMA. Columns it does not declare are read
+                as text, since per-chunk type inference could disagree
+        chunksize: Rows parsed at a time (rounded up to a multiple of 8)
+
+    Returns:
+        str: path
+
+    Example:
+        >>> convert_csv_to_dataset('data/load_test.csv', 'data/load_test.store')
+        >>> ds = open_dataset('data/load_test.store')
+    """
+    schema = CLINICAL_TRIAL_SCHEMA if schema is True else dict(schema or {})
+    header = list(pd.read_csv(filepath, nrows=0).columns)
+    schema = {col: schema.get(col, 'str') for col in header}
+    chunksize = -(-chunksize // 8) * 8      # keeps every chunk's null bitmap byte-aligned
+
+    target = os.path.abspath(path)
+    tmp = tempfile.mkdtemp(prefix=os.path.basename(target) + ".", dir=os.path.dirname(target))
+    writers, nrows = None, 0
+    try:
+        for chunk in pd.read_csv(filepath, chunksize=chunksize, dtype=_read_dtypes(schema)):
+            chunk = _parse_ids(chunk, schema)
+            if writers is None:
+                writers = [_ColumnWriter(tmp, i, name, chunk.iloc[:, i]) for i, name in enumerate(chunk.columns)]
+            for i, writer in enumerate(writers):
+                writer.append(chunk.iloc[:, i])
+            nrows += len(chunk)
+        if writers is None:
+            _write_columns(_read_csv_typed(filepath, schema), tmp)
+        else:
+            meta = {"format": _CACHE_FORMAT, "pandas": pd.__version__, "nrows": nrows,
+                    "columns": [writer.finish() for writer in writers]}
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        shutil.rmtree(target, ignore_errors=True)
+        os.rename(tmp, target)
+    except BaseException:
+        for writer in writers or []:
+            writer.values.close()
+            if writer.nulls is not None:
+                writer.nulls.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return path
+
+
+class ColumnarDataset:
+    """
+    A dataset store opened memory-mapped.
+
+    Nothing is read when the dataset is opened. Columns and row ranges are
+    mapped from the files on access, so reading any slice costs the same
+    whatever its position, and processes that open the same store share one
+    copy of its pages in the OS page cache. Only the path is pickled, so a
+    ColumnarDataset can be passed to worker processes cheaply.
+
+    Example:
+        >>> ds = open_dataset('output/q6_transformed_data.store')
+        >>> ages = ds.values('age')              # read-only np.memmap, no copy
+        >>> block = ds[1_000_000:1_010_000]      # DataFrame of those rows
+        >>> bp = ds[['systolic_bp', 'diastolic_bp']]
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.nrows = meta["nrows"]
+        self.index = meta.get("index")
+        self._entries = {entry["name"]: entry for entry in meta["columns"]}
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def __len__(self) -> int:
+        return self.nrows
+
+    def __repr__(self) -> str:
+        return f"ColumnarDataset({self.path!r}, rows={self.nrows}, columns={len(self._entries)})"
+
+    @property
+    def columns(self) -> list:
+        return list(self._entries)
+
+    def _entry(self, name) -> dict:
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError(f"columns not in the dataset: {[name]}") from None
+
+    def values(self, name) -> np.ndarray:
+        """
+        The stored buffer of a column as a read-only memory map.
+
+        This is the values of numeric and nullable columns (missing entries
+        hold 0; see nulls()) and the dictionary codes of text and category
+        columns (-1 = missing).
+        """
+        entry = self._entry(name)
+        dtype = {"numeric": entry["dtype"], "masked": entry.get("values_dtype"),
+                 "category": entry.get("codes_dtype"), "string": np.int32}[entry["kind"]]
+        if self.nrows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, entry["file"] + ".values"), dtype=dtype,
+                         mode="r", shape=(self.nrows,))
+
+    def nulls(self, name, rows: slice = None) -> np.ndarray:
+        """Boolean missing-value mask of a column (of `rows` only, if given)."""
+        entry = self._entry(name)
+        start, stop, _ = (rows or slice(None)).indices(self.nrows)
+        stop = max(start, stop)
+        if entry["kind"] == "masked":
+            first = start // 8
+            bits = _read_array(os.path.join(self.path, entry["file"] + ".nulls"), np.uint8, first,
+                               (stop + 7) // 8 - first)
+            return np.unpackbits(bits).astype(bool)[start - first * 8:][:stop - start]
+        if entry["kind"] in ("category", "string"):
+            return self.values(name)[start:stop] < 0
+        values = self.values(name)[start:stop]
+        return np.isnat(values) if values.dtype.kind in "mM" else (
+            np.isnan(values) if values.dtype.kind == "f" else np.zeros(len(values), dtype=bool))
+
+    def read(self, columns: list = None, rows: slice = None) -> pd.DataFrame:
+        """
+        Rows and columns as a DataFrame; numeric columns stay memory-mapped.
+
+        Args:
+            columns: Columns to read (default all)
+            rows: A step-1 slice of row positions (default all)
+        """
+        if rows is not None and rows.step not in (None, 1):
+            raise ValueError("only step-1 row slices can be mapped")
+        if columns is not None:
+            for name in columns:
+                self._entry(name)
+        if self.index is not None and columns is not None:
+            columns = self.index["columns"] + [c for c in columns if c not in self.index["columns"]]
+        df = _read_columns(self.path, rows=rows, columns=columns, mmap=True)
+        if self.index is not None:
+            df = df.set_index(self.index["columns"])
+            df.index.names = self.index["names"]
+        return df
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.read(rows=key)
+        if isinstance(key, list):
+            return self.read(columns=key)
+        return self.read(columns=[key])[key]
+
+
+def open_dataset(path: str) -> ColumnarDataset:
+    """
+    Open a dataset store (from save_dataset or convert_csv_to_dataset) memory-mapped.
+
+    Args:
+        path: Dataset directory
+
+    Returns:
+        ColumnarDataset: Lazily mapped view of the dataset
+
+    Example:
+        >>> ds = open_dataset('output/q6_transformed_data.store')
+        >>> ds['bmi'].mean()
+    """
+    return ColumnarDataset(path)
+
+
+# ----------------------------------------------------------------------------
+# Column indexes
+# ----------------------------------------------------------------------------
+
+# A position result keeping more than 1/_INDEX_DENSE_FRACTION of the rows
+# is turned into a bitmap instead of being sorted; one more than
+# _INDEX_INTERSECT_RATIO times the current candidates is evaluated on them
+# instead of being intersected.
+_INDEX_DENSE_FRACTION = 8
+_INDEX_INTERSECT_RATIO = 4
+
+
+def _is_number(value) -> bool:
+    """A real, non-NaN number (what a numeric index can binary-search for)."""
+    return isinstance(value, numbers.Real) and not np.isnan(value)
+
+
+def _bits_at(bitmap: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Bits of a packed (big-endian) bitmap at the given row positions."""
+    shift = (7 - (positions & 7)).astype(np.uint8)
+    return ((bitmap[positions >> 3] >> shift) & 1).astype(bool)
+
+
+class ColumnIndex:
+    """
+    Reusable indexes over selected columns of one DataFrame, consumed by
+    filter_data(df, filters, index=...).
+
+    Numeric columns keep a sorted permutation (values ascending, nulls
+    last), so equals / greater_than / less_than / in_range / in_list /
+    is_null become binary searches. Other columns keep one packed bitmap
+    per distinct value plus one for nulls, answering equals / in_list /
+    is_null. Range hits come back as slices of the permutation and are
+    intersected as sorted position arrays, so a selective query costs in
+    proportion to its hits, not to the frame; bitmaps are only materialized
+    for low-cardinality columns and for conditions that keep most rows. The
+    remaining conditions are evaluated by filter_data only on the surviving
+    rows.
+
+    Example:
+        >>> index = load_or_build_index(df, ['age', 'systolic_bp', 'site'],
+        ...                             source='data/clinical_trial_raw.csv')
+        >>> cohort = filter_data(df, filters, index=index)
+    """
+
+    def __init__(self, nrows: int, source: dict = None):
+        self.nrows = nrows
+        self.source = source
+        self.sorted = {}   # column -> (sorted values, permutation, non-null count)
+        self.bitmaps = {}  # column -> {value: packed bitmap}; key None = nulls
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, columns: list, source: str = None,
+              max_categories: int = 1024) -> 'ColumnIndex':
+        """Index `columns` of df; `source` is the file df was loaded from."""
+        index = cls(len(df), _source_fingerprint(source) if source else None)
+        for col in columns:
+            series = df[col]
+            if pd.api.types.is_numeric_dtype(series.dtype):
+                if isinstance(series.dtype, np.dtype) and series.dtype.kind == 'f':
+                    values = series.to_numpy()
+                else:
+                    values = series.to_numpy(dtype='float64', na_value=np.nan)
+                perm = np.argsort(values, kind='stable')
+                index.sorted[col] = (values[perm], perm, int((~np.isnan(values)).sum()))
+            else:
+                codes, uniques = pd.factorize(series)
+                if len(uniques) > max_categories:
+                    raise ValueError(f"{col!r} has {len(uniques)} distinct values; "
+                                     f"bitmap indexes are limited to {max_categories}")
+                order = np.argsort(codes, kind='stable')
+                bounds = np.concatenate([[0], np.cumsum(np.bincount(codes + 1, minlength=len(uniques) + 1))])
+                keys = [None] + [v.item() if hasattr(v, 'item') else v for v in uniques]
+                index.bitmaps[col] = {key: index._to_bitmap(order[bounds[i]:bounds[i + 1]])
+                                      for i, key in enumerate(keys)}
+        return index
+
+    def _to_bitmap(self, positions: np.ndarray) -> np.ndarray:
+        bits = np.zeros(self.nrows, dtype=bool)
+        bits[positions] = True
+        return np.packbits(bits)
+
+    def _invert(self, bitmap: np.ndarray) -> np.ndarray:
+        return np.packbits(~np.unpackbits(bitmap, count=self.nrows).astype(bool))
+
+    def lookup(self, column: str, condition: str, value):
+        """
+        Rows matching one condition, or None if the index cannot answer it.
+
+        Sorted columns answer with the matching slice of the permutation
+        (row positions in value order, not row order), so the cost follows
+        the number of hits rather than the number of rows. Bitmap columns
+        answer with a packed uint8 bitmap over all rows. Values a scan would
+        reject or treat specially (NaN, non-numbers on a numeric column)
+        return None and are left to the scan.
+        """
+        if column in self.sorted:
+            values, perm, valid = self.sorted[column]
+            present = values[:valid]
+
+            def span(lo, hi):
+                return perm[np.searchsorted(present, lo, 'left'):np.searchsorted(present, hi, 'right')]
+
+            if condition == 'is_null':
+                return perm[:valid] if value is False else perm[valid:]
+            if condition == 'in_list':
+                if not all(pd.isna(v) or _is_number(v) for v in value):
+                    return None
+                parts = [span(v, v) for v in value if not pd.isna(v)]
+                if any(pd.isna(v) for v in value):
+                    parts.append(perm[valid:])
+                return np.concatenate(parts) if parts else perm[:0]
+            if condition == 'in_range':
+                lo, hi = value
+                return span(lo, hi) if _is_number(lo) and _is_number(hi) else None
+            if not _is_number(value):
+                return None
+            if condition == 'equals':
+                return span(value, value)
+            if condition == 'greater_than':
+                return perm[np.searchsorted(present, value, 'right'):valid]
+            if condition == 'less_than':
+                return perm[:np.searchsorted(present, value, 'left')]
+            return None
+
+        if column in self.bitmaps:
+            maps = self.bitmaps[column]
+            empty = np.zeros((self.nrows + 7) // 8, dtype=np.uint8)
+            if condition == 'equals':
+                return empty if pd.isna(value) else maps.get(value, empty)
+            if condition == 'in_list':
+                out = empty.copy()
+                for v in value:
+                    out |= maps[None] if pd.isna(v) else maps.get(v, empty)
+                return out
+            if condition == 'is_null':
+                return self._invert(maps[None]) if value is False else maps[None]
+        return None
+
+    def select(self, nodes: list, nrows: int):
+        """
+        Split compiled filters into (candidate positions, filters still to evaluate).
+
+        Position results are intersected smallest first, as sorted arrays.
+        A result much larger than the current candidates is not worth
+        sorting: its filter is handed back and evaluated on the candidates
+        instead. Bitmaps are tested bit by bit at the candidate positions,
+        and only when no condition produced positions are they ANDed and
+        unpacked over the whole frame.
+        """
+        if nrows != self.nrows:
+            raise ValueError(f"index covers {self.nrows} rows but the frame has {nrows}")
+        hits, bitmaps, rest = [], [], []
+        for node in nodes:
+            found = self.lookup(*node[1:]) if node[0] == 'cond' else None
+            if found is None:
+                rest.append(node)
+            elif found.dtype == np.uint8:
+                bitmaps.append(found)
+            else:
+                hits.append((node, found))
+        hits.sort(key=lambda hit: len(hit[1]))
+        if hits and len(hits[0][1]) > nrows // _INDEX_DENSE_FRACTION:
+            # even the most selective condition keeps most rows: bitmaps are cheaper
+            bitmaps += [self._to_bitmap(found) for _, found in hits]
+            hits = []
+
+        if hits:
+            positions = np.sort(hits[0][1])
+            for node, found in hits[1:]:
+                if len(found) > _INDEX_INTERSECT_RATIO * len(positions):
+                    rest.append(node)
+                else:
+                    positions = np.intersect1d(positions, found, assume_unique=True)
+            for bitmap in bitmaps:
+                positions = positions[_bits_at(bitmap, positions)]
+            return positions, rest
+        if bitmaps:
+            bits = bitmaps[0]
+            for bitmap in bitmaps[1:]:
+                bits = bits & bitmap
+            return np.flatnonzero(np.unpackbits(bits, count=nrows)), rest
+        return np.arange(nrows), rest
+
+    def save(self, path: str) -> None:
+        """Persist the index (and its source fingerprint) as an .npz file."""
+        meta = {'nrows': self.nrows, 'source': self.source, 'sorted': [], 'bitmaps': []}
+        arrays = {}
+        for j, (col, (values, perm, valid)) in enumerate(self.sorted.items()):
+            meta['sorted'].append([col, valid])
+            arrays[f's{j}_values'], arrays[f's{j}_perm'] = values, perm
+        for j, (col, maps) in enumerate(self.bitmaps.items()):
+            meta['bitmaps'].append([col, list(maps)])
+            arrays[f'b{j}'] = np.stack(list(maps.values()))
+        with open(path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path: str, source: str = None):
+        """Load a saved index; None if missing or if `source` has changed since."""
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data['meta']))
+                if source is not None and not (meta['source'] and _source_matches(meta['source'], source)):
+                    return None
+                index = cls(meta['nrows'], meta['source'])
+                for j, (col, valid) in enumerate(meta['sorted']):
+                    index.sorted[col] = (data[f's{j}_values'], data[f's{j}_perm'], valid)
+                for j, (col, keys) in enumerate(meta['bitmaps']):
+                    index.bitmaps[col] = dict(zip(keys, data[f'b{j}']))
+        except (OSError, KeyError, ValueError):
+            return None
+        return index
+
+
+@traced
+def load_or_build_index(df: pd.DataFrame, columns: list, source: str,
+                        path: str = None) -> ColumnIndex:
+    """
+    Load the persisted index for `source`, rebuilding it if it is missing,
+    stale (the source file changed) or lacks any of `columns`.
+
+    Args:
+        df: DataFrame loaded from source
+        columns: Columns to index
+        source: Path of the data file df came from
+        path: Where to persist the index (default: .<name>.index.npz beside source)
+
+    Returns:
+        ColumnIndex: Index usable with filter_data(df, filters, index=...)
+    """
+    if path is None:
+        directory, name = os.path.split(os.path.abspath(source))
+        path = os.path.join(directory, f".{name}.index.npz")
+    index = ColumnIndex.load(path, source)
+    if index is not None and index.nrows == len(df) \
+            and all(c in index.sorted or c in index.bitmaps for c in columns):
+        return index
+    index = ColumnIndex.build(df, columns, source=source)
+    try:
+        index.save(path)
+    except OSError:
+        pass
+    return index
+
+
+# ----------------------------------------------------------------------------
+# Parallel (process pool) mode
+#
+# parallel_* functions return exactly what their serial counterparts return
+# while spreading the row-local work over a process pool. The parent writes
+# just the columns a task reads, in the columnar cache format, to shared
+# memory (/dev/shm when available); each worker memory-maps only its block
+# of rows and writes back only the columns it changed, so partitions are
+# never pickled and untouched columns never leave the parent. Whatever
+# needs the whole column (duplicate detection, fill values, category
+# levels) is settled in the parent. Frames smaller than _PARALLEL_MIN_ROWS
+# (where starting the pool costs more than the work), machines with a
+# single CPU, and columns the columnar format cannot hold run serially.
+# ----------------------------------------------------------------------------
+
+_PARALLEL_MIN_ROWS = 1_000_000
+
+
+def _shared_dir():
+    return "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
+def _share_frame(df: pd.DataFrame) -> str:
+    """Write df (positions as index) to a fresh shared directory and return it."""
+    store = tempfile.mkdtemp(prefix="q3_parallel.", dir=_shared_dir())
+    try:
+        _write_columns(df.reset_index(drop=True), store)
+        os.mkdir(os.path.join(store, "out"))
+    except BaseException:
+        shutil.rmtree(store, ignore_errors=True)
+        raise
+    return store
+
+
+def _row_bounds(nrows: int, parts: int) -> list:
+    edges = np.linspace(0, nrows, parts + 1).astype(np.int64)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def _group_bounds(starts: np.ndarray, nrows: int, parts: int) -> list:
+    """Row blocks of roughly equal size that never split a group.
+
+    `starts` are the group start offsets (plus the end offset) of rows laid
+    out in group order; rows past starts[-1] (missing keys) form their own
+    final block.
+    """
+    targets = np.linspace(0, starts[-1], parts + 1)[1:-1]
+    cuts = np.unique(np.concatenate([[0], starts[np.searchsorted(starts, targets)], [starts[-1], nrows]]))
+    return [(int(a), int(b)) for a, b in zip(cuts[:-1], cuts[1:]) if b > a]
+
+
+def _group_layout(df: pd.DataFrame, by):
+    """(GroupKeys, row permutation putting each group's rows together, group starts).
+
+    Rows keep their relative order within a group; rows with a missing key
+    go last.
+    """
+    keys = by if isinstance(by, GroupKeys) else GroupKeys(df, by)
+    order, starts = keys.order
+    perm = np.concatenate([np.flatnonzero(keys.codes >= 0)[order], np.flatnonzero(keys.codes < 0)])
+    return keys, perm, starts
+
+
+def _parallel_task(task: str, store: str, start: int, stop: int, params: dict):
+    """Run one partition in a worker; big results come back through the store."""
+    part = _read_columns(store, slice(start, stop))
+    if task == "hash":
+        return pd.util.hash_pandas_object(part, index=False).to_numpy()
+    if task == "summarize":
+        return summarize_by_group(part, params["keys"], params["agg_dict"])
+    if task == "clean":
+        result = clean_data(part, remove_duplicates=False, sentinel_value=params["sentinel_value"])
+    elif task == "transform":
+        result = transform_types(part, params["type_map"])
+    elif params["by"] is not None:  # fill, whole groups per partition
+        result = fill_missing_many(part, params["strategies"], by=params["by"])[list(params["strategies"])]
+    else:  # fill, rows: fill values (and the carried-in ffill values) come from the parent
+        result = part
+        for col, strategy in params["strategies"].items():
+            if strategy == "ffill":
+                filled = result[col].ffill()
+                seed = params["seeds"][col]
+                result[col] = filled if pd.isna(seed) else filled.fillna(seed)
+            else:
+                result[col] = result[col].fillna(params["fills"][col])
+
+    target = os.path.join(store, "out", str(start))
+    try:
+        os.mkdir(target)
+        _write_columns(result.reset_index(drop=True), target)
+    except _UnsupportedColumn:
+        shutil.rmtree(target, ignore_errors=True)
+        return result.reset_index(drop=True)
+    return target
+
+
+def _map_partitions(pool, task: str, store: str, bounds: list, params: dict, per_part: list = None) -> list:
+    """Run task on every (start, stop) block and return the results in block order."""
+    futures = [pool.submit(_parallel_task, task, store, start, stop,
+                           dict(params, **per_part[i]) if per_part else params)
+               for i, (start, stop) in enumerate(bounds)]
+    return [_read_columns(r) if isinstance(r, str) else r for r in (f.result() for f in futures)]
+
+
+def _concat_parts(parts: list) -> pd.DataFrame:
+    return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        return os.cpu_count() or 1
+
+
+def _parallel_workers(df: pd.DataFrame, workers: int):
+    """Worker count to use (at most one per CPU), or None when df should be processed serially."""
+    cpus = _available_cpus()
+    workers = min(workers or cpus, cpus)
+    return workers if workers > 1 and len(df) >= _PARALLEL_MIN_ROWS else None
+
+
+def _run_partitions(df: pd.DataFrame, task: str, bounds: list, params: dict,
+                    workers: int, per_part: list = None) -> list:
+    """Share df, run task on its row blocks over a fresh pool and clean up."""
+    store = _share_frame(df)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return _map_partitions(pool, task, store, bounds, params, per_part)
+    finally:
+        shutil.rmtree(store, ignore_errors=True)
+
+
+@traced
+def parallel_clean_data(df: pd.DataFrame, remove_duplicates: bool = True,
+                        sentinel_value=-999, subset: list = None,
+                        workers: int = None) -> pd.DataFrame:
+    """
+    clean_data() over a process pool; the result is identical to the serial one.
+
+    Workers hash the key columns of their rows, the parent marks duplicates
+    from the hashes (confirming them on the key values among rows whose
+    hashes collide), then workers replace sentinels in the targeted columns
+    of the rows that are kept. Only those columns are shipped to and from
+    the workers.
+
+    Args:
+        df: Input DataFrame (not modified)
+        remove_duplicates, sentinel_value, subset: As in clean_data()
+        workers: Number of processes (default and maximum: the CPUs available)
+
+    Returns:
+        pd.DataFrame: Cleaned data, same as clean_data(df, ...)
+
+    Example:
+        >>> df_clean = parallel_clean_data(df, sentinel_value=CLINICAL_TRIAL_SENTINELS, workers=8)
+    """
+    workers = _parallel_workers(df, workers)
+    if workers is None:
+        return clean_data(df, remove_duplicates, sentinel_value, subset)
+    try:
+        out = df.copy(deep=False)
+        if remove_duplicates:
+            keys = df if subset is None else df[subset]
+            hashes = pd.Series(np.concatenate(
+                _run_partitions(keys, "hash", _row_bounds(len(df), workers), {}, workers)))
+            dup = _confirmed_duplicates(keys, hashes)
+            if dup.any():
+                out = df[~dup]
+        targets = _sentinel_targets(out, sentinel_value)
+        if targets:
+            parts = _run_partitions(out[list(targets)], "clean", _row_bounds(len(out), workers),
+                                    {"sentinel_value": targets}, workers)
+            cleaned = _concat_parts(parts)
+            cleaned.index = out.index
+            for col in targets:
+                out[col] = cleaned[col]
+    except _UnsupportedColumn:
+        return clean_data(df, remove_duplicates, sentinel_value, subset)
+    return out
+
+
+@traced
+def parallel_transform_types(df: pd.DataFrame, type_map: dict, workers: int = None) -> pd.DataFrame:
+    """
+    transform_types() over a process pool; the result is identical to the serial one.
+
+    Datetime and numeric parsing run per block of rows, with only the
+    columns being parsed shipped to the workers; 'category' conversions
+    need every level, so they run in the parent afterwards. Unlike
+    transform_types(), df itself is left unchanged.
+
+    Args:
+        df: Input DataFrame
+        type_map: As in transform_types()
+        workers: Number of processes (default and maximum: the CPUs available)
+
+    Returns:
+        pd.DataFrame: DataFrame with converted types
+    """
+    out = df.copy(deep=False)
+    workers = _parallel_workers(df, workers)
+    row_local = {col: t for col, t in type_map.items() if t in ("datetime", "numeric")}
+    if workers is None or not row_local:
+        return transform_types(out, type_map)
+    try:
+        parts = _run_partitions(df[list(row_local)], "transform", _row_bounds(len(df), workers),
+                                {"type_map": row_local}, workers)
+    except _UnsupportedColumn:
+        return transform_types(out, type_map)
+    converted = _concat_parts(parts)
+    converted.index = out.index
+    for col in row_local:
+        out[col] = converted[col]
+    return transform_types(out, {col: t for col, t in type_map.items() if t == "category"})
+
+
+@traced
+def parallel_fill_missing_many(df: pd.DataFrame, strategies: dict, by=None,
+                               workers: int = None) -> pd.DataFrame:
+    """
+    fill_missing_many() over a process pool; the result is identical to the serial one.
+
+    Without `by`, rows are split into blocks: the parent computes each
+    column's mean/median and, for ffill, the last value before every block,
+    so blocks fill independently. With `by`, rows are regrouped so that
+    every group lies in one block. Workers only receive the filled (and
+    grouping) columns and only send the filled ones back.
+
+    Args:
+        df: Input DataFrame (not modified)
+        strategies, by: As in fill_missing_many()
+        workers: Number of processes (default and maximum: the CPUs available)
+
+    Returns:
+        pd.DataFrame: DataFrame with filled values
+    """
+    workers = _parallel_workers(df, workers)
+    if workers is None:
+        return fill_missing_many(df, strategies, by=by)
+    for strategy in strategies.values():
+        if strategy not in _FILL_STRATEGIES:
+            raise ValueError("Unknown strategy")
+    by_cols = [] if by is None else [by] if isinstance(by, str) else list(by)
+    prepared = df[list(dict.fromkeys(by_cols + list(strategies)))].copy(deep=False)
+    for col, strategy in strategies.items():
+        if strategy != "ffill" and not pd.api.types.is_float_dtype(prepared[col].dtype) and prepared[col].hasnans:
+            prepared[col] = prepared[col].astype(float)
+
+    params = {"strategies": strategies, "by": by}
+    per_part = None
+    perm = None
+    if by is None:
+        bounds = _row_bounds(len(df), workers)
+        params["fills"] = {col: getattr(prepared[col], s)() for col, s in strategies.items() if s != "ffill"}
+        per_part = [{"seeds": {}} for _ in bounds]
+        for col in (c for c, s in strategies.items() if s == "ffill"):
+            present = np.flatnonzero(prepared[col].notna().to_numpy())
+            before = np.searchsorted(present, [start for start, _ in bounds]) - 1
+            for seeds, i in zip(per_part, before):
+                seeds["seeds"][col] = prepared[col].iloc[present[i]] if i >= 0 else np.nan
+    else:
+        _, perm, starts = _group_layout(prepared, by)
+        bounds = _group_bounds(starts, len(df), workers)
+        prepared = prepared.take(perm)
+    try:
+        parts = _run_partitions(prepared, "fill", bounds, params, workers, per_part)
+    except _UnsupportedColumn:
+        return fill_missing_many(df, strategies, by=by)
+    filled = _concat_parts(parts)
+    if perm is not None:
+        filled = filled.take(np.argsort(perm))
+    filled.index = df.index
+    out = df.copy(deep=False)
+    for col in strategies:
+        out[col] = filled[col]
+    return out
+
+
+@traced
+def parallel_summarize_by_group(df: pd.DataFrame, group_col, agg_dict: dict = None,
+                                workers: int = None) -> pd.DataFrame:
+    """
+    summarize_by_group() over a process pool; the result is identical to the serial one.
+
+    Rows are regrouped so that each worker summarizes whole groups (rows
+    keep their order within a group, so sums accumulate in the same order
+    as the serial path), and the per-worker summaries are concatenated in
+    key order. Aggregations must be picklable: names or module-level
+    functions.
+
+    Args:
+        df: Input DataFrame
+        group_col: Column, list of columns or GroupKeys to group by
+        agg_dict: As in summarize_by_group()
+        workers: Number of processes (default and maximum: the CPUs available)
+
+    Returns:
+        pd.DataFrame: Grouped and aggregated data
+    """
+    workers = _parallel_workers(df, workers)
+    if workers is None:
+        return summarize_by_group(df, group_col, agg_dict)
+    keys, perm, starts = _group_layout(df, group_col)
+    if agg_dict is None:
+        agg_dict = {col: 'mean' for col in df.select_dtypes(include=[np.number]).columns
+                    if col not in keys.columns}
+    needed = list(dict.fromkeys(keys.columns + list(agg_dict)))
+    try:
+        parts = _run_partitions(df[needed].take(perm[:starts[-1]]), "summarize",
+                                _group_bounds(starts, starts[-1], workers),
+                                {"keys": keys.columns, "agg_dict": agg_dict}, workers)
+    except _UnsupportedColumn:
+        return summarize_by_group(df, keys, agg_dict)
+    if not parts:
+        return summarize_by_group(df, keys, agg_dict)
+    return pd.concat(parts, ignore_index=True)
+
+
+# ----------------------------------------------------------------------------
+# Lazy query plans
+#
+# scan_csv() returns a LazyFrame that only records clean / filter / select /
+# summarize steps. collect() then reads the CSV once, in chunks, with just
+# the columns the plan needs (usecols), runs the row-local steps fused per
+# chunk so rejected rows are dropped as soon as they are read, and keeps
+# only the surviving rows. The result equals running the eager functions in
+# the same order on load_data(path).
+# ----------------------------------------------------------------------------
+
+_LAZY_CHUNK_ROWS = 1_000_000
+
+
+def _filter_columns(nodes) -> set:
+    columns = set()
+    for node in nodes:
+        if node[0] == 'any':
+            columns |= _filter_columns(node[1])
+        else:
+            columns.add(node[1])
+    return columns
+
+
+def _promote_dtypes(dtypes: list):
+    """The dtype pandas infers for a column whose chunks had these dtypes."""
+    first = dtypes[0]
+    if all(d == first for d in dtypes):
+        return first
+    if all(isinstance(d, np.dtype) and d.kind in 'biuf' for d in dtypes):
+        return np.result_type(*dtypes)
+    if all(isinstance(d, pd.CategoricalDtype) for d in dtypes):
+        # sorted, as read_csv(dtype='category') orders the categories of
+        # inputs it parses in one piece
+        return pd.CategoricalDtype(sorted(set().union(*(d.categories for d in dtypes))))
+    return None
+
+
+class LazyFrame:
+    """
+    A deferred query over a CSV file: load -> clean -> filter -> select -> summarize.
+
+    Each method returns a new LazyFrame with one more step; nothing is read
+    until collect(). Build one with scan_csv().
+
+    Example:
+        >>> lf = (scan_csv('data/clinical_trial_raw.csv')
+        ...       .clean(sentinel_value=CLINICAL_TRIAL_SENTINELS)
+        ...       .filter([{'column': 'site', 'condition': 'equals', 'value': 'Site A'}])
+        ...       .summarize('intervention_group', {'age': 'mean', 'bmi': 'mean'}))
+        >>> print(lf.explain())
+        >>> summary = lf.collect()
+    """
+
+    def __init__(self, source: str, schema=None, chunksize: int = _LAZY_CHUNK_ROWS, plan: tuple = ()):
+        self.source = source
+        self.schema = CLINICAL_TRIAL_SCHEMA if schema is True else (schema or None)
+        self.chunksize = chunksize
+        self.plan = plan
+
+    def _then(self, step: tuple) -> 'LazyFrame':
+        if self.plan and self.plan[-1][0] == 'summarize':
+            raise ValueError("summarize() must be the last step of a lazy query")
+        return LazyFrame(self.source, self.schema, self.chunksize, self.plan + (step,))
+
+    def clean(self, remove_duplicates: bool = True, sentinel_value=-999,
+              subset: list = None) -> 'LazyFrame':
+        """Add a clean_data() step (same arguments)."""
+        return self._then(('clean', {'remove_duplicates': remove_duplicates,
+                                     'sentinel_value': sentinel_value,
+                                     'subset': list(subset) if subset is not None else None}))
+
+    def filter(self, filters: list) -> 'LazyFrame':
+        """Add a filter_data() step; filters are validated now."""
+        return self._then(('filter', [_compile_filter(f) for f in filters]))
+
+    def select(self, columns: list) -> 'LazyFrame':
+        """Keep only these columns, in this order."""
+        return self._then(('select', list(columns)))
+
+    def summarize(self, group_col, agg_dict: dict = None) -> 'LazyFrame':
+        """Add a final summarize_by_group() step (group column names, not a GroupKeys)."""
+        if isinstance(group_col, GroupKeys):
+            raise ValueError("lazy summarize() takes group column names")
+        return self._then(('summarize', (group_col, agg_dict)))
+
+    def _optimize(self):
+        """Columns to read, and the columns each step must pass on to the next."""
+        header = list(pd.read_csv(self.source, nrows=0).columns)
+        visible = [header]                     # columns of the frame entering each step
+        for op, arg in self.plan:
+            cols = visible[-1]
+            if op == 'select':
+                missing = [c for c in arg if c not in cols]
+                if missing:
+                    raise KeyError(f"Columns not found: {missing}")
+                cols = arg
+            visible.append(cols)
+
+        needed = set(visible[-1])
+        keep = [None] * len(self.plan)         # columns to hold after each step
+        for i in range(len(self.plan) - 1, -1, -1):
+            op, arg = self.plan[i]
+            if op == 'summarize':
+                group_col, agg_dict = arg
+                if agg_dict is None:
+                    needed = set(visible[i])   # 'mean' of every numeric column
+                else:
+                    keys = [group_col] if isinstance(group_col, str) else list(group_col)
+                    needed = set(keys) | set(agg_dict)
+            keep[i] = [c for c in visible[i + 1] if c in needed]
+            if op == 'filter':
+                needed |= _filter_columns(arg)
+            elif op == 'clean' and arg['remove_duplicates']:
+                # whole-row duplicates can only be found on every column present
+                needed |= set(visible[i] if arg['subset'] is None else arg['subset'])
+            missing = needed - set(visible[i])
+            if missing:
+                raise KeyError(f"Columns not found: {sorted(missing)}")
+        usecols = [c for c in header if c in needed]
+        return usecols, keep
+
+    def explain(self) -> str:
+        """The optimized plan, one step per line."""
+        usecols, keep = self._optimize()
+        lines = [f"scan {self.source} usecols={usecols} chunksize={self.chunksize:,}"]
+        for (op, arg), cols in zip(self.plan, keep):
+            if op == 'filter':
+                detail = f"{len(arg)} condition(s), per chunk"
+            elif op == 'clean':
+                detail = ("dedup" if arg['remove_duplicates'] else "no dedup") + ", sentinels, per chunk"
+            elif op == 'summarize':
+                detail = f"by {arg[0]} on the surviving rows"
+            else:
+                detail = "columns"
+            lines.append(f"  {op}: {detail} -> keep {cols}")
+        return "\n".join(lines)
+
+    @traced
+    def collect(self) -> pd.DataFrame:
+        """
+        Run the query.
+
+        Returns:
+            pd.DataFrame: The rows (or summary) the eager calls would return,
+            with the original row labels
+        """
+        usecols, keep = self._optimize()
+        schema = {c: t for c, t in self.schema.items() if c in usecols} if self.schema else None
+        chunks = pd.read_csv(self.source, usecols=usecols, chunksize=self.chunksize,
+                             dtype=_read_dtypes(schema))
+        seen = [_SeenHashes() for _ in self.plan]
+        parts, dtypes = [], {}
+        last = None
+        for chunk in chunks:
+            if schema:
+                chunk = _parse_ids(chunk, schema)
+            for i, (op, arg) in enumerate(self.plan):
+                if op == 'summarize':
+                    break
+                if op == 'clean':
+                    if arg['remove_duplicates']:
+                        hashes = _row_hashes(chunk if arg['subset'] is None else chunk[arg['subset']])
+                        chunk = chunk[seen[i].first_seen(hashes)]
+                    chunk = clean_data(chunk, remove_duplicates=False,
+                                       sentinel_value=arg['sentinel_value'])
+                elif op == 'filter':
+                    positions = np.arange(len(chunk))
+                    for node in arg:
+                        if not len(positions):
+                            break
+                        positions = positions[_evaluate_filter(chunk, node, positions)]
+                    chunk = chunk.iloc[positions]
+                chunk = chunk[keep[i]] if list(chunk.columns) != keep[i] else chunk
+            if self.plan and self.plan[-1][0] == 'summarize':
+                chunk = chunk[keep[-1]]
+            # row selection keeps dtypes, so even emptied chunks tell what
+            # dtype the eager result would have
+            for col, dtype in chunk.dtypes.items():
+                dtypes.setdefault(col, []).append(dtype)
+            if len(chunk):
+                parts.append(chunk)
+            last = chunk
+
+        if last is None:  # header-only file
+            last = pd.read_csv(self.source, usecols=usecols, nrows=0)[keep[-1] if keep else usecols]
+        df = pd.concat(parts) if len(parts) > 1 else (parts[0] if parts else last)
+        casts = {}
+        for col, seen_dtypes in dtypes.items():
+            target = _promote_dtypes(seen_dtypes)
+            if target is not None and df[col].dtype != target:
+                casts[col] = target
+        if casts:
+            df = df.astype(casts)
+        if self.plan and self.plan[-1][0] == 'summarize':
+            group_col, agg_dict = self.plan[-1][1]
+            return summarize_by_group(df, group_col, agg_dict)
+        return df
+
+
+def scan_csv(filepath: str, schema=None, chunksize: int = _LAZY_CHUNK_ROWS) -> LazyFrame:
+    """
+    Start a lazy query on a CSV file.
+
+    Args:
+        filepath: Path to CSV file
+        schema: Optional {column: dtype} mapping as in load_data() (True for
+                CLINICAL_TRIAL_SCHEMA)
+        chunksize: Rows read at a time; bounds memory together with the
+                   number of surviving rows
+
+    Returns:
+        LazyFrame: An empty plan; add steps, then call collect()
+
+    Example:
+        >>> site_a = scan_csv('data/clinical_trial_raw.csv').clean().filter(
+        ...     [{'column': 'site', 'condition': 'equals', 'value': 'Site A'}]).select(['age', 'bmi'])
+        >>> df = site_a.collect()
+    """
+    return LazyFrame(filepath, schema, chunksize)
+
+
+# ----------------------------------------------------------------------------
+# Batch jobs
+#
+# run_job() applies a declarative job spec (JSON) to many input files in one
+# process, so a batch of site extracts pays for one interpreter start and
+# one pandas import instead of one notebook kernel per file:
+#
+#   {"inputs": ["data/sites/*.csv"],
+#    "load": {"schema": true},
+#    "steps": [{"op": "clean", "sentinel_value": {"age": -999, "bmi": -1}},
+#              {"op": "filter", "filters": [{"column": "age", "condition": "greater_than", "value": 18}]},
+#              {"op": "summarize", "group_col": "intervention_group", "agg_dict": {"age": "mean"}}],
+#    "output": {"path": "output/{stem}_summary.csv"}}
+#
+# Step ops name the library functions; their other keys are its keyword
+# arguments. Relative paths are resolved against the current directory.
+# The command line lives in run_jobs.py, which only imports this module
+# once a job runs.
+# ----------------------------------------------------------------------------
+
+_JOB_STEPS = {
+    "clean": lambda df, args: clean_data(df, **args),
+    "fill_missing": lambda df, args: fill_missing_many(df, **args),
+    "transform_types": lambda df, args: transform_types(df, **args),
+    "bin": lambda df, args: bin_columns(df, **args),
+    "create_bins": lambda df, args: create_bins(df, **args),
+    "filter": lambda df, args: filter_data(df, **args),
+    "select": lambda df, args: df[args["columns"]],
+    "summarize": lambda df, args: summarize_by_group(df, **args),
+}
+
+_JOB_FORMATS = ("csv", "json", "parquet", "store")
+
+
+def _output_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Flatten ('age', 'mean') to 'age_mean' so every format gets one header
+    row, and keep a named index as columns (row labels are dropped)."""
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy(deep=False)
+        df.columns = ["_".join(str(part) for part in col if part != "") for col in df.columns]
+    return df.reset_index(drop=all(name is None for name in df.index.names))
+
+
+def _write_output(df: pd.DataFrame, path: str, fmt: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    df = _output_frame(df)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "json":
+        df.to_json(path, orient="records", date_format="iso", indent=1)
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False)      # needs pyarrow or fastparquet, imported only here
+    else:
+        save_dataset(df, path)
+
+
+def _job_format(output: dict) -> str:
+    fmt = output.get("format")
+    if fmt is None:
+        ext = os.path.splitext(output["path"])[1].lstrip(".")
+        fmt = ext if ext in _JOB_FORMATS else "csv"
+    if fmt not in _JOB_FORMATS:
+        raise ValueError(f"Unknown output format: {fmt!r} (use one of {', '.join(_JOB_FORMATS)})")
+    return fmt
+
+
+def run_job(spec: dict, inputs: list = None, keep_going: bool = False, log=print) -> list:
+    """
+    Run a batch job spec over its input files in this process.
+
+    Args:
+        spec: Job spec: 'inputs' (paths or glob patterns), optional 'load'
+              (load_data keyword arguments; inputs are not cached unless it
+              sets 'cache'), 'steps' (list of {'op': ...,
+              keyword arguments}; ops: clean, fill_missing, transform_types,
+              bin, create_bins, filter, select, summarize) and 'output'
+              ({'path': template with {stem} / {name}, 'format': csv, json,
+              parquet or store (default: from the extension), 'combine':
+              true to write one output for all inputs with a 'source'
+              column})
+        inputs: Input paths overriding spec['inputs']
+        keep_going: Log a failing input and continue with the next one;
+                    the error is raised once every input has been tried
+        log: Function receiving one progress line per input
+
+    Returns:
+        list: Output paths written
+
+    Raises:
+        ValueError: For an invalid spec, an output path that is the same for
+                    several inputs, inputs matching no file, or (with
+                    keep_going) inputs that failed
+
+    Example:
+        >>> with open('jobs/site_summary.json') as f:
+        ...     run_job(json.load(f))
+    """
+    import glob
+    import time
+
+    steps = spec.get("steps", [])
+    for step in steps:
+        if step.get("op") not in _JOB_STEPS:
+            raise ValueError(f"Unknown job step: {step.get('op')!r} (use one of {', '.join(_JOB_STEPS)})")
+    output = spec.get("output")
+    if not output or "path" not in output:
+        raise ValueError("job spec needs an output path")
+    fmt = _job_format(output)
+    combine = bool(output.get("combine"))
+
+    paths = []
+    for pattern in (inputs if inputs is not None else spec.get("inputs", [])):
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise ValueError(f"no input files match {pattern!r}")
+        paths.extend(matches)
+    if not paths:
+        raise ValueError("job spec has no inputs")
+
+    targets = {}
+    if not combine:
+        for path in paths:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            targets[path] = output["path"].format(stem=stem, name=os.path.basename(path))
+        if len(set(targets.values())) < len(paths):
+            raise ValueError(f"output path {output['path']!r} gives the same file for several inputs; "
+                             "use {stem} or {name} in it, or set 'combine'")
+
+    written, combined, failed = [], [], []
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            df = load_data(path, **{"cache": False, **spec.get("load", {})})
+            rows_in = len(df)
+            for step in steps:
+                args = {k: v for k, v in step.items() if k != "op"}
+                df = _JOB_STEPS[step["op"]](df, args)
+            if combine:
+                df = _output_frame(df)
+                df.insert(0, "source", path)
+                combined.append(df)
+                target = "(combined)"
+            else:
+                target = targets[path]
+                _write_output(df, target, fmt)
+                written.append(target)
+        except Exception as e:
+            if not keep_going:
+                raise
+            failed.append(path)
+            log(f"[ERROR] {path}: {type(e).__name__}: {e}")
+            continue
+        log(f"[OK] {path}: {rows_in} -> {len(df)} rows, {time.perf_counter() - start:.2f}s -> {target}")
+
+    if combine and combined:
+        _write_output(pd.concat(combined, ignore_index=True), output["path"], fmt)
+        written.append(output["path"])
+    if failed:
+        raise ValueError(f"{len(failed)} of {len(paths)} inputs failed: {', '.join(failed)}")
+    return written
+
+
+def main(argv=None) -> int:
+    """Command line of run_jobs.py, run from this file.
+
+    Running this file imports pandas before the arguments are even parsed;
+    run_jobs.py starts without it and loads this module when a job runs.
+    """
+    import run_jobs
+    return run_jobs.main(argv, run_job=run_job)
 
 
 if __name__ == '__main__':
-    print("Data utilities loaded successfully!")
-    print("Available functions:")
-    print("  - load_data()")
-    print("  - clean_data()")
-    print("  - detect_missing()")
-    print("  - fill_missing()")
-    print("  - filter_data()")
-    print("  - transform_types()")
-    print("  - create_bins()")
-    print("  - summarize_by_group()")
-    
-    # TODO: Add simple test example here
-    # Example:
-    # test_df = pd.DataFrame({'age': [25, 30, 35], 'bmi': [22, 25, 28]})
-    # print("Test DataFrame created:", test_df.shape)
-    # print("Test detect_missing:", detect_missing(test_df))
\ No newline at end of file
+    raise SystemExit(main())
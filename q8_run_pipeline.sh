@@ -8,49 +8,11 @@
 # NOTE: Q3 (q3_data_utils.py) is a library imported by the notebooks, not run directly
 # NOTE: The main pipeline runs Q4-Q7 notebooks in order
 
-set -o pipefail
-
-LOGDIR="reports"
-LOGFILE="${LOGDIR}/pipeline_log.txt"
-
-mkdir -p "${LOGDIR}"
-
-{
-  echo "=============================================="
-  echo "Pipeline started: $(date)"
-  echo "Working directory: $(pwd)"
-  echo "=============================================="
-} > "${LOGFILE}"
-
-echo "[INFO] Starting clinical trial data pipeline..." | tee -a "${LOGFILE}"
-echo "Starting clinical trial data pipeline..." > reports/pipeline_log.txt
-
-# TODO: Run analysis notebooks in order (q4-q7) using nbconvert with error handling
-# Use either `$?` or `||` operator to check exit codes and stop on failure
-# Add a log entry for each notebook execution or failure
-# jupyter nbconvert --execute --to notebook q4_exploration.ipynb
-
-if ! command -v jupyter >/dev/null 2>&1; then
-  echo "[ERROR] 'jupyter' command not found. Please install Jupyter and try again." | tee -a "${LOGFILE}"
-  exit 1
-fi
-
-shopt -s nullglob
-NOTEBOOKS=(q4_*.ipynb q5_*.ipynb q6_*.ipynb q7_*.ipynb)
-shopt -u nullglob
-
-if [ ${#NOTEBOOKS[@]} -eq 0 ]; then
-  echo "[ERROR] No Q4-Q7 notebooks found (expected files like q4_*.ipynb, q5_*.ipynb, q6_*.ipynb, q7_*.ipynb)." | tee -a "${LOGFILE}"
-  exit 1
-fi
-
-for nb in "${NOTEBOOKS[@]}"; do
-  echo "[INFO] Running notebook: ${nb}" | tee -a "${LOGFILE}"
-  jupyter nbconvert --execute --to notebook --inplace "${nb}" >> "${LOGFILE}" 2>&1 \
-    || { echo "[ERROR] Execution failed for ${nb}. Stopping pipeline." | tee -a "${LOGFILE}"; exit 1; }
-  echo "[SUCCESS] Completed: ${nb}" | tee -a "${LOGFILE}"
-done
-
-echo "[INFO] All notebooks completed successfully." | tee -a "${LOGFILE}"
-echo "Pipeline finished: $(date)" | tee -a "${LOGFILE}"
-echo "Pipeline complete!" >> reports/pipeline_log.txt
+# The notebooks are run by run_pipeline.py. It runs Q4-Q6 concurrently,
+# since they only read the raw data, and then Q7, which reads Q6's output.
+# It skips notebooks whose code and inputs are unchanged since their last
+# successful run and logs each notebook's wall time to reports/pipeline_log.txt.
+# Pass --force to re-run everything, or --jobs 1 to run one notebook at a time.
+
+cd "$(dirname "$0")" || exit 1
+exec python3 run_pipeline.py "$@"
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Run the Q4-Q7 analysis notebooks as a dependency graph.
+
+Each stage declares the files it reads and writes. A stage runs once every
+stage producing one of its inputs has finished; stages that do not depend
+on each other (Q4, Q5 and Q6 only read the raw CSV) run concurrently.
+A stage is skipped when its notebook code, its inputs (by content hash)
+and the Q3 utilities are unchanged since its last successful run and its
+outputs still exist. Per-stage wall times go to reports/pipeline_log.txt.
+
+With --trace every Q2/Q3 utility call made by a notebook is recorded by
+perf_trace (wall time, rows in/out, allocations, peak memory) to
+reports/traces/<stage>.jsonl, and a per-function summary of each stage is
+added to the log.
+
+Usage:
+    python3 run_pipeline.py              # run what changed
+    python3 run_pipeline.py --force      # run every stage
+    python3 run_pipeline.py --jobs 1     # one notebook at a time
+    python3 run_pipeline.py --trace      # also profile the utility calls
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import perf_trace
+
+LOGFILE = "reports/pipeline_log.txt"
+STATEFILE = "reports/.pipeline_state.json"
+TRACEDIR = "reports/traces"
+
+# Every notebook imports the Q3 utilities, so they are an input of every stage.
+SHARED_INPUTS = ["q3_data_utils.py"]
+
+STAGES = [
+    {"name": "q4", "notebook": "q4_exploration.ipynb",
+     "inputs": ["data/clinical_trial_raw.csv"],
+     "outputs": ["output/q4_site_counts.csv"]},
+    {"name": "q5", "notebook": "q5_missing_data.ipynb",
+     "inputs": ["data/clinical_trial_raw.csv"],
+     "outputs": ["output/q5_cleaned_data.csv", "output/q5_missing_report.txt"]},
+    {"name": "q6", "notebook": "q6_transformation.ipynb",
+     "inputs": ["data/clinical_trial_raw.csv"],
+     "outputs": ["output/q6_transformed_data.csv", "output/q6_transformed_data.store"]},
+    {"name": "q7", "notebook": "q7_aggregation.ipynb",
+     "inputs": ["data/clinical_trial_raw.csv", "output/q6_transformed_data.store",
+                "output/q6_transformed_data.csv"],
+     "outputs": ["output/q7_site_summary.csv", "output/q7_intervention_comparison.csv",
+                 "output/q7_analysis_report.txt"]},
+]
+
+
+def stage_dependencies(stages: list) -> dict:
+    """Map each stage name to the names of the stages producing its inputs."""
+    producers = {path: stage["name"] for stage in stages for path in stage["outputs"]}
+    return {stage["name"]: sorted({producers[p] for p in stage["inputs"] if p in producers})
+            for stage in stages}
+
+
+def notebook_code(path: str) -> str:
+    """Concatenated code cells; outputs and execution counts don't affect the hash."""
+    with open(path, encoding="utf-8") as f:
+        nb = json.load(f)
+    return "\n".join("".join(cell["source"]) for cell in nb["cells"] if cell["cell_type"] == "code")
+
+
+def input_files(path: str) -> list:
+    """The file itself, or every file of a directory input (e.g. a dataset store)."""
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+
+
+def stage_hash(stage: dict) -> str:
+    """Content hash of everything a stage's results depend on."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(notebook_code(stage["notebook"]).encode())
+    for path in (f for p in SHARED_INPUTS + stage["inputs"] for f in input_files(p)):
+        digest.update(path.encode() + b"\0")
+        try:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        except FileNotFoundError:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+def load_state() -> dict:
+    try:
+        with open(STATEFILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: dict) -> None:
+    tmp = STATEFILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, STATEFILE)
+
+
+def log(message: str) -> None:
+    print(message)
+    with open(LOGFILE, "a", encoding="utf-8") as f:
+        f.write(message + "\n")
+
+
+def trace_path(stage: dict) -> str:
+    return os.path.join(TRACEDIR, stage["name"] + ".jsonl")
+
+
+def execute_notebook(stage: dict, trace: bool = False):
+    """Run one notebook in place; returns (succeeded, seconds, nbconvert output).
+
+    With trace, the notebook kernel inherits PERF_TRACE_FILE and appends
+    its perf_trace records to trace_path(stage).
+    """
+    env = None
+    if trace:
+        os.makedirs(TRACEDIR, exist_ok=True)
+        path = os.path.abspath(trace_path(stage))
+        if os.path.exists(path):
+            os.remove(path)
+        env = dict(os.environ, PERF_TRACE_FILE=path, PERF_TRACE_STAGE=stage["name"])
+    start = time.perf_counter()
+    proc = subprocess.run(
+        ["jupyter", "nbconvert", "--execute", "--to", "notebook", "--inplace", stage["notebook"]],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env)
+    return proc.returncode == 0, time.perf_counter() - start, proc.stdout
+
+
+def log_trace(stage: dict) -> None:
+    """Add the per-function summary of a stage's top-level utility calls to the log."""
+    records = [r for r in perf_trace.read_records(trace_path(stage)) if r["depth"] == 0]
+    if not records:
+        log(f"[TRACE] {stage['notebook']}: no traced calls")
+        return
+    log(f"[TRACE] {stage['notebook']}: {len(records)} utility calls, "
+        f"{sum(r['seconds'] for r in records):.2f}s\n"
+        + perf_trace.format_summary(perf_trace.summarize(records)))
+
+
+def run_pipeline(stages: list = STAGES, jobs: int = None, force: bool = False,
+                 trace: bool = False) -> bool:
+    """
+    Run stages in dependency order, skipping unchanged ones.
+
+    Args:
+        stages: Stage declarations (name, notebook, inputs, outputs)
+        jobs: Maximum notebooks running at once (default: number of stages)
+        force: Run every stage even if nothing changed
+        trace: Record the stages' utility calls with perf_trace
+
+    Returns:
+        bool: True if every stage succeeded or was up to date
+    """
+    deps = stage_dependencies(stages)
+    by_name = {stage["name"]: stage for stage in stages}
+    state = load_state()
+    pending = [stage["name"] for stage in stages]
+    done, failed = set(), set()
+    running = {}
+    jobs = jobs or len(stages)
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in [n for n in pending if all(d in done for d in deps[n])]:
+                if len(running) >= jobs:
+                    break
+                pending.remove(name)
+                stage = by_name[name]
+                digest = stage_hash(stage)
+                if (not force and state.get(name) == digest
+                        and all(os.path.exists(p) for p in stage["outputs"])):
+                    log(f"[SKIP] {stage['notebook']}: inputs unchanged")
+                    done.add(name)
+                    continue
+                log(f"[INFO] Running notebook: {stage['notebook']}")
+                running[pool.submit(execute_notebook, stage, trace)] = (name, digest)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, digest = running.pop(future)
+                ok, seconds, output = future.result()
+                with open(LOGFILE, "a", encoding="utf-8") as f:
+                    f.write(output)
+                if trace:
+                    log_trace(by_name[name])
+                if ok:
+                    log(f"[SUCCESS] Completed: {by_name[name]['notebook']} ({seconds:.1f}s)")
+                    state[name] = digest
+                    save_state(state)
+                    done.add(name)
+                else:
+                    log(f"[ERROR] Execution failed for {by_name[name]['notebook']} ({seconds:.1f}s). "
+                        "Stopping pipeline.")
+                    failed.add(name)
+            if failed:
+                # let running notebooks finish, but start nothing new
+                pending.clear()
+
+    log(f"[INFO] Total wall time: {time.perf_counter() - started:.1f}s")
+    return not failed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the Q4-Q7 notebook pipeline.")
+    parser.add_argument("--force", action="store_true", help="run every stage even if unchanged")
+    parser.add_argument("--jobs", type=int, default=None, help="maximum notebooks run at once")
+    parser.add_argument("--trace", action="store_true", help="record per-call timing and memory of the utilities")
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.dirname(LOGFILE), exist_ok=True)
+    with open(LOGFILE, "w", encoding="utf-8") as f:
+        f.write("==============================================\n")
+        f.write(f"Pipeline started: {datetime.now():%a %b %d %H:%M:%S %Y}\n")
+        f.write(f"Working directory: {os.getcwd()}\n")
+        f.write("==============================================\n")
+    if shutil.which("jupyter") is None:
+        log("[ERROR] 'jupyter' command not found. Please install Jupyter and try again.")
+        return 1
+
+    ok = run_pipeline(jobs=args.jobs, force=args.force, trace=args.trace)
+    if ok:
+        log("[INFO] All notebooks completed successfully.")
+    log(f"Pipeline finished: {datetime.now():%a %b %d %H:%M:%S %Y}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())